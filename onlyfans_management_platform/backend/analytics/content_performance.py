@@ -0,0 +1,153 @@
+
+from ..models.models import AnalyticsData
+from array import array
+from datetime import datetime
+import warnings
+import numpy as np
+
+class ContentPerformanceBuilder:
+    """Accumulates content_performance payloads into flat typed buffers.
+
+    Payloads are expected as {content_id: {metric: number, ...}, ...}; anything else is skipped.
+    Only the JSON walk happens per row, the columnar layout is built once in `build()`.
+    """
+
+    def __init__(self):
+        self._timestamps = array('d')
+        self._content_index = {}
+        self._metric_index = {}
+        self._rows = array('i')
+        self._contents = array('i')
+        self._metrics = array('i')
+        self._values = array('d')
+
+    def add(self, timestamp, payload):
+        row = len(self._timestamps)
+        self._timestamps.append(timestamp.timestamp() if isinstance(timestamp, datetime) else float(timestamp))
+        if not isinstance(payload, dict):
+            return
+        for content_id, metrics in payload.items():
+            if not isinstance(metrics, dict):
+                continue
+            content = self._content_index.setdefault(str(content_id), len(self._content_index))
+            for metric, value in metrics.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                self._rows.append(row)
+                self._contents.append(content)
+                self._metrics.append(self._metric_index.setdefault(metric, len(self._metric_index)))
+                self._values.append(value)
+
+    def build(self):
+        timestamps = np.frombuffer(self._timestamps, dtype=np.float64).copy()
+        values = np.full((len(self._metric_index), len(timestamps), len(self._content_index)), np.nan)
+        values[np.frombuffer(self._metrics, dtype=np.int32),
+               np.frombuffer(self._rows, dtype=np.int32),
+               np.frombuffer(self._contents, dtype=np.int32)] = np.frombuffer(self._values, dtype=np.float64)
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, values = timestamps[order], values[:, order, :]
+        return ContentPerformanceFrame(timestamps, list(self._content_index), list(self._metric_index), values)
+
+class ContentPerformanceFrame:
+    """Columnar view of a creator's snapshots: one (snapshot x content item) array per metric.
+
+    Missing measurements are NaN. Timestamps are epoch seconds in ascending order.
+    """
+
+    def __init__(self, timestamps, content_ids, metrics, values):
+        self.timestamps = timestamps
+        self.content_ids = content_ids
+        self.metrics = metrics
+        self.values = values
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def column(self, metric):
+        return self.values[self.metrics.index(metric)]
+
+    def series(self, metric, content_id):
+        return self.column(metric)[:, self.content_ids.index(str(content_id))]
+
+    def moving_average(self, metric, window):
+        """Trailing mean over the last `window` snapshots per content item, ignoring gaps."""
+        data = self.column(metric)
+        present = ~np.isnan(data)
+        zero = np.zeros((1, data.shape[1]))
+        sums = np.vstack([zero, np.cumsum(np.where(present, data, 0.0), axis=0)])
+        counts = np.vstack([zero, np.cumsum(present, axis=0)])
+        start = np.maximum(np.arange(len(data)) + 1 - window, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (sums[1:] - sums[start]) / (counts[1:] - counts[start])
+
+    def percentiles(self, metric, q=(50, 90, 99)):
+        """Per-content percentiles over time; returns an array of shape (len(q), content items)."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanpercentile(self.column(metric), q, axis=0)
+
+    def totals(self, metric, since=None):
+        data = self.column(metric)
+        if since is not None:
+            data = data[self.timestamps >= _epoch(since)]
+        return np.nansum(data, axis=0)
+
+    def top_content(self, metric, n=10, since=None):
+        totals = self.totals(metric, since=since)
+        n = min(n, len(totals))
+        if not n:
+            return []
+        best = np.argpartition(-totals, n - 1)[:n]
+        best = best[np.argsort(-totals[best], kind='stable')]
+        return [(self.content_ids[i], float(totals[i])) for i in best]
+
+    def period_totals(self, metric, period):
+        """Sum `metric` per content item into fixed periods (seconds, epoch-aligned).
+
+        Returns (period_starts, totals) where totals has shape (periods, content items);
+        periods with no snapshots are zero.
+        """
+        period = _seconds(period)
+        data = np.nan_to_num(self.column(metric))
+        if not len(data):
+            return np.empty(0), np.zeros((0, data.shape[1]))
+        buckets = np.floor_divide(self.timestamps, period).astype(np.int64)
+        first = buckets[0]
+        buckets -= first
+        boundaries = np.flatnonzero(np.diff(buckets, prepend=-1))
+        totals = np.zeros((buckets[-1] + 1, data.shape[1]))
+        totals[buckets[boundaries]] = np.add.reduceat(data, boundaries, axis=0)
+        starts = (np.arange(len(totals)) + first) * period
+        return starts, totals
+
+    def period_over_period(self, metric, period):
+        """Period totals with absolute and relative change versus the previous period.
+
+        Returns (period_starts, totals, deltas, ratios); the first period's deltas are NaN.
+        """
+        starts, totals = self.period_totals(metric, period)
+        previous = np.vstack([np.full((1, totals.shape[1]), np.nan), totals[:-1]])
+        deltas = totals - previous
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratios = deltas / previous
+        return starts, totals, deltas, ratios
+
+def _epoch(value):
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+def _seconds(period):
+    return period.total_seconds() if hasattr(period, 'total_seconds') else float(period)
+
+def load_content_performance(creator, since=None, until=None, chunk_size=2000):
+    """Stream a creator's AnalyticsData snapshots into a ContentPerformanceFrame."""
+    snapshots = AnalyticsData.objects.filter(creator=creator)
+    if since is not None:
+        snapshots = snapshots.filter(timestamp__gte=since)
+    if until is not None:
+        snapshots = snapshots.filter(timestamp__lt=until)
+    builder = ContentPerformanceBuilder()
+    rows = snapshots.order_by('timestamp', 'id').values_list('timestamp', 'content_performance')
+    for timestamp, payload in rows.iterator(chunk_size=chunk_size):
+        builder.add(timestamp, payload)
+    return builder.build()
@@ -0,0 +1,120 @@
+
+from django.db import router, transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+from ..models.models import AnalyticsData, AnalyticsRollup, AnalyticsRollupState
+from datetime import timedelta
+import math
+
+HOUR, DAY, WEEK = AnalyticsRollup.HOUR, AnalyticsRollup.DAY, AnalyticsRollup.WEEK
+TRUNC = {HOUR: TruncHour, DAY: TruncDay, WEEK: TruncWeek}
+
+# Snapshots are stamped before their transaction commits, so re-read a little behind the watermark
+LATE_ARRIVAL_WINDOW = timedelta(minutes=5)
+
+# How many of the newest buckets the dashboard shows per granularity
+DASHBOARD_BUCKETS = {HOUR: 48, DAY: 30, WEEK: 12}
+
+METRICS = ('sample_count', 'engagement_rate_sum', 'fan_growth_sum', 'revenue_sum')
+
+def bucket_floor(value, granularity):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity in (DAY, WEEK):
+        value = value.replace(hour=0)
+    if granularity == WEEK:
+        value -= timedelta(days=value.weekday())
+    return value
+
+def _aggregate_snapshots(queryset, granularity):
+    return (queryset.annotate(bucket=TRUNC[granularity]('timestamp'))
+            .values('bucket')
+            .annotate(sample_count=Count('id'),
+                      engagement_rate_sum=Sum('engagement_rate'),
+                      fan_growth_sum=Sum('fan_growth'),
+                      revenue_sum=Sum('revenue'))
+            .order_by('bucket'))
+
+def _aggregate_rollups(queryset, granularity):
+    return (queryset.annotate(bucket=TRUNC[granularity]('bucket_start'))
+            .values('bucket')
+            .annotate(**{metric: Sum(metric) for metric in METRICS})
+            .order_by('bucket'))
+
+def _replace_buckets(creator, granularity, since, rows):
+    stale = AnalyticsRollup.objects.filter(creator=creator, granularity=granularity)
+    if since is not None:
+        stale = stale.filter(bucket_start__gte=since)
+    stale.delete()
+    AnalyticsRollup.objects.bulk_create([
+        AnalyticsRollup(creator=creator, granularity=granularity, bucket_start=row['bucket'],
+                        **{metric: row[metric] for metric in METRICS})
+        for row in rows
+    ])
+
+def refresh_rollups(creator, full=False):
+    """Fold snapshots newer than the creator's watermark into the hourly, daily and weekly rollups.
+
+    Hourly buckets are rebuilt from AnalyticsData, daily from hourly and weekly from daily,
+    so an incremental refresh only touches the buckets around the watermark.
+    Returns True when anything was recomputed.
+    """
+    state, _ = AnalyticsRollupState.objects.get_or_create(creator=creator)
+    with transaction.atomic(using=router.db_for_write(AnalyticsRollupState, instance=state)):
+        state = AnalyticsRollupState.objects.select_for_update().get(pk=state.pk)
+        snapshots = AnalyticsData.objects.filter(creator=creator)
+        latest = snapshots.aggregate(latest=Max('timestamp'))['latest']
+        if not full and (latest is None or (state.watermark is not None and latest <= state.watermark)):
+            return False
+
+        since = None
+        if not full and state.watermark is not None:
+            since = bucket_floor(state.watermark - LATE_ARRIVAL_WINDOW, HOUR)
+            snapshots = snapshots.filter(timestamp__gte=since)
+        _replace_buckets(creator, HOUR, since, _aggregate_snapshots(snapshots, HOUR))
+
+        for finer, coarser in ((HOUR, DAY), (DAY, WEEK)):
+            since = since and bucket_floor(since, coarser)
+            source = AnalyticsRollup.objects.filter(creator=creator, granularity=finer)
+            if since is not None:
+                source = source.filter(bucket_start__gte=since)
+            _replace_buckets(creator, coarser, since, _aggregate_rollups(source, coarser))
+
+        state.watermark = latest
+        state.save()
+    return True
+
+def dashboard_rollups(creator):
+    """Newest buckets per granularity plus all-time totals, independent of history length."""
+    series = {}
+    for granularity, limit in DASHBOARD_BUCKETS.items():
+        buckets = AnalyticsRollup.objects.filter(creator=creator, granularity=granularity).order_by('-bucket_start')[:limit]
+        series[granularity] = list(reversed(buckets))
+    totals = AnalyticsRollup.objects.filter(creator=creator, granularity=WEEK).aggregate(
+        **{metric: Sum(metric) for metric in METRICS})
+    totals = {metric: value or 0 for metric, value in totals.items()}
+    totals['engagement_rate_avg'] = (totals['engagement_rate_sum'] / totals['sample_count']
+                                     if totals['sample_count'] else 0.0)
+    return series, totals
+
+def verify_rollups(creator):
+    """Compare the stored rollups with a full recompute from AnalyticsData.
+
+    Returns a list of (granularity, bucket_start, stored, expected) tuples for every mismatch.
+    """
+    mismatches = []
+    snapshots = AnalyticsData.objects.filter(creator=creator)
+    for granularity in (HOUR, DAY, WEEK):
+        expected = {row['bucket']: tuple(row[metric] for metric in METRICS)
+                    for row in _aggregate_snapshots(snapshots, granularity)}
+        stored = {row['bucket_start']: tuple(row[metric] for metric in METRICS)
+                  for row in AnalyticsRollup.objects.filter(creator=creator, granularity=granularity)
+                  .values('bucket_start', *METRICS)}
+        for bucket in sorted(expected.keys() | stored.keys()):
+            want, have = expected.get(bucket), stored.get(bucket)
+            if want is None or have is None or not all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+                                                       for a, b in zip(have, want)):
+                mismatches.append((granularity, bucket, have, want))
+    return mismatches
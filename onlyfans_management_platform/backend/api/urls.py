@@ -4,6 +4,7 @@ from ..views.views import (
     VaultView,
     admin_access_vault,
     fan_management_dashboard,
+    fan_detail,
     action_suggestions,
     analytics_data,
     automation_flows,
@@ -11,15 +12,37 @@ from ..views.views import (
     onboarding,
     ai_recommendations
 )
+from ..views.uploads import (
+    start_chunked_upload,
+    chunked_upload_status,
+    upload_chunk,
+    finish_chunked_upload
+)
+from ..views.media import vault_media
+from ..views.fans import fan_import, fan_export
+from ..views.stats import cache_stats, profiling_metrics
+from ..views.security import send_two_factor_code, verify_two_factor_code
 
 urlpatterns = [
     path('vault/', VaultView.as_view(), name='vault'),
+    path('vault/<int:vault_id>/media/', vault_media, name='vault_media'),
     path('admin/vault/<int:vault_id>/', admin_access_vault, name='admin_vault_access'),
     path('fan_management/', fan_management_dashboard, name='fan_management_dashboard'),
+    path('fan_management/<int:fan_id>/', fan_detail, name='fan_detail'),
+    path('fan_management/import/', fan_import, name='fan_import'),
+    path('fan_management/export/', fan_export, name='fan_export'),
     path('action_suggestions/', action_suggestions, name='action_suggestions'),
     path('analytics/', analytics_data, name='analytics_data'),
     path('automation/', automation_flows, name='automation_flows'),
     path('content_scheduling/', content_scheduling, name='content_scheduling'),
     path('onboarding/', onboarding, name='onboarding'),
     path('ai_recommendations/', ai_recommendations, name='ai_recommendations'),
+    path('uploads/', start_chunked_upload, name='start_chunked_upload'),
+    path('uploads/<uuid:upload_id>/', chunked_upload_status, name='chunked_upload_status'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/complete/', finish_chunked_upload, name='finish_chunked_upload'),
+    path('cache/stats/', cache_stats, name='cache_stats'),
+    path('metrics/', profiling_metrics, name='profiling_metrics'),
+    path('security/2fa/send/', send_two_factor_code, name='send_two_factor_code'),
+    path('security/2fa/verify/', verify_two_factor_code, name='verify_two_factor_code'),
 ]
@@ -0,0 +1,18 @@
+
+from django.apps import AppConfig
+from django.conf import settings
+import logging.config
+
+class BackendConfig(AppConfig):
+    name = 'backend'
+    # Shards hand out primary keys from shard_index * SHARD_ID_SPAN (2**40) up, past what a 32-bit key holds
+    default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from .storage import signals
+        from .media import signals
+        from .caching import signals
+        from .sharding import signals
+        if not settings.LOGGING:
+            from .logconfig import logging_config
+            logging.config.dictConfig(logging_config())
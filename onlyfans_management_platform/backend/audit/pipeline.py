@@ -0,0 +1,245 @@
+
+from django.conf import settings
+from django.db import close_old_connections, connection, router, transaction
+from contextlib import contextmanager
+from logging.handlers import QueueHandler
+import atexit
+import logging
+import os
+import queue
+import threading
+
+_STOP = object()
+
+class BatchFileHandler(logging.FileHandler):
+    """FileHandler that leaves flushing to the caller, so a batch of records costs one write to disk."""
+
+    def _open(self):
+        # The log directory may not exist on a fresh worker; create it on first write rather than at startup
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+class AuditPipeline:
+    """Moves audit rows and log records off the request path.
+
+    Requests enqueue model instances (record) and log records (through AuditQueueHandler); one
+    background thread drains the queue in batches of up to AUDIT_BATCH_SIZE, inserting rows with
+    one bulk_create per model and appending log records with one flush per file. The queue holds
+    at most AUDIT_QUEUE_SIZE items: when it is full a caller waits up to AUDIT_ENQUEUE_TIMEOUT
+    seconds and then writes its own item synchronously, so nothing is dropped and a stalled
+    writer slows requests down instead of growing memory. When a batch insert fails its rows are
+    inserted one at a time, and a row that still fails is held and retried by the writer every
+    AUDIT_RETRY_INTERVAL seconds, up to AUDIT_MAX_ATTEMPTS times before it is logged with its values.
+    Rows of a creator being moved to another shard are held until the move finishes. stop() (also
+    run at interpreter exit) writes everything still queued.
+    """
+
+    def __init__(self, queue_size=None, batch_size=None, enqueue_timeout=None, retry_interval=None, max_attempts=None):
+        self.queue_size = queue_size or getattr(settings, 'AUDIT_QUEUE_SIZE', 10000)
+        self.batch_size = batch_size or getattr(settings, 'AUDIT_BATCH_SIZE', 500)
+        self.enqueue_timeout = enqueue_timeout if enqueue_timeout is not None else getattr(settings, 'AUDIT_ENQUEUE_TIMEOUT', 0.05)
+        self.retry_interval = retry_interval or getattr(settings, 'AUDIT_RETRY_INTERVAL', 1.0)
+        self.max_attempts = max_attempts or getattr(settings, 'AUDIT_MAX_ATTEMPTS', 5)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._held = []  # (instance, failed attempts)
+        self._inline = 0
+        self.written = 0
+        self.synchronous = 0
+
+    def _ensure_started(self):
+        # A thread started before a fork (e.g. gunicorn --preload) doesn't exist in the child; start one per process,
+        # and start another if it died, keeping what is queued
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._held = []
+            elif self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def record(self, instance):
+        """Queue a model instance for insertion."""
+        self._submit(instance)
+
+    @contextmanager
+    def inline(self):
+        """Write in the calling thread while active, e.g. inside a transaction that will be rolled back."""
+        self.flush()
+        self._inline += 1
+        try:
+            yield
+        finally:
+            self._inline -= 1
+
+    def _submit(self, item):
+        if self._inline or threading.current_thread() is self._thread:
+            self._write([item])
+            if self._held:
+                # The writer retries them
+                self._ensure_started()
+            return
+        self._ensure_started()
+        try:
+            self._queue.put(item, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.synchronous += 1
+            self._write([item])
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.retry_interval)
+                except queue.Empty:
+                    if not self._held:
+                        continue
+                    batch = []
+                else:
+                    batch = [item]
+                    while item is not _STOP and len(batch) < self.batch_size:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        batch.append(item)
+                try:
+                    close_old_connections()
+                    with self._lock:
+                        held, self._held = self._held, []
+                    self._write([entry for entry in batch if entry is not _STOP], held)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if batch and batch[-1] is _STOP:
+                    self._drop_held()
+                    return
+        finally:
+            connection.close()
+
+    def _write(self, batch, held=()):
+        from ..sharding.shards import ShardMoving
+
+        rows, records, retry = {}, {}, []
+        for instance, failures in held:
+            rows.setdefault(type(instance), []).append((instance, failures))
+        for item in batch:
+            if isinstance(item, tuple):
+                handler, record = item
+                records.setdefault(handler, []).append(record)
+            else:
+                rows.setdefault(type(item), []).append((item, 0))
+        written = 0
+        for model, entries in rows.items():
+            # Grouped by database too, since rows of different creators can live on different shards
+            by_alias = {}
+            for instance, failures in entries:
+                try:
+                    by_alias.setdefault(router.db_for_write(model, instance=instance), []).append((instance, failures))
+                except ShardMoving:
+                    retry.append((instance, failures))
+                except Exception as error:
+                    self._failed(instance, failures, error, retry)
+            for alias, grouped in by_alias.items():
+                try:
+                    with transaction.atomic(using=alias):
+                        model.objects.using(alias).bulk_create([instance for instance, _ in grouped])
+                except Exception:
+                    # One bad row fails the whole insert; insert them one by one so only the bad ones are held back
+                    written += self._write_each(model, alias, grouped, retry)
+                else:
+                    written += len(grouped)
+        if retry:
+            with self._lock:
+                self._held.extend(retry)
+        for handler, handled in records.items():
+            handler.acquire()
+            try:
+                for record in handled:
+                    if handler.filter(record):
+                        handler.emit(record)
+                handler.flush()
+            finally:
+                handler.release()
+        self.written += written + sum(len(handled) for handled in records.values())
+
+    def _write_each(self, model, alias, entries, retry):
+        written = 0
+        for instance, failures in entries:
+            instance.pk = None
+            instance._state.adding = True
+            try:
+                with transaction.atomic(using=alias):
+                    model.objects.using(alias).bulk_create([instance])
+            except Exception as error:
+                self._failed(instance, failures, error, retry)
+            else:
+                written += 1
+        return written
+
+    def _failed(self, instance, failures, error, retry):
+        if failures + 1 < self.max_attempts:
+            retry.append((instance, failures + 1))
+        else:
+            self._give_up(instance, f'after {failures + 1} attempts: {error!r}')
+
+    def _give_up(self, instance, reason):
+        # The values go to the log so the row can still be restored by hand
+        values = {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+        logging.getLogger('backend.audit').error(f"Could not write {type(instance).__name__} {values} {reason}")
+
+    def _drop_held(self):
+        with self._lock:
+            held, self._held = self._held, []
+        for instance, _ in held:
+            self._give_up(instance, 'before shutdown')
+
+    def flush(self):
+        """Block until everything queued so far is written (rows held for a retry excepted)."""
+        if self._pid == os.getpid():
+            self._ensure_started()
+            self._queue.join()
+
+    def stop(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._pid = None
+
+class AuditQueueHandler(QueueHandler):
+    """Hands records to the audit pipeline; the wrapped handler does the actual write on its thread."""
+
+    def __init__(self, pipeline, handler):
+        super().__init__(None)
+        self.pipeline = pipeline
+        self.handler = handler
+
+    def enqueue(self, record):
+        self.pipeline._submit((self.handler, record))
+
+audit_pipeline = AuditPipeline()
+atexit.register(audit_pipeline.stop)
+
+class AuditFileHandler(AuditQueueHandler):
+    """Appends to `filename` through the audit pipeline; the handler class LOGGING uses (see backend.logconfig)."""
+
+    def __init__(self, filename, encoding=None):
+        super().__init__(audit_pipeline, BatchFileHandler(filename, encoding=encoding, delay=True))
+
+    def setFormatter(self, fmt):
+        # Records are formatted on the writer thread; this side only hands them over
+        self.handler.setFormatter(fmt)
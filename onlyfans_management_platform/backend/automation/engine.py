@@ -0,0 +1,250 @@
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Max
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from ..models.models import AutomationFlow
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import queue
+import threading
+import time
+
+FanEvent = namedtuple('FanEvent', 'creator_id event fan_id payload received_at')
+
+def fan_event(creator_id, event, fan_id=None, **payload):
+    return FanEvent(creator_id, normalize(event), fan_id, payload, time.perf_counter())
+
+def normalize(name):
+    return (name or '').strip().lower()
+
+ACTIONS = {}
+
+def register_action(name):
+    def decorator(handler):
+        ACTIONS[normalize(name)] = handler
+        return handler
+    return decorator
+
+def log_action(flow_id, action, event):
+    logging.info(f"Automation flow {flow_id} ran '{action}' for creator {event.creator_id} on {event.event}.")
+
+def resolve_action(action):
+    """Handler for an action_taken string: registered actions, then AUTOMATION_ACTIONS, then logging only."""
+    key = normalize(action)
+    if key not in ACTIONS:
+        path = getattr(settings, 'AUTOMATION_ACTIONS', {}).get(key)
+        ACTIONS[key] = import_string(path) if path else log_action
+    return ACTIONS[key]
+
+class FlowIndex:
+    """Active flows keyed by (creator_id, trigger_event). Lookups need no lock; writers swap whole tuples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._key_of = {}
+
+    def __len__(self):
+        return len(self._key_of)
+
+    def match(self, creator_id, event):
+        return self._by_key.get((creator_id, event), ())
+
+    def upsert(self, flow_id, creator_id, trigger_event, action_taken, is_active=True):
+        with self._lock:
+            self._discard(flow_id)
+            if is_active:
+                key = (creator_id, normalize(trigger_event))
+                self._by_key[key] = self._by_key.get(key, ()) + ((flow_id, action_taken),)
+                self._key_of[flow_id] = key
+
+    def remove(self, flow_id):
+        with self._lock:
+            self._discard(flow_id)
+
+    def _discard(self, flow_id):
+        key = self._key_of.pop(flow_id, None)
+        if key is not None:
+            remaining = tuple(flow for flow in self._by_key[key] if flow[0] != flow_id)
+            if remaining:
+                self._by_key[key] = remaining
+            else:
+                del self._by_key[key]
+
+    def replace(self, rows):
+        by_key, key_of = {}, {}
+        for flow_id, creator_id, trigger_event, action_taken in rows:
+            key = (creator_id, normalize(trigger_event))
+            by_key[key] = by_key.get(key, ()) + ((flow_id, action_taken),)
+            key_of[flow_id] = key
+        with self._lock:
+            self._by_key, self._key_of = by_key, key_of
+
+class FlowStats:
+    __slots__ = ('executions', 'failures', 'latency_total', 'latency_max', 'unflushed')
+
+    def __init__(self):
+        self.executions = self.failures = self.unflushed = 0
+        self.latency_total = self.latency_max = 0.0
+
+    def as_dict(self):
+        return {
+            'executions': self.executions,
+            'failures': self.failures,
+            'mean_latency_ms': self.latency_total / self.executions * 1000 if self.executions else 0.0,
+            'max_latency_ms': self.latency_max * 1000,
+        }
+
+class AutomationEngine:
+    """Matches fan events against every creator's AutomationFlow rows and runs their actions.
+
+    Events go through a bounded queue (submit blocks or raises queue.Full when it is full) to one
+    matching thread that looks flows up in a FlowIndex; actions run on a bounded thread pool. The
+    index follows saves/deletes in this process through signals, polls updated_at for changes made
+    elsewhere and is rebuilt every `rebuild_interval` seconds to drop flows deleted elsewhere.
+    Per-flow execution counts are written back to AutomationFlow every `flush_interval` seconds.
+    """
+
+    def __init__(self, workers=16, queue_size=10000, sync_interval=1.0, rebuild_interval=60.0, flush_interval=5.0):
+        self.index = FlowIndex()
+        self.workers = workers
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.flush_interval = flush_interval
+        self._events = queue.Queue(maxsize=queue_size)
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._pool = None
+        self._thread = None
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._watermark = None
+        self._uses_database = True
+        self.latencies = deque(maxlen=100000)
+        self.events_processed = 0
+
+    # -- Flow index maintenance --
+
+    def rebuild(self):
+        flows = AutomationFlow.objects.filter(is_active=True)
+        self._watermark = flows.aggregate(latest=Max('updated_at'))['latest']
+        self.index.replace(flows.values_list('pk', 'creator_id', 'trigger_event', 'action_taken').iterator())
+
+    def sync(self):
+        flows = AutomationFlow.objects.all()
+        if self._watermark is not None:
+            # Overlap a little: rows saved in the same instant as the watermark may commit after we read it
+            flows = flows.filter(updated_at__gte=self._watermark - timedelta(seconds=1))
+        for flow_id, creator_id, trigger_event, action_taken, is_active, updated_at in flows.values_list(
+                'pk', 'creator_id', 'trigger_event', 'action_taken', 'is_active', 'updated_at'):
+            self.index.upsert(flow_id, creator_id, trigger_event, action_taken, is_active)
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+
+    def _flow_saved(self, sender, instance, **kwargs):
+        self.index.upsert(instance.pk, instance.creator_id, instance.trigger_event, instance.action_taken, instance.is_active)
+
+    def _flow_deleted(self, sender, instance, **kwargs):
+        self.index.remove(instance.pk)
+
+    # -- Lifecycle --
+
+    def start(self, load=True):
+        """Begin consuming events. With load=False the index is left to the caller and the database is never touched."""
+        self._uses_database = load
+        if load:
+            self.rebuild()
+        post_save.connect(self._flow_saved, sender=AutomationFlow, dispatch_uid=f'automation-save-{id(self)}')
+        post_delete.connect(self._flow_deleted, sender=AutomationFlow, dispatch_uid=f'automation-delete-{id(self)}')
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='automation')
+        self._thread = threading.Thread(target=self._run, name='automation-matcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Finish every queued event and running action, then write the final counts."""
+        self._events.put(None)
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+        if self._uses_database:
+            self.flush_stats()
+        post_save.disconnect(sender=AutomationFlow, dispatch_uid=f'automation-save-{id(self)}')
+        post_delete.disconnect(sender=AutomationFlow, dispatch_uid=f'automation-delete-{id(self)}')
+
+    def submit(self, event, block=True, timeout=None):
+        self._events.put(event, block=block, timeout=timeout)
+
+    def _run(self):
+        now = time.monotonic()
+        next_sync, next_rebuild, next_flush = now + self.sync_interval, now + self.rebuild_interval, now + self.flush_interval
+        try:
+            while True:
+                try:
+                    event = self._events.get(timeout=self.sync_interval)
+                except queue.Empty:
+                    event = False
+                if event is None:
+                    break
+                if event:
+                    self.events_processed += 1
+                    for flow_id, action in self.index.match(event.creator_id, event.event):
+                        self._slots.acquire()
+                        self._pool.submit(self._execute, flow_id, action, event)
+                if not self._uses_database:
+                    continue
+                now = time.monotonic()
+                if now >= next_sync or now >= next_rebuild or now >= next_flush:
+                    close_old_connections()
+                if now >= next_rebuild:
+                    self.rebuild()
+                    next_rebuild, next_sync = now + self.rebuild_interval, now + self.sync_interval
+                elif now >= next_sync:
+                    self.sync()
+                    next_sync = now + self.sync_interval
+                if now >= next_flush:
+                    self.flush_stats()
+                    next_flush = now + self.flush_interval
+        finally:
+            if self._uses_database:
+                connection.close()
+
+    def _execute(self, flow_id, action, event):
+        failed = False
+        try:
+            resolve_action(action)(flow_id, action, event)
+        except Exception as error:
+            failed = True
+            logging.warning(f"Automation flow {flow_id} failed on {event.event}: {error!r}")
+        finally:
+            self._slots.release()
+            latency = time.perf_counter() - event.received_at
+            self.latencies.append(latency)
+            with self._stats_lock:
+                stats = self._stats.get(flow_id)
+                if stats is None:
+                    stats = self._stats[flow_id] = FlowStats()
+                stats.executions += 1
+                stats.unflushed += 1
+                stats.failures += failed
+                stats.latency_total += latency
+                stats.latency_max = max(stats.latency_max, latency)
+
+    # -- Reporting --
+
+    def stats(self):
+        with self._stats_lock:
+            return {flow_id: stats.as_dict() for flow_id, stats in self._stats.items()}
+
+    def flush_stats(self):
+        with self._stats_lock:
+            pending = {flow_id: stats.unflushed for flow_id, stats in self._stats.items() if stats.unflushed}
+            for flow_id in pending:
+                self._stats[flow_id].unflushed = 0
+        now = timezone.now()
+        for flow_id, count in pending.items():
+            AutomationFlow.objects.filter(pk=flow_id).update(
+                execution_count=F('execution_count') + count, last_executed_at=now)
@@ -0,0 +1,97 @@
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from ..fans.segmentation import AT_RISK, CHAMPION, HIBERNATING, LOYAL, NEW, REGULAR
+from ..models.models import (
+    AnalyticsData,
+    AutomationFlow,
+    ContentBlob,
+    ContentSchedule,
+    CreatorVault,
+    Fan,
+    UploadSession,
+)
+from datetime import timedelta
+import json
+import os
+import random
+
+PREFIX = 'bench'
+PASSWORD = 'bench-password'
+SEGMENTS = (CHAMPION, LOYAL, NEW, AT_RISK, HIBERNATING, REGULAR)
+BATCH_SIZE = 2000
+
+def creator_username(index):
+    return f'{PREFIX}-creator-{index}'
+
+def seed(creators=10, fans_per_creator=1000, snapshots_per_creator=500, vault_files_per_creator=5,
+         file_size=64 * 1024, seed_value=0, progress=None):
+    """Create a synthetic agency: creators with fans, analytics history over 90 days, vault files, schedules
+    and automation flows, plus one superuser. Existing benchmark creators are kept, so seeding is resumable."""
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    if not User.objects.filter(username=f'{PREFIX}-admin').exists():
+        User.objects.create_superuser(f'{PREFIX}-admin', f'{PREFIX}-admin@example.com', PASSWORD)
+    for index in range(creators):
+        username = creator_username(index)
+        if User.objects.filter(username=username).exists():
+            continue
+        with transaction.atomic():
+            creator = User.objects.create_user(username, f'{username}@example.com', PASSWORD)
+            fans = []
+            for number in range(fans_per_creator):
+                fan = Fan(creator=creator, fan_name=f'fan-{number}', segment=rng.choice(SEGMENTS), fan_data={
+                    'total_spend': round(rng.lognormvariate(3, 1), 2),
+                    'message_count': rng.randint(0, 400),
+                    'last_tip_at': (now - timedelta(days=rng.uniform(0, 120))).isoformat(),
+                })
+                fan.sync_promoted_fields()
+                fans.append(fan)
+            Fan.objects.bulk_create(fans, batch_size=BATCH_SIZE)
+            snapshots = AnalyticsData.objects.bulk_create([
+                AnalyticsData(creator=creator, engagement_rate=rng.uniform(0.01, 0.2), fan_growth=rng.randint(-10, 40),
+                              revenue=rng.uniform(0, 500), content_performance={'views': rng.randint(0, 5000)})
+                for _ in range(snapshots_per_creator)
+            ], batch_size=BATCH_SIZE)
+            # auto_now_add stamps every snapshot with now; spread them over the last 90 days
+            for snapshot in snapshots:
+                snapshot.timestamp = now - timedelta(seconds=rng.uniform(0, 90 * 86400))
+            AnalyticsData.objects.bulk_update(snapshots, ['timestamp'], batch_size=BATCH_SIZE)
+            for number in range(vault_files_per_creator):
+                vault = CreatorVault(creator=creator, is_public=number == 0)
+                vault.content_file.save(f'bench-{number}.bin', ContentFile(os.urandom(file_size)), save=False)
+                # save() rather than bulk_create so the blob reference counts are kept
+                vault.save()
+                ContentSchedule.objects.create(creator=creator, content=vault.content_file.name,
+                                               schedule_time=now + timedelta(hours=rng.uniform(-240, 240)))
+            AutomationFlow.objects.bulk_create(
+                AutomationFlow(creator=creator, trigger_event=event, action_taken='thank')
+                for event in ('new_subscriber', 'tip', 'message'))
+        if progress:
+            progress(index + 1, creators)
+
+def remove():
+    """Delete every benchmark user and, through cascades, their rows. Unreferenced blobs are left to collect_blobs."""
+    deleted, _ = User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+    return deleted
+
+class CreatorFixture:
+    """The per-creator objects the route probes need, in the shape of query_budget.Fixture."""
+
+    def __init__(self, creator, superuser):
+        self.creator = creator
+        self.superuser = superuser
+        self.vault = CreatorVault.objects.filter(creator=creator).order_by('pk').first()
+        self.blob = ContentBlob.objects.filter(name=self.vault.content_file.name).first() if self.vault else None
+        self.fan = Fan.objects.filter(creator=creator).order_by('pk').first()
+        self.upload = UploadSession.objects.create(creator=creator, target=UploadSession.VAULT, filename='bench.bin',
+                                                   total_size=1, chunk_size=1)
+        self.import_body = ''.join(json.dumps({'fan_name': f'imported-{i}', 'fan_data': {'total_spend': i}}) + '\n'
+                                   for i in range(50))
+
+def load_fixtures():
+    creators = list(User.objects.filter(username__startswith=f'{PREFIX}-creator-').order_by('pk'))
+    superuser = User.objects.get(username=f'{PREFIX}-admin')
+    return [CreatorFixture(creator, superuser) for creator in creators]
@@ -0,0 +1,246 @@
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from ..api.urls import urlpatterns
+from ..diagnostics.query_budget import PROBES, Probe
+from ..storage.uploads import start_upload, write_chunk
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from importlib import import_module
+import django
+import hashlib
+import io
+import itertools
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+
+two_factor = import_module('..security.2fa', __package__)
+
+CHUNK_SIZE = 256 * 1024
+VERIFICATION_CODE = '123456'
+
+def _fresh_upload(fixture):
+    # New bytes each time, so neither the session nor the finished file is satisfied from an existing blob
+    data = os.urandom(CHUNK_SIZE)
+    return start_upload(fixture.creator, 'vault', 'bench-upload.bin', len(data)), data
+
+def _upload_chunk(fixture):
+    session, data = _fresh_upload(fixture)
+    return [Probe('chunk', 'creator', 'put', reverse('upload_chunk', args=[session.pk, 0]),
+                  {'data': data, 'content_type': 'application/octet-stream',
+                   'HTTP_X_CHUNK_SHA256': hashlib.sha256(data).hexdigest()})]
+
+def _finish_upload(fixture):
+    session, data = _fresh_upload(fixture)
+    write_chunk(session, 0, io.BytesIO(data), len(data))
+    return [Probe('complete', 'creator', 'post', reverse('finish_chunked_upload', args=[session.pk]), {})]
+
+def _send_code(fixture):
+    # Lift the resend cooldown so every iteration issues a code
+    caches[getattr(settings, 'TWO_FACTOR_CACHE_ALIAS', 'default')].delete(f'2fa:resend:{fixture.creator.pk}')
+    return PROBES['send_two_factor_code'](fixture)
+
+def _verify_code(fixture):
+    store = caches[getattr(settings, 'TWO_FACTOR_CACHE_ALIAS', 'default')]
+    store.set_many({two_factor._code_key(fixture.creator): two_factor._digest(fixture.creator, VERIFICATION_CODE),
+                    two_factor._attempts_key(fixture.creator): 0}, timeout=300)
+    return [Probe('valid code', 'creator', 'post', reverse('verify_two_factor_code'), {'data': {'code': VERIFICATION_CODE}})]
+
+# Scenarios per route: called once per request with the creator's fixture, returning the probes to send.
+# The query-budget probes cover most routes; these set up the state their own probes can't.
+SCENARIOS = {
+    **{name: probes for name, probes in PROBES.items() if callable(probes)},
+    'upload_chunk': _upload_chunk,
+    'finish_chunked_upload': _finish_upload,
+    'send_two_factor_code': _send_code,
+    'verify_two_factor_code': _verify_code,
+}
+
+# Routes whose per-user state (resend cooldown, pending code) would make overlapping requests for the
+# same creator fail each other; these are serialized per creator, other creators still run in parallel.
+PER_USER_STATE = {'send_two_factor_code', 'verify_two_factor_code'}
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Peak rather than current outside Linux, in KiB on Linux/BSD and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == 'Darwin' else peak * 1024
+
+class RssSampler:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = self.baseline = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+class Worker:
+    """One simulated browser per thread: a logged-in Client per (role, creator)."""
+
+    def __init__(self):
+        self.clients = {}
+
+    def client(self, user):
+        client = self.clients.get(user.pk)
+        if client is None:
+            client = self.clients[user.pk] = Client()
+            client.force_login(user)
+        return client
+
+    def send(self, probe, fixture):
+        client = self.client(getattr(fixture, probe.role))
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, probe.method)(probe.path, **probe.kwargs)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - started
+        return elapsed, len(captured.captured_queries), response.status_code
+
+def run_endpoint(route, fixtures, requests, concurrency, label=None):
+    """Send `requests` requests for one route across the creators from `concurrency` threads.
+
+    Returns {label: result dict}; a route with several probes (e.g. creator and superuser views)
+    reports each separately.
+    """
+    creators = itertools.cycle(fixtures)
+    lock = threading.Lock()
+    local = threading.local()
+    user_locks = {fixture.creator.pk: threading.Lock() for fixture in fixtures}
+    samples = {}
+
+    def one(_):
+        with lock:
+            fixture = next(creators)
+        worker = getattr(local, 'worker', None)
+        if worker is None:
+            worker = local.worker = Worker()
+        with user_locks[fixture.creator.pk] if route in PER_USER_STATE else nullcontext():
+            try:
+                probes = SCENARIOS[route](fixture)
+            except Exception as error:
+                with lock:
+                    samples.setdefault('setup', []).append((0.0, 0, repr(error)))
+                return
+            for probe in probes:
+                if label and probe.label != label:
+                    continue
+                try:
+                    outcome = worker.send(probe, fixture)
+                except Exception as error:
+                    outcome = (0.0, 0, repr(error))
+                with lock:
+                    samples.setdefault(probe.label, []).append(outcome)
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as pool:
+            list(pool.map(one, range(requests)))
+        wall = time.perf_counter() - started
+    results = {}
+    for probe_label, outcomes in samples.items():
+        ok = [outcome for outcome in outcomes if isinstance(outcome[2], int) and outcome[2] < 400]
+        latencies = sorted(outcome[0] for outcome in ok)
+        queries = [outcome[1] for outcome in ok]
+        errors = {}
+        for outcome in outcomes:
+            if outcome not in ok:
+                errors[str(outcome[2])] = errors.get(str(outcome[2]), 0) + 1
+        results[probe_label] = {
+            'requests': len(outcomes),
+            'errors': errors,
+            'throughput_rps': len(outcomes) / wall if wall else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 50) * 1000,
+                'p95': percentile(latencies, 95) * 1000,
+                'p99': percentile(latencies, 99) * 1000,
+                'mean': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            },
+            'queries_per_request': {'mean': sum(queries) / len(queries) if queries else 0.0,
+                                    'max': max(queries, default=0)},
+            'rss_peak_mb': rss.peak / 2 ** 20,
+            'rss_growth_mb': (rss.peak - rss.baseline) / 2 ** 20,
+        }
+    return results
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_suite(fixtures, requests=200, concurrency=8, routes=None, progress=None):
+    """Drive every route in backend/api/urls.py (or `routes`) and return a JSON-ready report."""
+    names = [pattern.name for pattern in urlpatterns]
+    missing = [name for name in names if name not in SCENARIOS]
+    if missing:
+        raise ValueError(f'No benchmark scenario for route(s): {", ".join(missing)}.')
+    endpoints = {}
+    # Mail goes nowhere: the benchmark measures the request path, not the mail server
+    with override_settings(EMAIL_BACKEND='django.core.mail.backends.dummy.EmailBackend',
+                           ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for route in routes or names:
+            for label, result in run_endpoint(route, fixtures, requests, concurrency).items():
+                endpoints[f'{route}:{label}'] = result
+                if progress:
+                    progress(f'{route}:{label}', result)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cpus': os.cpu_count(),
+            'creators': len(fixtures),
+            'requests_per_endpoint': requests,
+            'concurrency': concurrency,
+        },
+        'endpoints': endpoints,
+    }
+
+def compare(report, baseline, threshold=1.25):
+    """Regressions against a baseline report: p95 latency above `threshold` times the baseline, more queries
+    per request, or new errors. Returns a list of messages."""
+    regressions = []
+    for name, result in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        p95, old_p95 = result['latency_ms']['p95'], before['latency_ms']['p95']
+        if old_p95 and p95 > old_p95 * threshold:
+            regressions.append(f'{name}: p95 {old_p95:.1f}ms -> {p95:.1f}ms')
+        queries, old_queries = result['queries_per_request']['max'], before['queries_per_request']['max']
+        if queries > old_queries:
+            regressions.append(f'{name}: up to {queries} queries per request, was {old_queries}')
+        if sum(result['errors'].values()) > sum(before['errors'].values()):
+            regressions.append(f'{name}: errors {before["errors"]} -> {result["errors"]}')
+    return regressions
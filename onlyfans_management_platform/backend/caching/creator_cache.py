@@ -0,0 +1,168 @@
+
+from django.conf import settings
+from django.core.cache import caches
+from ..profiling.recorder import note_cache_lookup
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+FANS = 'fans'
+ANALYTICS = 'analytics'
+VAULT = 'vault'
+ALL_CREATORS = 'all'  # Scope owner for views that list every creator's rows (superusers)
+
+HIT_LOCAL = 'hit_local'
+HIT_SHARED = 'hit_shared'
+MISS = 'miss'
+OUTCOMES = (HIT_LOCAL, HIT_SHARED, MISS)
+STATS_FLUSH_INTERVAL = 10.0
+
+class LocalLRU:
+    """A small in-process tier in front of the shared cache; the least recently used entry goes first."""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class CreatorCache:
+    """Read-through cache for per-creator view data, keyed by (creator, scope, view arguments).
+
+    Every (creator, scope) pair has a version number in the shared cache and entry keys include it,
+    so invalidate() is one increment and stale entries are never read again; they age out of the
+    shared cache by timeout and out of the local tier by LRU. A lookup is one shared-cache read for
+    the version, then the local tier, then the shared cache, then `compute`.
+
+    The shared backend (CREATOR_CACHE_ALIAS) has to be shared between processes, e.g. Redis or
+    Memcached, for invalidation in one process to reach the others.
+    """
+
+    missing = object()
+
+    def __init__(self, alias=None, timeout=None, local_size=None):
+        self._alias = alias
+        self._timeout = timeout
+        self.local = LocalLRU(local_size if local_size is not None else getattr(settings, 'CREATOR_CACHE_LOCAL_SIZE', 1024))
+        self._stats_lock = threading.Lock()
+        self._local_stats = {}
+        self._unflushed = {}
+        self._next_flush = time.monotonic() + STATS_FLUSH_INTERVAL
+
+    @property
+    def shared(self):
+        return caches[self._alias or getattr(settings, 'CREATOR_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else getattr(settings, 'CREATOR_CACHE_TIMEOUT', 300)
+
+    # -- Versions --
+
+    def _version_key(self, creator_id, scope):
+        return f'creator-cache:v:{scope}:{creator_id}'
+
+    def version(self, creator_id, scope):
+        key = self._version_key(creator_id, scope)
+        version = self.shared.get(key)
+        if version is None:
+            # Start from the clock so a version key evicted from the cache never revives old entries
+            version = time.time_ns()
+            if not self.shared.add(key, version, timeout=None):
+                version = self.shared.get(key, version)
+        return version
+
+    def invalidate(self, creator_id, scope):
+        key = self._version_key(creator_id, scope)
+        try:
+            self.shared.incr(key)
+        except ValueError:
+            self.shared.set(key, time.time_ns(), timeout=None)
+
+    # -- Lookups --
+
+    def get_or_compute(self, creator_id, scope, view, arguments, compute):
+        digest = hashlib.sha1(repr(arguments).encode()).hexdigest()
+        key = f'creator-cache:{scope}:{creator_id}:{self.version(creator_id, scope)}:{view}:{digest}'
+        value = self.local.get(key, self.missing)
+        if value is not self.missing:
+            self._count(view, HIT_LOCAL)
+            return value
+        value = self.shared.get(key, self.missing)
+        if value is not self.missing:
+            self._count(view, HIT_SHARED)
+        else:
+            self._count(view, MISS)
+            value = compute()
+            self.shared.set(key, value, timeout=self.timeout)
+        self.local.set(key, value)
+        return value
+
+    # -- Counters --
+
+    def _count(self, view, outcome):
+        note_cache_lookup(outcome)
+        with self._stats_lock:
+            for counters in (self._local_stats, self._unflushed):
+                counters[view, outcome] = counters.get((view, outcome), 0) + 1
+            due = time.monotonic() >= self._next_flush
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add this process's counts since the last flush to the totals in the shared cache."""
+        with self._stats_lock:
+            pending, self._unflushed = self._unflushed, {}
+            self._next_flush = time.monotonic() + STATS_FLUSH_INTERVAL
+        for (view, outcome), count in pending.items():
+            key = f'creator-cache:stats:{view}:{outcome}'
+            if not self.shared.add(key, count, timeout=None):
+                self.shared.incr(key, count)
+            self._register_view(view)
+
+    def _register_view(self, view):
+        views = self.shared.get('creator-cache:stats:views', ())
+        if view not in views:
+            self.shared.set('creator-cache:stats:views', tuple(views) + (view,), timeout=None)
+
+    def stats(self):
+        """Counts per view for this process and, as of each process's last flush, for all of them."""
+        with self._stats_lock:
+            local = dict(self._local_stats)
+        views = set(self.shared.get('creator-cache:stats:views', ())) | {view for view, _ in local}
+        shared = self.shared.get_many([f'creator-cache:stats:{view}:{outcome}' for view in views for outcome in OUTCOMES])
+        report = {}
+        for view in sorted(views):
+            report[view] = {
+                'process': {outcome: local.get((view, outcome), 0) for outcome in OUTCOMES},
+                'all': {outcome: shared.get(f'creator-cache:stats:{view}:{outcome}', 0) for outcome in OUTCOMES},
+            }
+            for counts in report[view].values():
+                lookups = sum(counts.values())
+                counts['hit_rate'] = (lookups - counts[MISS]) / lookups if lookups else 0.0
+        return report
+
+creator_cache = CreatorCache()
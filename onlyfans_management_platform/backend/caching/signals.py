@@ -0,0 +1,36 @@
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from ..models.models import AnalyticsData, CreatorVault, Fan, MediaDerivative
+from ..sharding.shards import fan_out
+from .creator_cache import ALL_CREATORS, ANALYTICS, FANS, VAULT, creator_cache
+
+def invalidate_on_commit(creator_id, scope):
+    # After commit, so a reader can't repopulate the new version from rows that are about to change
+    transaction.on_commit(lambda: creator_cache.invalidate(creator_id, scope))
+
+@receiver(post_save, sender=Fan)
+@receiver(post_delete, sender=Fan)
+def fans_changed(sender, instance, **kwargs):
+    invalidate_on_commit(instance.creator_id, FANS)
+
+@receiver(post_save, sender=AnalyticsData)
+@receiver(post_delete, sender=AnalyticsData)
+def analytics_changed(sender, instance, **kwargs):
+    invalidate_on_commit(instance.creator_id, ANALYTICS)
+
+@receiver(post_save, sender=CreatorVault)
+@receiver(post_delete, sender=CreatorVault)
+def vault_changed(sender, instance, **kwargs):
+    invalidate_on_commit(instance.creator_id, VAULT)
+    invalidate_on_commit(ALL_CREATORS, VAULT)
+
+@receiver(post_save, sender=MediaDerivative)
+def derivative_changed(sender, instance, **kwargs):
+    # Vault listings show ready thumbnails, so every vault pointing at the blob goes stale
+    if instance.status == MediaDerivative.READY:
+        creators = set().union(*fan_out(lambda alias: CreatorVault.objects.using(alias).filter(
+            content_file=instance.blob.name).values_list('creator_id', flat=True)))
+        for creator_id in creators | {ALL_CREATORS}:
+            invalidate_on_commit(creator_id, VAULT)
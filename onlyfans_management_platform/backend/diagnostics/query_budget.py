@@ -0,0 +1,217 @@
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..api.urls import urlpatterns
+from ..audit.pipeline import audit_pipeline
+from ..security.mail import mail_sender
+from ..sharding.shards import for_creator, shard_aliases, shard_map
+from ..sharding.signals import mirror_users
+from ..models.models import (
+    AIRecommendation,
+    ActionSuggestion,
+    AnalyticsData,
+    AutomationFlow,
+    ContentBlob,
+    ContentSchedule,
+    CreatorVault,
+    Fan,
+    UploadSession,
+)
+from collections import namedtuple
+from contextlib import ExitStack
+from datetime import timedelta
+import hashlib
+import json
+import uuid
+
+# One request against a route: who sends it and what, given the fixture
+Probe = namedtuple('Probe', 'label role method path kwargs')
+Measurement = namedtuple('Measurement', 'route label small large queries')
+
+class QueryBudgetError(AssertionError):
+    pass
+
+class Fixture:
+    """`rows` rows of every model the views list, for one creator and for a second creator.
+
+    Rows are bulk-created on each creator's shard, so no signals fire and nothing lands in storage.
+    """
+
+    def __init__(self, rows):
+        tag = uuid.uuid4().hex[:12]
+        self.creator = User.objects.create_user(f'budget-creator-{tag}', email=f'budget-creator-{tag}@example.com')
+        self.other = User.objects.create_user(f'budget-other-{tag}')
+        self.superuser = User.objects.create_superuser(f'budget-admin-{tag}')
+        # The users are mirrored to the shards on commit, which never comes
+        mirror_users([self.creator, self.other, self.superuser])
+        now = timezone.now()
+        for owner in (self.creator, self.other):
+            with for_creator(owner.pk):
+                self._create_rows(owner, rows, now)
+        with for_creator(self.creator.pk):
+            self.vault = CreatorVault.objects.filter(creator=self.creator).order_by('pk').first()
+            self.fan = Fan.objects.filter(creator=self.creator).order_by('pk').first()
+            self.upload = UploadSession.objects.create(creator=self.creator, target=UploadSession.VAULT,
+                                                       filename='budget.bin', total_size=1, chunk_size=1)
+        self.blob = ContentBlob.objects.get(name=self.vault.content_file.name)
+        self.import_body = ''.join(json.dumps({'fan_name': f'imported-{i}', 'fan_data': {'total_spend': i}}) + '\n'
+                                   for i in range(rows))
+
+    @staticmethod
+    def _create_rows(owner, rows, now):
+        digests = [hashlib.sha256(f'{owner.pk}-{i}'.encode()).hexdigest() for i in range(rows)]
+        blobs = ContentBlob.objects.bulk_create(
+            ContentBlob(sha256=digest, name=f'blobs/{digest[:2]}/{digest}.bin', size=1,
+                        content_type='application/octet-stream', ref_count=1, last_used_at=now)
+            for digest in digests)
+        CreatorVault.objects.bulk_create(CreatorVault(creator=owner, content_file=blob.name) for blob in blobs)
+        ContentSchedule.objects.bulk_create(
+            ContentSchedule(creator=owner, content=blob.name, schedule_time=now + timedelta(hours=1)) for blob in blobs)
+        Fan.objects.bulk_create(
+            Fan(creator=owner, fan_name=f'fan-{i}', segment='regular', fan_data={'total_spend': i}, total_spend=i)
+            for i in range(rows))
+        AnalyticsData.objects.bulk_create(
+            AnalyticsData(creator=owner, engagement_rate=0.1, fan_growth=1, revenue=1.0, content_performance={})
+            for _ in range(rows))
+        AutomationFlow.objects.bulk_create(
+            AutomationFlow(creator=owner, trigger_event='tip', action_taken='thank') for _ in range(rows))
+        ActionSuggestion.objects.bulk_create(
+            ActionSuggestion(creator=owner, action_description='post', projected_outcome='more') for _ in range(rows))
+        AIRecommendation.objects.bulk_create(AIRecommendation(creator=owner, recommendation='post') for _ in range(rows))
+
+def _get(label, role, path):
+    return Probe(label, role, 'get', path, {})
+
+# Requests per route name in backend/api/urls.py. Routes mapped to a string are not measured, for the reason given.
+PROBES = {
+    'vault': lambda f: [_get('creator', 'creator', reverse('vault')), _get('superuser', 'superuser', reverse('vault'))],
+    'vault_media': lambda f: [Probe('not modified', 'creator', 'get', reverse('vault_media', args=[f.vault.pk]),
+                                    {'HTTP_IF_NONE_MATCH': f'"{f.blob.sha256}"'})],
+    'admin_vault_access': lambda f: [_get('superuser', 'superuser', reverse('admin_vault_access', args=[f.vault.pk]))],
+    'fan_management_dashboard': lambda f: [
+        _get('creator', 'creator', reverse('fan_management_dashboard')),
+        _get('filtered', 'creator', reverse('fan_management_dashboard') + '?total_spend_min=1&segment=regular'),
+    ],
+    'fan_detail': lambda f: [_get('creator', 'creator', reverse('fan_detail', args=[f.fan.pk]))],
+    'fan_import': lambda f: [Probe('jsonl', 'creator', 'post', reverse('fan_import') + '?format=jsonl',
+                                   {'data': f.import_body, 'content_type': 'application/x-ndjson'})],
+    'fan_export': lambda f: [_get('csv', 'creator', reverse('fan_export') + '?format=csv'),
+                             _get('jsonl', 'creator', reverse('fan_export') + '?format=jsonl')],
+    'action_suggestions': lambda f: [_get('form', 'creator', reverse('action_suggestions')),
+                                     Probe('submit', 'creator', 'post', reverse('action_suggestions'),
+                                           {'data': {'action_description': 'post a teaser'}})],
+    'analytics_data': lambda f: [_get('creator', 'creator', reverse('analytics_data'))],
+    'automation_flows': lambda f: [_get('creator', 'creator', reverse('automation_flows'))],
+    'content_scheduling': lambda f: [_get('creator', 'creator', reverse('content_scheduling'))],
+    'onboarding': lambda f: [_get('creator', 'creator', reverse('onboarding'))],
+    'ai_recommendations': lambda f: [_get('form', 'creator', reverse('ai_recommendations')),
+                                     Probe('submit', 'creator', 'post', reverse('ai_recommendations'), {})],
+    'start_chunked_upload': lambda f: [Probe('vault', 'creator', 'post', reverse('start_chunked_upload'),
+                                             {'data': {'target': 'vault', 'filename': 'a.bin', 'total_size': 10}})],
+    'chunked_upload_status': lambda f: [_get('creator', 'creator', reverse('chunked_upload_status', args=[f.upload.pk]))],
+    'upload_chunk': 'writes chunk data to storage; its queries depend on the chunk, not on stored rows',
+    'finish_chunked_upload': 'assembles chunks from storage; its queries depend on the chunk count, not on stored rows',
+    'cache_stats': lambda f: [_get('superuser', 'superuser', reverse('cache_stats'))],
+    'profiling_metrics': lambda f: [_get('superuser', 'superuser', reverse('profiling_metrics'))],
+    'send_two_factor_code': lambda f: [Probe('creator', 'creator', 'post', reverse('send_two_factor_code'), {})],
+    'verify_two_factor_code': 'answers 400 without a live code; it reads only the cache and the session',
+}
+
+# Stand-ins for the page templates, loaded from memory. Each reads what its page shows (rows, the foreign keys read per
+# row, the user and messages every page has), so queries run while rendering are counted.
+PAGE = '{{ user.username }}{% for message in messages %}{{ message }}{% endfor %}'
+PAGE_TEMPLATES = {
+    'vault.html': PAGE + '{% for vault in vaults %}{{ vault.creator.username }}{{ vault.content_file.name }}'
+                         '{{ vault.derivative }}{{ vault.is_public }}{% endfor %}',
+    'admin_view_vault.html': PAGE + '{{ creator_vault.creator.username }}{{ creator_vault.content_file.name }}',
+    'fan_management_dashboard.html': PAGE + '{% for fan in fans %}{% for value in fan.values %}{{ value }}{% endfor %}'
+                                            '{% endfor %}{{ segment }}{{ next_cursor }}',
+    'fan_detail.html': PAGE + '{{ fan.fan_name }}{{ fan.segment }}{{ fan.fan_data }}{{ fan.last_interaction }}',
+    'action_suggestions.html': PAGE,
+    'action_suggestion_result.html': PAGE + '{{ action_description }}{{ projected_outcome }}',
+    'analytics_dashboard.html': PAGE + '{% for bucket in hourly %}{{ bucket.bucket_start }}{% endfor %}'
+                                       '{% for bucket in daily %}{{ bucket.bucket_start }}{% endfor %}'
+                                       '{% for bucket in weekly %}{{ bucket.bucket_start }}{% endfor %}{{ totals }}',
+    'automation_dashboard.html': PAGE,
+    'content_scheduling.html': PAGE,
+    'onboarding.html': PAGE,
+    'ai_recommendations.html': PAGE,
+    'ai_recommendation_result.html': PAGE + '{{ recommendation }}',
+}
+
+def measure(probe, fixture):
+    """Queries run by one request on every shard, including any streamed body."""
+    client = Client()
+    client.force_login(getattr(fixture, probe.role))
+    kwargs = dict(probe.kwargs)
+    with ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in shard_aliases()]
+        response = getattr(client, probe.method)(probe.path, **kwargs)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+    if response.status_code >= 400:
+        raise QueryBudgetError(f'{probe.method.upper()} {probe.path} as {probe.role} returned {response.status_code}.')
+    return [query['sql'] for context in captured for query in context.captured_queries]
+
+def _measure_all(rows, routes):
+    results = {}
+    # Each size gets its own rows, rolled back afterwards on every shard; the creator cache is switched off so every
+    # request reaches the database, and audit rows are written inline so they land in (and are counted within) the
+    # same transactions
+    with audit_pipeline.inline(), ExitStack() as stack:
+        for alias in shard_aliases():
+            stack.enter_context(transaction.atomic(using=alias))
+        fixture = Fixture(rows)
+        for route in routes:
+            for probe in PROBES[route](fixture):
+                results[route, probe.label] = measure(probe, fixture)
+        for alias in shard_aliases():
+            transaction.set_rollback(True, using=alias)
+    # The map entries of the rolled-back creators are gone
+    shard_map.changed()
+    return results
+
+def check_query_budgets(small=2, large=20, routes=None):
+    """Run every route's probes over a small and a large fixture and return a Measurement per probe.
+
+    A route whose query count rises with the fixture size issues queries per row (N+1); use
+    assert_query_budgets to turn that into a failure.
+    """
+    names = [pattern.name for pattern in urlpatterns]
+    missing = [name for name in names if name not in PROBES]
+    if missing:
+        raise QueryBudgetError(f'No query budget probe for route(s): {", ".join(missing)}.')
+    routes = [name for name in (routes or names) if callable(PROBES[name])]
+    caches = {alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'} for alias in settings.CACHES}
+    templates = [{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {
+            'context_processors': ['django.template.context_processors.request',
+                                   'django.contrib.auth.context_processors.auth',
+                                   'django.contrib.messages.context_processors.messages'],
+            'loaders': [('django.template.loaders.locmem.Loader', PAGE_TEMPLATES)],
+        },
+    }]
+    # Fan-out runs on this thread, so superuser listings see the uncommitted fixture and their queries are captured
+    with override_settings(CACHES=caches, TEMPLATES=templates, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                           EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', SHARD_FAN_OUT_WORKERS=1):
+        small_counts = _measure_all(small, routes)
+        large_counts = _measure_all(large, routes)
+        mail_sender.flush()
+    return [Measurement(route, label, len(small_counts[route, label]), len(queries), queries)
+            for (route, label), queries in large_counts.items()]
+
+def assert_query_budgets(small=2, large=20, routes=None):
+    """Raise QueryBudgetError if any route runs more queries for `large` rows than for `small`."""
+    measurements = check_query_budgets(small, large, routes)
+    growing = [m for m in measurements if m.large > m.small]
+    if growing:
+        raise QueryBudgetError('Query count grows with row count: ' + '; '.join(
+            f'{m.route} ({m.label}) {m.small} -> {m.large}' for m in growing))
+    return measurements
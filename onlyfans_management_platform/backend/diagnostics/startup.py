@@ -0,0 +1,75 @@
+
+from django.conf import settings
+from collections import namedtuple
+import os
+import subprocess
+import sys
+import time
+
+# Imported by a worker before it serves its first request: the app registry (models, signals) and the URLconf
+BOOT_MODULES = ('backend.api.urls',)
+# Only the jobs and views that need these (scoring, segmentation, rendering, outbound calls, advice) may load them
+LAZY_MODULES = ('numpy', 'PIL', 'httpx', 'backend.recommendations')
+DEFAULT_BUDGET_MS = 1500
+
+Import = namedtuple('Import', 'module self_us cumulative_us depth')
+Startup = namedtuple('Startup', 'wall_ms import_ms imports')
+
+class StartupBudgetError(AssertionError):
+    pass
+
+def parse_importtime(output):
+    """Import entries from `python -X importtime` stderr, in the order they finished."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        module = name.lstrip()
+        imports.append(Import(module.strip(), int(self_us), int(cumulative_us), (len(name) - len(module) - 1) // 2))
+    return imports
+
+def boot_modules():
+    root = getattr(settings, 'ROOT_URLCONF', None)
+    return list(dict.fromkeys(BOOT_MODULES + ((root,) if root else ())))
+
+def measure_startup(modules=None, runs=1):
+    """Boot Django and import `modules` in a fresh interpreter under -X importtime; the fastest of `runs` boots.
+
+    Runs with this process's settings module and sys.path, so it measures the deployment it's run from.
+    """
+    code = 'import django; django.setup(); ' + '; '.join(f'import {module}' for module in modules or boot_modules())
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    best = None
+    for _ in range(max(runs, 1)):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, env=env)
+        wall_ms = (time.perf_counter() - started) * 1000
+        if result.returncode:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            raise StartupBudgetError('Startup failed:\n' + '\n'.join(errors[-20:]))
+        imports = parse_importtime(result.stderr)
+        startup = Startup(wall_ms, sum(entry.self_us for entry in imports) / 1000, imports)
+        if best is None or startup.import_ms < best.import_ms:
+            best = startup
+    return best
+
+def budget_violations(startup, budget_ms=None):
+    """Why `startup` is too slow, if it is: modules that should load lazily, and time over STARTUP_IMPORT_BUDGET_MS."""
+    budget_ms = budget_ms or getattr(settings, 'STARTUP_IMPORT_BUDGET_MS', DEFAULT_BUDGET_MS)
+    violations = []
+    eager = sorted({lazy for entry in startup.imports for lazy in LAZY_MODULES
+                    if entry.module == lazy or entry.module.startswith(lazy + '.')})
+    if eager:
+        violations.append(f'Startup imports {", ".join(eager)}; import it inside the code that needs it.')
+    if startup.import_ms > budget_ms:
+        violations.append(f'Startup imports take {startup.import_ms:.0f}ms, over the {budget_ms:.0f}ms budget.')
+    return violations
+
+def assert_startup_budget(budget_ms=None, modules=None, runs=3):
+    """Raise StartupBudgetError if the fastest of `runs` boots breaks the budget. Returns that boot's Startup."""
+    startup = measure_startup(modules, runs)
+    violations = budget_violations(startup, budget_ms)
+    if violations:
+        raise StartupBudgetError(' '.join(violations))
+    return startup
@@ -0,0 +1,139 @@
+
+from django.utils import timezone
+from ..caching.creator_cache import FANS, creator_cache
+from ..models.models import PROMOTED_FAN_FIELDS, Fan
+from ..sharding.shards import current_shard
+import csv
+import json
+
+CSV = 'csv'
+JSONL = 'jsonl'
+FORMATS = (CSV, JSONL)
+DEFAULT_BATCH_SIZE = 2000
+EXPORT_COLUMNS = ('fan_name', 'segment', 'last_interaction', 'fan_data')
+MAX_REPORTED_ERRORS = 20
+
+class ImportResult:
+    def __init__(self):
+        self.processed = 0
+        self.written = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'line {line}: {message}')
+
+    def as_dict(self):
+        return {'processed': self.processed, 'written': self.written, 'rejected': self.rejected, 'errors': self.errors}
+
+def read_records(lines, fmt):
+    """Yield (line_number, record dict or error message) from a text stream without reading it all.
+
+    CSV needs a fan_name column; a fan_data column holds JSON and any other unknown columns are
+    folded into fan_data. JSONL lines are objects with the same keys.
+    """
+    if fmt == CSV:
+        reader = csv.DictReader(lines)
+        for record in reader:
+            line = reader.line_num
+            try:
+                fan_data = json.loads(record.pop('fan_data', None) or '{}')
+            except ValueError:
+                yield line, 'fan_data is not valid JSON'
+                continue
+            # last_interaction is in exports but is always set by the import itself
+            record.pop('last_interaction', None)
+            for column in list(record):
+                if column not in ('fan_name', 'segment') and record[column] not in (None, ''):
+                    fan_data[column] = record.pop(column)
+            record['fan_data'] = fan_data
+            yield line, record
+    elif fmt == JSONL:
+        for line, text in enumerate(lines, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError:
+                yield line, 'not valid JSON'
+                continue
+            yield line, record if isinstance(record, dict) else 'not a JSON object'
+    else:
+        raise ValueError(f'Unknown format {fmt!r}.')
+
+def _flush(creator, batch, result):
+    now = timezone.now()
+    fans = [Fan(creator=creator, fan_name=name, fan_data=fan_data, segment=segment, last_interaction=now)
+            for name, (fan_data, segment) in batch.items()]
+    # bulk_create skips save(), so the promoted columns are filled in here
+    for fan in fans:
+        fan.sync_promoted_fields()
+    Fan.objects.bulk_create(
+        fans,
+        update_conflicts=True,
+        unique_fields=['creator', 'fan_name'],
+        update_fields=['fan_data', 'segment', 'last_interaction', 'updated_at', *PROMOTED_FAN_FIELDS],
+    )
+    # bulk_create sends no signals
+    creator_cache.invalidate(creator.pk, FANS)
+    result.written += len(batch)
+    batch.clear()
+
+def import_fans(creator, records, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Upsert fans on (creator, fan_name) in batches, holding at most one batch in memory.
+
+    `records` is what read_records yields; `progress(result)` is called after every batch.
+    """
+    result = ImportResult()
+    batch = {}
+    for line, record in records:
+        result.processed += 1
+        if isinstance(record, str):
+            result.reject(line, record)
+            continue
+        name = str(record.get('fan_name') or '').strip()
+        fan_data = record.get('fan_data') or {}
+        if not name or len(name) > 255:
+            result.reject(line, 'fan_name is missing or longer than 255 characters')
+            continue
+        if not isinstance(fan_data, dict):
+            result.reject(line, 'fan_data must be an object')
+            continue
+        # Duplicates inside one batch would hit the same row twice in one upsert; the last one wins
+        batch[name] = (fan_data, str(record.get('segment') or '')[:50])
+        if len(batch) >= batch_size:
+            _flush(creator, batch, result)
+            if progress:
+                progress(result)
+    if batch:
+        _flush(creator, batch, result)
+        if progress:
+            progress(result)
+    return result
+
+class Echo:
+    """Write target for csv.writer that hands each row straight back."""
+
+    def write(self, value):
+        return value
+
+def export_fans(creator, fmt, chunk_size=DEFAULT_BATCH_SIZE):
+    """Return an iterator of the creator's fans as CSV or JSONL text, read through a server-side cursor."""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r}.')
+    # The shard is fixed here: a streaming response is read after the request's pin is gone
+    rows = Fan.objects.using(current_shard()).filter(creator=creator).order_by('id').values_list(*EXPORT_COLUMNS)
+    return _export_rows(rows.iterator(chunk_size=chunk_size), fmt)
+
+def _export_rows(rows, fmt):
+    if fmt == CSV:
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_COLUMNS)
+        for fan_name, segment, last_interaction, fan_data in rows:
+            yield writer.writerow([fan_name, segment, last_interaction.isoformat(), json.dumps(fan_data)])
+    elif fmt == JSONL:
+        for fan_name, segment, last_interaction, fan_data in rows:
+            yield json.dumps({'fan_name': fan_name, 'segment': segment,
+                              'last_interaction': last_interaction.isoformat(), 'fan_data': fan_data}) + '\n'
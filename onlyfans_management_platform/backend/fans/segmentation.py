@@ -0,0 +1,143 @@
+
+from django.db import connections
+from django.utils import timezone
+from ..caching.creator_cache import FANS, creator_cache
+from ..models.models import Fan
+from ..sharding.shards import ShardMoving, for_creator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import logging
+import multiprocessing
+import numpy as np
+
+# Promoted fan_data columns the segmentation reads
+SPEND_KEY = 'total_spend'
+FREQUENCY_KEY = 'message_count'
+LAST_TIP_KEY = 'last_tip_at'
+
+CHAMPION = 'champion'
+LOYAL = 'loyal'
+BIG_SPENDER = 'big_spender'
+NEW = 'new'
+AT_RISK = 'at_risk'
+HIBERNATING = 'hibernating'
+REGULAR = 'regular'
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_BATCH_SIZE = 2000
+
+def _floats(values):
+    return np.array([value if value is not None else np.nan for value in values], dtype=np.float64)
+
+def _epochs(values):
+    return np.array([value.timestamp() if value is not None else np.nan for value in values], dtype=np.float64)
+
+def load_features(creator_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Read a creator's fans in chunks into arrays: pk, current segment, last seen (epoch), frequency, spend.
+
+    Reads the promoted, already-typed columns, so fan_data itself never leaves the database.
+    """
+    rows = (Fan.objects.filter(creator_id=creator_id).order_by('pk')
+            .values_list('pk', 'segment', 'last_interaction', LAST_TIP_KEY, FREQUENCY_KEY, SPEND_KEY)
+            .iterator(chunk_size=chunk_size))
+    chunks = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        pks, segments, last_interaction, last_tip, frequency, spend = zip(*chunk)
+        chunks.append((
+            np.array(pks, dtype=np.int64),
+            np.array(segments, dtype=object),
+            np.fmax(_epochs(last_interaction), _epochs(last_tip)),
+            np.nan_to_num(_floats(frequency)),
+            np.nan_to_num(_floats(spend)),
+        ))
+    if not chunks:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0), np.empty(0), np.empty(0))
+    return tuple(np.concatenate(column) for column in zip(*chunks))
+
+def quintile_scores(values, zero_is_lowest=False):
+    """Score each value 1-5 by which fifth of this creator's distribution its tie-averaged rank falls in.
+
+    Tied values share a score, so a block of equal values lands in the middle of the fifths it spans
+    rather than all at the top. With `zero_is_lowest`, zero and missing values (no spend, no messages)
+    score 1 and only the positive values are ranked.
+    """
+    scores = np.ones(len(values), dtype=np.int8)
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=-np.inf)
+    ranked = values > 0 if zero_is_lowest else np.ones(len(values), dtype=bool)
+    if ranked.any():
+        _, inverse, counts = np.unique(values[ranked], return_inverse=True, return_counts=True)
+        average_rank = (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+        fifths = ((average_rank - 0.5) / len(inverse) * 5).astype(np.int8)
+        scores[ranked] = np.minimum(fifths, 4) + 1
+    return scores
+
+def assign_segments(recency, frequency, spend):
+    """RFM scores to segment names; the first matching rule wins."""
+    return np.select(
+        [
+            (recency >= 4) & (frequency >= 4) & (spend >= 4),
+            (recency >= 3) & (frequency >= 4),
+            (recency >= 3) & (spend >= 4),
+            (recency >= 4) & (frequency <= 2),
+            (recency <= 2) & ((frequency >= 3) | (spend >= 3)),
+            recency <= 2,
+        ],
+        [CHAMPION, LOYAL, BIG_SPENDER, NEW, AT_RISK, HIBERNATING],
+        default=REGULAR,
+    ).astype(object)
+
+def segment_creator(creator_id, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+    """Re-segment one creator's fans on their shard and write back only the rows whose segment changed.
+
+    Returns (fans scored, fans changed).
+    """
+    with for_creator(creator_id):
+        pks, current, last_seen, frequency, spend = load_features(creator_id, chunk_size)
+        days_idle = (timezone.now().timestamp() - np.nan_to_num(last_seen, nan=0.0)) / 86400
+        segments = assign_segments(quintile_scores(-days_idle), quintile_scores(frequency, zero_is_lowest=True),
+                                   quintile_scores(spend, zero_is_lowest=True))
+        changed = np.flatnonzero(segments != current)
+        now = timezone.now()
+        for start in range(0, len(changed), batch_size):
+            rows = changed[start:start + batch_size]
+            Fan.objects.bulk_update([Fan(pk=int(pks[i]), segment=segments[i], updated_at=now) for i in rows],
+                                    ['segment', 'updated_at'])
+    if len(changed):
+        creator_cache.invalidate(creator_id, FANS)
+    return len(pks), len(changed)
+
+def _setup_worker():
+    import django
+    django.setup()
+
+def _segment_or_skip(creator_id, chunk_size, batch_size):
+    try:
+        return creator_id, segment_creator(creator_id, chunk_size, batch_size)
+    except ShardMoving:
+        logging.warning(f"Skipped segmenting creator {creator_id}: their rows are being moved to another shard.")
+        return creator_id, (0, 0)
+
+def _segment_in_worker(creator_id, chunk_size, batch_size):
+    try:
+        return _segment_or_skip(creator_id, chunk_size, batch_size)
+    finally:
+        connections.close_all()
+
+def segment_creators(creator_ids, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield (creator_id, (scored, changed)) for each creator, spreading creators over a process pool.
+
+    A creator being moved to another shard is skipped and yields (0, 0).
+    """
+    if workers <= 1:
+        for creator_id in creator_ids:
+            yield _segment_or_skip(creator_id, chunk_size, batch_size)
+        return
+    connections.close_all()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_setup_worker) as pool:
+        futures = [pool.submit(_segment_in_worker, creator_id, chunk_size, batch_size) for creator_id in creator_ids]
+        for future in futures:
+            yield future.result()
@@ -0,0 +1,31 @@
+
+# Logging for the backend, configured once per process from settings:
+#
+#     from backend.logconfig import logging_config
+#     LOGGING = logging_config()
+#
+# Without LOGGING in settings, BackendConfig.ready() applies logging_config() itself. Nothing here
+# imports Django, so settings can import it; the handler class is resolved by dictConfig at setup.
+
+LOG_DIR = 'logs/backend'
+FORMAT = '%(asctime)s %(levelname)s:%(message)s'
+
+def logging_config(log_dir=LOG_DIR, level='INFO'):
+    """Root records go to actions.log and 'backend.security' records to security.log, both through the audit writer."""
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'plain': {'format': FORMAT},
+        },
+        'handlers': {
+            'actions': {'class': 'backend.audit.pipeline.AuditFileHandler', 'filename': f'{log_dir}/actions.log',
+                        'formatter': 'plain'},
+            'security': {'class': 'backend.audit.pipeline.AuditFileHandler', 'filename': f'{log_dir}/security.log',
+                         'formatter': 'plain'},
+        },
+        'root': {'handlers': ['actions'], 'level': level},
+        'loggers': {
+            'backend.security': {'handlers': ['security'], 'level': level, 'propagate': False},
+        },
+    }
@@ -0,0 +1,51 @@
+
+from django.core.management.base import BaseCommand
+from ...automation.engine import AutomationEngine, fan_event, register_action
+import random
+import time
+
+TRIGGERS = ('new_subscriber', 'tip', 'message', 'renewal', 'expired', 'purchase', 'like', 'comment')
+
+@register_action('benchmark noop')
+def noop_action(flow_id, action, event):
+    pass
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+class Command(BaseCommand):
+    help = 'Measure automation engine throughput and latency on synthetic flows and events (no database).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--creators', type=int, default=2000)
+        parser.add_argument('--flows-per-creator', type=int, default=5)
+        parser.add_argument('--events', type=int, default=200000)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--rate', type=float, default=0, help='Events per second to offer; 0 submits as fast as possible.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        engine = AutomationEngine(workers=options['workers'])
+        engine.index.replace(
+            (creator * options['flows_per_creator'] + n, creator, rng.choice(TRIGGERS), 'benchmark noop')
+            for creator in range(options['creators']) for n in range(options['flows_per_creator']))
+        events = [(rng.randrange(options['creators']), rng.choice(TRIGGERS)) for _ in range(options['events'])]
+
+        engine.start(load=False)
+        started = time.perf_counter()
+        for sent, (creator_id, trigger) in enumerate(events):
+            if options['rate']:
+                delay = started + sent / options['rate'] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            engine.submit(fan_event(creator_id, trigger))
+        engine.stop()
+        elapsed = time.perf_counter() - started
+
+        executions = sum(stats['executions'] for stats in engine.stats().values())
+        latencies = sorted(engine.latencies)
+        self.stdout.write(f"{len(engine.index)} flows, {options['events']} events, {executions} actions in {elapsed:.2f}s")
+        self.stdout.write(f"throughput: {options['events'] / elapsed:.0f} events/s, {executions / elapsed:.0f} actions/s")
+        if latencies:
+            self.stdout.write(f"event-to-action latency ms: p50={percentile(latencies, 50) * 1000:.2f} "
+                              f"p99={percentile(latencies, 99) * 1000:.2f} max={latencies[-1] * 1000:.2f}")
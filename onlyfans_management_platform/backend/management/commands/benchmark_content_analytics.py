@@ -0,0 +1,134 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from ...analytics.content_performance import ContentPerformanceBuilder
+from collections import defaultdict, deque
+import math
+import random
+import time
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+def synthetic_snapshots(count, items, seed, chunk_size=50000):
+    """Yield chunks of (epoch_seconds, content_performance) with roughly 80% of items present per snapshot."""
+    rng = random.Random(seed)
+    content_ids = [f'post-{i}' for i in range(items)]
+    for offset in range(0, count, chunk_size):
+        chunk = []
+        for row in range(offset, min(offset + chunk_size, count)):
+            chunk.append((row * 60.0, {
+                content_id: {'views': rng.randint(0, 5000), 'likes': rng.randint(0, 500), 'tips': round(rng.random() * 20, 2)}
+                for content_id in content_ids if rng.random() < 0.8
+            }))
+        yield chunk
+
+def _percentile(ordered, q):
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+class NaiveContentAnalytics:
+    """The per-row Python loop the vectorized engine replaces, kept for comparison."""
+
+    def __init__(self, window, period):
+        self.window = window
+        self.period = period
+        self.rows = 0
+        self.last_bucket = None
+        self.values = defaultdict(list)
+        self.recent = defaultdict(deque)
+        self.moving_average = {}
+        self.period_totals = defaultdict(lambda: defaultdict(float))
+
+    def add(self, timestamp, payload):
+        row = self.rows
+        self.rows += 1
+        bucket = self.last_bucket = int(timestamp // self.period)
+        for content_id, metrics in payload.items():
+            for metric, value in metrics.items():
+                key = (metric, content_id)
+                self.values[key].append(value)
+                self.period_totals[key][bucket] += value
+                recent = self.recent[key]
+                recent.append((row, value))
+                while recent[0][0] <= row - self.window:
+                    recent.popleft()
+                self.moving_average[key] = (row, sum(v for _, v in recent) / len(recent))
+
+    def summarize(self, top):
+        percentiles, totals, deltas = {}, defaultdict(dict), {}
+        for key, values in self.values.items():
+            ordered = sorted(values)
+            percentiles[key] = [_percentile(ordered, q) for q in PERCENTILES]
+            totals[key[0]][key[1]] = sum(values)
+            buckets = self.period_totals[key]
+            deltas[key] = buckets.get(self.last_bucket, 0.0) - buckets.get(self.last_bucket - 1, 0.0)
+        best = {metric: sorted(by_content.items(), key=lambda item: -item[1])[:top] for metric, by_content in totals.items()}
+        return percentiles, best, deltas
+
+class Command(BaseCommand):
+    help = 'Compare the NumPy content_performance engine with a naive per-row Python loop on synthetic snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshots', type=int, default=1000000)
+        parser.add_argument('--items', type=int, default=10, help='Content items per creator.')
+        parser.add_argument('--window', type=int, default=24, help='Moving-average window in snapshots.')
+        parser.add_argument('--period', type=int, default=7 * 86400, help='Period length in seconds.')
+        parser.add_argument('--top', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        naive = NaiveContentAnalytics(options['window'], options['period'])
+        builder = ContentPerformanceBuilder()
+        naive_seconds = load_seconds = 0.0
+        for chunk in synthetic_snapshots(options['snapshots'], options['items'], options['seed']):
+            started = time.perf_counter()
+            for timestamp, payload in chunk:
+                naive.add(timestamp, payload)
+            naive_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            for timestamp, payload in chunk:
+                builder.add(timestamp, payload)
+            load_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        naive_percentiles, naive_top, naive_deltas = naive.summarize(options['top'])
+        naive_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        frame = builder.build()
+        build_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        results = {}
+        for metric in frame.metrics:
+            results[metric] = (
+                frame.moving_average(metric, options['window']),
+                frame.percentiles(metric, PERCENTILES),
+                frame.top_content(metric, options['top']),
+                frame.period_over_period(metric, options['period'])[2],
+            )
+        compute_seconds = time.perf_counter() - started
+
+        for metric, (moving, percentiles, top, deltas) in results.items():
+            for column, content_id in enumerate(frame.content_ids):
+                key = (metric, content_id)
+                if key not in naive_percentiles:
+                    continue
+                if not np.allclose(percentiles[:, column], naive_percentiles[key]):
+                    raise CommandError(f'Percentile mismatch for {key}.')
+                if len(deltas) > 1 and not np.isclose(deltas[-1, column], naive_deltas[key]):
+                    raise CommandError(f'Period delta mismatch for {key}.')
+                row, average = naive.moving_average[key]
+                if not np.isclose(moving[row, column], average):
+                    raise CommandError(f'Moving average mismatch for {key}.')
+            if [content_id for content_id, _ in top] != [content_id for content_id, _ in naive_top[metric]]:
+                raise CommandError(f'Top content mismatch for {metric}.')
+
+        vectorized_seconds = load_seconds + build_seconds + compute_seconds
+        self.stdout.write(f"snapshots={len(frame)} items={len(frame.content_ids)} metrics={len(frame.metrics)}")
+        self.stdout.write(f"naive loop:      {naive_seconds:8.2f}s")
+        self.stdout.write(f"vectorized:      {vectorized_seconds:8.2f}s "
+                          f"(parse {load_seconds:.2f}s, columnize {build_seconds:.2f}s, compute {compute_seconds:.2f}s)")
+        self.stdout.write(f"speedup:         {naive_seconds / vectorized_seconds:8.1f}x overall, "
+                          f"{(naive_seconds - load_seconds) / max(build_seconds + compute_seconds, 1e-9):.1f}x past parsing")
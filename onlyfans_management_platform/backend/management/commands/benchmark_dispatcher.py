@@ -0,0 +1,71 @@
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from ...models.models import ContentSchedule
+from ...scheduling.dispatcher import Dispatcher, LocalPublishBackend
+from collections import Counter
+from datetime import timedelta
+import random
+import threading
+import time
+
+BENCHMARK_USER = 'dispatcher-benchmark'
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+class Command(BaseCommand):
+    help = 'Seed schedules due over a window, run dispatchers against them and report schedule_time-to-dispatch lag.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedules', type=int, default=20000)
+        parser.add_argument('--spread', type=float, default=60.0, help='Seconds over which the schedules fall due.')
+        parser.add_argument('--dispatchers', type=int, default=2)
+        parser.add_argument('--publish-workers', type=int, default=8)
+        parser.add_argument('--timeout', type=float, default=120.0)
+
+    def handle(self, *args, **options):
+        creator, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+        ContentSchedule.objects.filter(creator=creator).delete()
+        start = timezone.now() + timedelta(seconds=2)
+        ContentSchedule.objects.bulk_create([
+            ContentSchedule(creator=creator, content='benchmark/placeholder',
+                            schedule_time=start + timedelta(seconds=random.uniform(0, options['spread'])))
+            for _ in range(options['schedules'])
+        ], batch_size=2000)
+
+        backend = LocalPublishBackend()
+        stop = threading.Event()
+        dispatchers = [Dispatcher(backend=backend, publish_workers=options['publish_workers'])
+                       for _ in range(options['dispatchers'])]
+
+        def run(dispatcher):
+            try:
+                dispatcher.run(stop)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(dispatcher,)) for dispatcher in dispatchers]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + options['spread'] + options['timeout']
+        try:
+            while time.time() < deadline and len(backend.published) < options['schedules']:
+                time.sleep(0.5)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        published = backend.published
+        lags = sorted(max(0.0, dispatched - schedule_time.timestamp()) for _, schedule_time, dispatched in published)
+        duplicates = sum(count - 1 for count in Counter(pk for pk, _, _ in published).values() if count > 1)
+        self.stdout.write(f"dispatched {len(published)}/{options['schedules']} with {options['dispatchers']} dispatcher(s), "
+                          f"{duplicates} duplicate(s)")
+        if lags:
+            self.stdout.write(f"lag ms: p50={percentile(lags, 50) * 1000:.0f} p95={percentile(lags, 95) * 1000:.0f} "
+                              f"p99={percentile(lags, 99) * 1000:.0f} max={lags[-1] * 1000:.0f}")
+            self.stdout.write(f"rate: {len(published) / options['spread'] * 3600:.0f} schedules/hour offered")
+        ContentSchedule.objects.filter(creator=creator).delete()
@@ -0,0 +1,57 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from ...benchmarks.dataset import load_fixtures, remove, seed
+from ...benchmarks.suite import compare, run_suite
+import json
+
+class Command(BaseCommand):
+    help = ('Seed a synthetic agency and drive every route with concurrent authenticated requests, reporting '
+            'p50/p95/p99 latency, throughput, queries per request and peak RSS per endpoint as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help='Create the benchmark dataset first (resumable).')
+        parser.add_argument('--creators', type=int, default=10)
+        parser.add_argument('--fans-per-creator', type=int, default=1000)
+        parser.add_argument('--snapshots-per-creator', type=int, default=500)
+        parser.add_argument('--vault-files-per-creator', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Threads sending requests.')
+        parser.add_argument('--route', action='append', dest='routes', help='Only this route name (repeatable).')
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--compare', help='A previous results file; exit non-zero on regressions.')
+        parser.add_argument('--threshold', type=float, default=1.25, help='Allowed p95 growth factor with --compare.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark dataset and exit.')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.stdout.write(f'Deleted {remove()} benchmark row(s).')
+            return
+        if options['seed']:
+            seed(options['creators'], options['fans_per_creator'], options['snapshots_per_creator'],
+                 options['vault_files_per_creator'],
+                 progress=lambda done, total: self.stdout.write(f'seeded {done}/{total} creators'))
+        fixtures = load_fixtures()[:options['creators']]
+        if not fixtures:
+            raise CommandError('No benchmark dataset; run with --seed first.')
+
+        def progress(name, result):
+            latency = result['latency_ms']
+            self.stdout.write(f'{name:45} p50 {latency["p50"]:7.1f}ms  p95 {latency["p95"]:7.1f}ms  '
+                              f'p99 {latency["p99"]:7.1f}ms  {result["throughput_rps"]:6.0f} req/s  '
+                              f'{result["queries_per_request"]["mean"]:5.1f} q/req  rss {result["rss_peak_mb"]:.0f}MB'
+                              + (f'  errors {result["errors"]}' if result['errors'] else ''))
+
+        try:
+            report = run_suite(fixtures, options['requests'], options['concurrency'], options['routes'], progress)
+        except ValueError as error:
+            raise CommandError(str(error))
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(f'Results written to {options["output"]}.')
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = compare(report, json.load(baseline), options['threshold'])
+            for regression in regressions:
+                self.stdout.write(f'REGRESSION {regression}')
+            if regressions:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}.')
@@ -0,0 +1,34 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from ...diagnostics.query_budget import PROBES, QueryBudgetError, check_query_budgets
+
+class Command(BaseCommand):
+    help = ('Request every route in backend/api/urls.py over a small and a large fixture and fail if any '
+            'runs more queries for more rows. Fixture rows are created inside a transaction and rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=2)
+        parser.add_argument('--large', type=int, default=20)
+        parser.add_argument('--route', action='append', dest='routes', help='Only this route name (repeatable).')
+        parser.add_argument('--show-queries', action='store_true', help='Print the SQL of routes that grow.')
+
+    def handle(self, *args, **options):
+        try:
+            measurements = check_query_budgets(options['small'], options['large'], options['routes'])
+        except QueryBudgetError as error:
+            raise CommandError(str(error))
+        growing = []
+        for m in measurements:
+            status = 'GROWS' if m.large > m.small else 'ok'
+            self.stdout.write(f'{status:5} {m.route} ({m.label}): {m.small} queries at {options["small"]} rows, '
+                              f'{m.large} at {options["large"]}')
+            if m.large > m.small:
+                growing.append(m)
+                if options['show_queries']:
+                    for sql in m.queries:
+                        self.stdout.write(f'        {sql}')
+        for name, reason in PROBES.items():
+            if isinstance(reason, str):
+                self.stdout.write(f'skip  {name}: {reason}')
+        if growing:
+            raise CommandError(f'{len(growing)} probe(s) run more queries for more rows.')
@@ -0,0 +1,26 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from ...diagnostics.startup import StartupBudgetError, budget_violations, measure_startup
+
+class Command(BaseCommand):
+    help = ('Boot Django and import the URLconf in a fresh interpreter under -X importtime, report the slowest '
+            'imports, and fail if imports exceed the budget or load NumPy, Pillow, httpx or the recommendation engine eagerly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=float, help='Defaults to STARTUP_IMPORT_BUDGET_MS (1500).')
+        parser.add_argument('--module', action='append', dest='modules', help='Import this instead of the URLconf (repeatable).')
+        parser.add_argument('--runs', type=int, default=3, help='Runs to take the fastest of.')
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list.')
+
+    def handle(self, *args, **options):
+        try:
+            startup = measure_startup(options['modules'], options['runs'])
+        except StartupBudgetError as error:
+            raise CommandError(str(error))
+        self.stdout.write(f'{startup.import_ms:.0f}ms importing {len(startup.imports)} modules, '
+                          f'{startup.wall_ms:.0f}ms wall including interpreter start')
+        for entry in sorted(startup.imports, key=lambda entry: entry.cumulative_us, reverse=True)[:options['top']]:
+            self.stdout.write(f'{entry.cumulative_us / 1000:8.1f}ms  {"  " * entry.depth}{entry.module}')
+        violations = budget_violations(startup, options['budget_ms'])
+        if violations:
+            raise CommandError(' '.join(violations))
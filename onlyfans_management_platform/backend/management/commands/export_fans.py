@@ -0,0 +1,29 @@
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ...fans.bulk import FORMATS, export_fans
+from ...sharding.shards import for_creator
+import sys
+
+class Command(BaseCommand):
+    help = "Stream a creator's fans out as CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('creator')
+        parser.add_argument('path', nargs='?', default='-', help='File to write; "-" for stdout.')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+
+    def handle(self, *args, **options):
+        try:
+            creator = User.objects.get(username=options['creator'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['creator']}.")
+        stream = sys.stdout if options['path'] == '-' else open(options['path'], 'w', newline='', encoding='utf-8')
+        try:
+            # Only reads, so a creator being moved is exported from the shard that is still authoritative
+            with for_creator(creator.pk):
+                for text in export_fans(creator, options['format']):
+                    stream.write(text)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
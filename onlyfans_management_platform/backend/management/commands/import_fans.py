@@ -0,0 +1,39 @@
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from ...fans.bulk import DEFAULT_BATCH_SIZE, FORMATS, import_fans, read_records
+from ...sharding.shards import ShardMoving, for_creator
+import sys
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSONL file of fans into a creator's Fan rows, upserting on fan_name."
+
+    def add_arguments(self, parser):
+        parser.add_argument('creator', help='Username of the creator the fans belong to.')
+        parser.add_argument('path', help='File to read; "-" for stdin.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            creator = User.objects.get(username=options['creator'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['creator']}.")
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError('Pass --format; it cannot be told from the file name.')
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        progress = lambda result: self.stdout.write(
+            f'{result.processed} read, {result.written} written, {result.rejected} rejected')
+        try:
+            with for_creator(creator.pk):
+                result = import_fans(creator, read_records(stream, fmt), batch_size=options['batch_size'], progress=progress)
+        except ShardMoving:
+            # Batches already written stay; the upsert makes running the import again safe
+            raise CommandError(f"{creator.username} is being moved to another shard; run the import again once the move finishes.")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(f'Done: {result.written} fans written, {result.rejected} rejected.')
@@ -0,0 +1,124 @@
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.urls import reverse
+from ...models.models import AIRecommendation, ActionSuggestion
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+import time
+
+LOADTEST_USER = 'async-views-loadtest'
+
+# (view name, POST data) per endpoint under test
+ENDPOINTS = {
+    'ai_recommendations': {},
+    'action_suggestions': {'action_description': 'go live on Friday'},
+}
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+class StubService:
+    """Local HTTP service answering every JSON POST after `latency` seconds, tracking peak concurrency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.handled = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f'http://{host}:{port}/'
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.decode('latin-1').split('\r\n'):
+                    name, _, value = line.partition(':')
+                    if name.strip().lower() == 'content-length':
+                        length = int(value)
+                await reader.readexactly(length)
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+                await asyncio.sleep(self.latency)
+                self.in_flight -= 1
+                self.handled += 1
+                body = json.dumps({'recommendation': 'Stub recommendation.',
+                                   'projected_outcome': 'Stub outcome.'}).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+class Command(BaseCommand):
+    help = ('POST to the async views through the ASGI handler while their outbound calls go to a slow local stub, '
+            'and report how many calls were in flight at once against the size of the sync thread pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=ENDPOINTS, default='ai_recommendations')
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.25, help='Seconds the stub service takes per call.')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=LOADTEST_USER)
+        try:
+            result = async_to_sync(self.run)(user, options)
+        except ImproperlyConfigured as error:
+            raise CommandError(str(error))
+        finally:
+            AIRecommendation.objects.filter(creator=user).delete()
+            ActionSuggestion.objects.filter(creator=user).delete()
+        latencies, elapsed, stub = result
+        ordered = sorted(latencies)
+        # What asgiref's executor (and a threaded WSGI server of the default size) could hold open at once
+        thread_limit = ThreadPoolExecutor()._max_workers
+        requests = options['requests']
+        self.stdout.write(f'{requests} requests to {options["endpoint"]} at concurrency {options["concurrency"]}, '
+                          f'stub latency {options["latency"] * 1000:.0f}ms')
+        self.stdout.write(f'  wall time {elapsed:.2f}s, {requests / elapsed:.0f} req/s')
+        self.stdout.write(f'  latency p50 {percentile(ordered, 50) * 1000:.0f}ms, p95 {percentile(ordered, 95) * 1000:.0f}ms, '
+                          f'max {ordered[-1] * 1000:.0f}ms')
+        self.stdout.write(f'  peak outbound calls in flight {stub.peak} (default thread pool: {thread_limit} threads, '
+                          f'{os.cpu_count()} CPUs)')
+        if stub.handled < requests:
+            raise CommandError(f'Only {stub.handled} of {requests} requests reached the stub service.')
+
+    async def run(self, user, options):
+        stub = StubService(options['latency'])
+        url = await stub.start()
+        client = AsyncClient()
+        await client.aforce_login(user)
+        path = reverse(options['endpoint'])
+        data = ENDPOINTS[options['endpoint']]
+        slots = asyncio.Semaphore(options['concurrency'])
+        latencies = []
+
+        async def one():
+            async with slots:
+                started = time.perf_counter()
+                response = await client.post(path, data)
+                if response.status_code != 200:
+                    raise CommandError(f'{path} returned {response.status_code}.')
+                latencies.append(time.perf_counter() - started)
+
+        with override_settings(RECOMMENDATION_SERVICE_URL=url, ACTION_OUTCOME_SERVICE_URL=url):
+            started = time.perf_counter()
+            try:
+                await asyncio.gather(*(one() for _ in range(options['requests'])))
+            finally:
+                stub.server.close()
+        return latencies, time.perf_counter() - started, stub
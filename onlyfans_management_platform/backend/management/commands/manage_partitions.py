@@ -0,0 +1,60 @@
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...retention.partitions import (
+    PARTITIONED,
+    convert_to_partitioned,
+    ensure_partitions,
+    expire,
+    is_partitioned,
+    retention_months,
+    supports_partitioning,
+)
+from ...sharding.shards import pinned, shard_aliases
+
+class Command(BaseCommand):
+    help = ('Maintain monthly partitions of the append-only tables and apply their retention policy: '
+            'create upcoming partitions, then archive months past retention to gzipped JSONL and drop them. '
+            'Runs on every shard in turn.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models', choices=[model.__name__ for model in PARTITIONED],
+                            help='Only this model (repeatable); defaults to all of them.')
+        parser.add_argument('--convert', action='store_true',
+                            help='Convert tables that are not partitioned yet (PostgreSQL, takes a brief exclusive lock).')
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--retention', action='store_true', help='Archive and remove months past retention.')
+        parser.add_argument('--keep-months', type=int, help='Override RETENTION_MONTHS for this run.')
+        parser.add_argument('--archive-dir', default=getattr(settings, 'RETENTION_ARCHIVE_DIR', 'archive'))
+        parser.add_argument('--dry-run', action='store_true', help='Report what retention would remove.')
+
+    def handle(self, *args, **options):
+        models = [model for model in PARTITIONED if not options['models'] or model.__name__ in options['models']]
+        for alias in shard_aliases():
+            with pinned(alias):
+                self.maintain(alias, models, options)
+
+    def maintain(self, alias, models, options):
+        prefix = f'{alias}: ' if len(shard_aliases()) > 1 else ''
+        if options['convert'] and not supports_partitioning():
+            raise CommandError(f'{prefix}Table partitioning needs PostgreSQL; retention still works without it.')
+        for model in models:
+            if supports_partitioning():
+                if not is_partitioned(model):
+                    if not options['convert']:
+                        self.stdout.write(f'{prefix}{model.__name__}: not partitioned (run with --convert)')
+                    elif options['dry_run']:
+                        self.stdout.write(f'{prefix}{model.__name__}: would convert to monthly partitions')
+                    else:
+                        convert_to_partitioned(model)
+                        self.stdout.write(f'{prefix}{model.__name__}: converted to monthly partitions')
+                if is_partitioned(model) and not options['dry_run']:
+                    created = ensure_partitions(model, options['months_ahead'])
+                    self.stdout.write(f'{prefix}{model.__name__}: {len(created)} partition(s) created'
+                                      + (f' ({", ".join(created)})' if created else ''))
+            if options['retention']:
+                keep = options['keep_months'] or retention_months(model)
+                removed = expire(model, options['archive_dir'], keep, options['dry_run'])
+                verb = 'would remove' if options['dry_run'] else 'archived and removed'
+                self.stdout.write(f'{prefix}{model.__name__}: keeping {keep} month(s), {verb} '
+                                  f'{sum(count for _, count in removed)} row(s) in {len(removed)} month(s)')
@@ -0,0 +1,43 @@
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from ...models.models import CreatorShard
+from ...sharding.rebalance import COPY_BATCH_SIZE, MoveError, move_creator
+from ...sharding.shards import DIRECTORY, shard_aliases
+import time
+
+class Command(BaseCommand):
+    help = ("Move a creator's rows to another shard while they keep using the site; "
+            "their writes are refused (503) only for the final catch-up.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', nargs='?')
+        parser.add_argument('shard', nargs='?', help='Target database alias.')
+        parser.add_argument('--batch-size', type=int, default=COPY_BATCH_SIZE)
+        parser.add_argument('--grace', type=float, help='Seconds to wait for every process to see a map change.')
+        parser.add_argument('--list', action='store_true', help='Show how many creators each shard holds and exit.')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            counts = dict.fromkeys(shard_aliases(), 0)
+            counts.update(CreatorShard.objects.values_list('shard').annotate(Count('pk')).order_by())
+            # Creators without a map entry are on the directory
+            counts[DIRECTORY] += User.objects.filter(creatorshard__isnull=True).count()
+            for alias, count in counts.items():
+                self.stdout.write(f'{alias}: {count} creator(s)')
+            return
+        if not options['username'] or not options['shard']:
+            raise CommandError('Give a username and a target shard, or --list.')
+        try:
+            creator = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        started = time.perf_counter()
+        try:
+            copied = move_creator(creator.pk, options['shard'], options['batch_size'], options['grace'],
+                                  log=self.stdout.write)
+        except MoveError as error:
+            raise CommandError(str(error))
+        self.stdout.write(f"Moved {sum(copied.values())} row(s) of {creator.username} to {options['shard']} "
+                          f"in {time.perf_counter() - started:.1f}s.")
@@ -0,0 +1,46 @@
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from ...media.derivatives import claim_pending, record_result, submit
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+import logging
+import multiprocessing
+import os
+import time
+
+class Command(BaseCommand):
+    help = 'Render thumbnails, previews and media metadata for newly stored blobs on a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--stale-minutes', type=int, default=30,
+                            help='Reclaim jobs left in processing by a dispatcher that died.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit.')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        stale_after = timedelta(minutes=options['stale_minutes'])
+        in_flight = {}
+        done = 0
+        # Spawned workers never inherit this process's database connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            while True:
+                if len(in_flight) < workers * 2:
+                    close_old_connections()
+                    for derivative in claim_pending(workers * 2 - len(in_flight), stale_after):
+                        future, workdir = submit(pool, derivative)
+                        in_flight[future] = (derivative, workdir)
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                finished, _ = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    derivative, workdir = in_flight.pop(future)
+                    record_result(derivative, future, workdir)
+                    logging.info(f"Derivatives for blob {derivative.blob.sha256}: {derivative.status}.")
+                    done += 1
+        self.stdout.write(f'Processed {done} derivative job(s).')
@@ -0,0 +1,14 @@
+
+from django.core.management.base import BaseCommand
+from ...storage.uploads import purge_stale_uploads
+from datetime import timedelta
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that have not received data for a while, along with their stored parts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48, help='Idle time after which an upload is abandoned.')
+
+    def handle(self, *args, **options):
+        count = purge_stale_uploads(timedelta(hours=options['hours']))
+        self.stdout.write(f'Purged {count} stale upload(s).')
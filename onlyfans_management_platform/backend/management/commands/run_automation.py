@@ -0,0 +1,34 @@
+
+from django.core.management.base import BaseCommand
+from ...automation.engine import AutomationEngine, fan_event
+import json
+import sys
+
+class Command(BaseCommand):
+    help = 'Run automation flows for a stream of fan events read as JSON lines from a file or stdin.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', default='-',
+                            help='JSONL file of {"creator_id", "event", "fan_id", ...} objects; "-" for stdin.')
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--queue-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        engine = AutomationEngine(workers=options['workers'], queue_size=options['queue_size']).start()
+        stream = sys.stdin if options['source'] == '-' else open(options['source'])
+        try:
+            for line in stream:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                engine.submit(fan_event(record.pop('creator_id'), record.pop('event'), record.pop('fan_id', None), **record))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            engine.stop()
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(f'Processed {engine.events_processed} event(s).')
+        for flow_id, stats in sorted(engine.stats().items()):
+            self.stdout.write(f"flow {flow_id}: {stats['executions']} run(s), {stats['failures']} failure(s), "
+                              f"mean {stats['mean_latency_ms']:.2f} ms, max {stats['max_latency_ms']:.2f} ms")
@@ -0,0 +1,33 @@
+
+from django.core.management.base import BaseCommand
+from ...scheduling.dispatcher import Dispatcher
+from datetime import timedelta
+import signal
+import threading
+
+class Command(BaseCommand):
+    help = ('Publish scheduled content as it comes due, from the shard named by BACKEND_SHARD (default: the '
+            'directory). Run at least one dispatcher per shard; several may run side by side on the same shard.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=60, help='Seconds ahead to hold in memory.')
+        parser.add_argument('--refresh-interval', type=float, default=1.0)
+        parser.add_argument('--publish-workers', type=int, default=8)
+        parser.add_argument('--once', action='store_true', help='Dispatch whatever is due now and exit.')
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher(horizon=timedelta(seconds=options['horizon']),
+                                refresh_interval=options['refresh_interval'],
+                                publish_workers=options['publish_workers'])
+        if options['once']:
+            while dispatcher.run_once():
+                pass
+            dispatcher.pool.shutdown()
+        else:
+            stop = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *args: stop.set())
+            try:
+                dispatcher.run(stop)
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(f'Dispatched {dispatcher.dispatched} scheduled item(s).')
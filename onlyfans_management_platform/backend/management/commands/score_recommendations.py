@@ -0,0 +1,15 @@
+
+from django.core.management.base import BaseCommand
+from ...recommendations.engine import score_all_creators
+import logging
+import time
+
+class Command(BaseCommand):
+    help = 'Rebuild per-creator feature vectors and ranked recommendations; run nightly.'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scored = score_all_creators()
+        elapsed = time.perf_counter() - started
+        logging.info(f"Scored recommendations for {scored} creator(s) in {elapsed:.1f}s.")
+        self.stdout.write(f'Scored {scored} creator(s) in {elapsed:.1f}s.')
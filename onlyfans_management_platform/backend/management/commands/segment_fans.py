@@ -0,0 +1,30 @@
+
+from django.core.management.base import BaseCommand
+from ...fans.segmentation import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, segment_creators
+from ...models.models import Fan
+from ...sharding.shards import fan_out
+import time
+
+class Command(BaseCommand):
+    help = 'Recompute Fan.segment from recency, frequency and spend, writing back only changed rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--creator', type=int, action='append', dest='creators', default=[],
+                            help='Creator id to process (repeatable); defaults to every creator with fans.')
+        parser.add_argument('--workers', type=int, default=1, help='Processes to spread creators over.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        creators = options['creators'] or sorted(set().union(*fan_out(lambda alias: set(
+            Fan.objects.order_by().values_list('creator_id', flat=True).distinct()))))
+        started = time.perf_counter()
+        scored = changed = 0
+        for creator_id, (fans, updated) in segment_creators(creators, options['workers'],
+                                                            options['chunk_size'], options['batch_size']):
+            scored += fans
+            changed += updated
+            self.stdout.write(f'creator {creator_id}: {fans} fans, {updated} changed')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{scored} fans across {len(creators)} creator(s) in {elapsed:.1f}s '
+                          f'({scored / elapsed if elapsed else 0:.0f} fans/s), {changed} segment(s) changed.')
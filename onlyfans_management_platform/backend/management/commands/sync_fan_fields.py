@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ...caching.creator_cache import FANS, creator_cache
+from ...models.models import PROMOTED_FAN_FIELDS, Fan
+from ...sharding.shards import ShardMoving, fan_out, for_creator
+from itertools import islice
+
+class Command(BaseCommand):
+    help = ('Re-extract the promoted fan_data keys into their columns, for rows written around save() '
+            '(queryset.update, raw SQL) or saved before a key was promoted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--creator', type=int, help='Only this creator id.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        creators = [options['creator']] if options['creator'] else sorted(set().union(*fan_out(lambda alias: set(
+            Fan.objects.order_by().values_list('creator_id', flat=True).distinct()))))
+        scanned = fixed = 0
+        for creator_id in creators:
+            try:
+                # Pinned per creator, so the updates land on its shard and are refused while it is moving
+                with for_creator(creator_id):
+                    checked, updated = self.sync_creator(creator_id, options['batch_size'])
+            except ShardMoving:
+                self.stderr.write(f"creator {creator_id}: being moved to another shard, skipped")
+                continue
+            scanned += checked
+            fixed += updated
+        self.stdout.write(f'Checked {scanned} fan(s), updated {fixed}.')
+
+    def sync_creator(self, creator_id, batch_size):
+        fans = Fan.objects.filter(creator_id=creator_id).order_by('pk').only('pk', 'creator_id', 'fan_data', *PROMOTED_FAN_FIELDS)
+        rows = fans.iterator(chunk_size=batch_size)
+        scanned = fixed = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            scanned += len(batch)
+            stale = []
+            now = timezone.now()
+            for fan in batch:
+                before = [getattr(fan, name) for name in PROMOTED_FAN_FIELDS]
+                fan.sync_promoted_fields()
+                if before != [getattr(fan, name) for name in PROMOTED_FAN_FIELDS]:
+                    fan.updated_at = now
+                    stale.append(fan)
+            Fan.objects.bulk_update(stale, [*PROMOTED_FAN_FIELDS, 'updated_at'])
+            fixed += len(stale)
+        if fixed:
+            creator_cache.invalidate(creator_id, FANS)
+        return scanned, fixed
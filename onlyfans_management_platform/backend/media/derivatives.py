@@ -0,0 +1,77 @@
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models.models import MediaDerivative
+from ..storage.cas import content_addressed_storage
+from .rendering import UnsupportedMedia, render_derivatives
+import logging
+import os
+import shutil
+import tempfile
+
+MAX_ATTEMPTS = 3
+
+def claim_pending(limit, stale_after):
+    """Mark up to `limit` pending (or abandoned in-flight) derivatives as processing and return them."""
+    with transaction.atomic():
+        stale = timezone.now() - stale_after
+        queued = MediaDerivative.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+            Q(status=MediaDerivative.PENDING) | Q(status=MediaDerivative.PROCESSING, updated_at__lt=stale))
+        claimed = list(queued.select_related('blob').order_by('updated_at')[:limit])
+        for derivative in claimed:
+            derivative.status = MediaDerivative.PROCESSING
+            derivative.attempts += 1
+            derivative.save(update_fields=['status', 'attempts', 'updated_at'])
+    return claimed
+
+def local_source(derivative, workdir):
+    """A filesystem path for the blob, copying it out of remote storage if needed."""
+    storage = content_addressed_storage.storage
+    try:
+        return storage.path(derivative.blob.name)
+    except NotImplementedError:
+        target = os.path.join(workdir, 'source')
+        with storage.open(derivative.blob.name, 'rb') as source, open(target, 'wb') as copy:
+            shutil.copyfileobj(source, copy, 1024 * 1024)
+        return target
+
+def submit(pool, derivative):
+    workdir = tempfile.mkdtemp(prefix='derivative-')
+    source = local_source(derivative, workdir)
+    return pool.submit(render_derivatives, source, derivative.blob.content_type, workdir), workdir
+
+def record_result(derivative, future, workdir):
+    try:
+        try:
+            result = future.result()
+        except UnsupportedMedia as error:
+            derivative.status = MediaDerivative.UNSUPPORTED
+            derivative.error = str(error)
+        except Exception as error:
+            derivative.status = MediaDerivative.FAILED if derivative.attempts >= MAX_ATTEMPTS else MediaDerivative.PENDING
+            derivative.error = repr(error)
+            logging.warning(f"Derivatives for blob {derivative.blob.sha256} failed: {error!r}")
+        else:
+            for kind in ('thumbnail', 'preview'):
+                path = result[kind]
+                with open(path, 'rb') as rendered:
+                    name = f'{derivative.blob.sha256}{os.path.splitext(path)[1]}'
+                    getattr(derivative, kind).save(name, File(rendered), save=False)
+            derivative.width, derivative.height, derivative.duration = result['width'], result['height'], result['duration']
+            derivative.status = MediaDerivative.READY
+            derivative.error = ''
+        derivative.save()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def delete_derivative_files(derivative):
+    for field in (derivative.thumbnail, derivative.preview):
+        if field.name:
+            field.delete(save=False)
+
+def derivatives_for(names):
+    """Ready derivatives keyed by blob name, for decorating a listing in one query."""
+    ready = MediaDerivative.objects.filter(blob__name__in=set(names), status=MediaDerivative.READY).select_related('blob')
+    return {derivative.blob.name: derivative for derivative in ready}
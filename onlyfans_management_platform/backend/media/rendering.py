@@ -0,0 +1,59 @@
+
+# Imported by spawned derivative workers, which never configure Django: keep Django imports out of here
+import json
+import os
+import shutil
+import subprocess
+
+THUMBNAIL_SIZE = (320, 320)
+PREVIEW_SIZE = (1280, 1280)
+PREVIEW_HEIGHT = 360
+PREVIEW_SECONDS = 15
+
+class UnsupportedMedia(Exception):
+    pass
+
+def _render_image(source, workdir):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise UnsupportedMedia('Pillow is not installed.')
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        outputs = {}
+        for kind, bounds, quality in (('preview', PREVIEW_SIZE, 70), ('thumbnail', THUMBNAIL_SIZE, 80)):
+            derived = image.convert('RGB')
+            derived.thumbnail(bounds)
+            outputs[kind] = os.path.join(workdir, f'{kind}.jpg')
+            derived.save(outputs[kind], 'JPEG', quality=quality, optimize=True)
+    return {'width': width, 'height': height, 'duration': None, **outputs}
+
+def _render_video(source, workdir):
+    ffprobe, ffmpeg = shutil.which('ffprobe'), shutil.which('ffmpeg')
+    if not (ffprobe and ffmpeg):
+        raise UnsupportedMedia('ffmpeg is not installed.')
+    probe = json.loads(subprocess.run(
+        [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width,height:format=duration',
+         '-of', 'json', source], capture_output=True, check=True, timeout=60).stdout)
+    stream = (probe.get('streams') or [{}])[0]
+    duration = float(probe.get('format', {}).get('duration') or 0) or None
+    thumbnail = os.path.join(workdir, 'thumbnail.jpg')
+    preview = os.path.join(workdir, 'preview.mp4')
+    seek = str(min(1.0, (duration or 0) / 2))
+    subprocess.run([ffmpeg, '-v', 'error', '-y', '-ss', seek, '-i', source, '-frames:v', '1',
+                    '-vf', f'scale={THUMBNAIL_SIZE[0]}:{THUMBNAIL_SIZE[1]}:force_original_aspect_ratio=decrease',
+                    thumbnail], check=True, timeout=120)
+    subprocess.run([ffmpeg, '-v', 'error', '-y', '-i', source, '-t', str(PREVIEW_SECONDS), '-an',
+                    '-vf', f'scale=-2:{PREVIEW_HEIGHT}', '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '32',
+                    '-movflags', '+faststart', preview], check=True, timeout=600)
+    return {'width': stream.get('width'), 'height': stream.get('height'), 'duration': duration,
+            'thumbnail': thumbnail, 'preview': preview}
+
+def render_derivatives(source, content_type, workdir):
+    """Produce thumbnail/preview files in `workdir` and return their paths with the media metadata."""
+    if content_type.startswith('image/'):
+        return _render_image(source, workdir)
+    if content_type.startswith('video/'):
+        return _render_video(source, workdir)
+    raise UnsupportedMedia(f'No derivatives for {content_type}.')
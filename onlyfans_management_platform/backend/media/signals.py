@@ -0,0 +1,16 @@
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from ..models.models import ContentBlob, MediaDerivative
+from .derivatives import delete_derivative_files
+
+@receiver(post_save, sender=ContentBlob)
+def queue_derivatives(sender, instance, created, **kwargs):
+    # Derivatives belong to the blob, so a file shared by many vault/schedule rows is rendered once
+    if created:
+        transaction.on_commit(lambda: MediaDerivative.objects.get_or_create(blob_id=instance.pk))
+
+@receiver(post_delete, sender=MediaDerivative)
+def remove_derivative_files(sender, instance, **kwargs):
+    transaction.on_commit(lambda: delete_derivative_files(instance))
@@ -1,16 +1,75 @@
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ..storage.cas import content_addressed_storage
+from datetime import datetime, timezone as dt_timezone
+import math
+import uuid
 
 class CreatorVault(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
-    content_file = models.FileField(upload_to='creator_vault/')
+    content_file = models.FileField(upload_to='creator_vault/', storage=content_addressed_storage, db_index=True)
     is_public = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
 class AdminAccessLog(models.Model):
     admin_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="admin_access")
     creator_vault = models.ForeignKey(CreatorVault, on_delete=models.CASCADE)
-    access_time = models.DateTimeField(auto_now_add=True)
+    access_time = models.DateTimeField(default=timezone.now, editable=False)  # Set when queued, not when the audit writer inserts it
+
+    class Meta:
+        # Retention and monthly partitions work on access_time
+        indexes = [
+            models.Index(fields=['access_time'], name='admin_access_time_idx'),
+        ]
+
+def _promoted_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+def _promoted_int(value):
+    value = _promoted_float(value)
+    return int(value) if value is not None else None
+
+def _promoted_datetime(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    try:
+        value = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+# fan_data keys copied into typed, indexed columns of the same name; values that don't parse are stored as NULL
+PROMOTED_FAN_FIELDS = {
+    'total_spend': _promoted_float,
+    'last_tip_at': _promoted_datetime,
+    'message_count': _promoted_int,
+}
+PROMOTED_LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte', 'range', 'in', 'isnull')
+
+class FanQuerySet(models.QuerySet):
+    def where(self, **conditions):
+        """Filter on promoted fan_data keys, e.g. where(total_spend__gte=100, last_tip_at__isnull=False).
+
+        Only promoted keys and equality/range lookups are accepted, so every filter hits an index
+        instead of parsing fan_data row by row.
+        """
+        for condition in conditions:
+            name, _, lookup = condition.partition('__')
+            if name not in PROMOTED_FAN_FIELDS or (lookup or 'exact') not in PROMOTED_LOOKUPS:
+                raise ValueError(f'{condition!r} is not a filter on a promoted fan_data key.')
+        return self.filter(**conditions)
 
 class Fan(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -18,6 +77,42 @@ class Fan(models.Model):
     fan_data = models.JSONField()  # Store interaction data
     segment = models.CharField(max_length=50)
     last_interaction = models.DateTimeField(auto_now=True)
+    # Copies of PROMOTED_FAN_FIELDS keys in fan_data, refreshed on every save
+    total_spend = models.FloatField(null=True, editable=False)
+    last_tip_at = models.DateTimeField(null=True, editable=False)
+    message_count = models.IntegerField(null=True, editable=False)
+    # Unlike last_interaction, also moved forward by bulk writes (segmentation, imports); shard moves catch up on it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FanQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Bulk imports upsert on this
+            models.UniqueConstraint(fields=['creator', 'fan_name'], name='fan_creator_name_uniq'),
+        ]
+        # Keyset pagination on the fan dashboard walks these in (last_interaction, id) order
+        indexes = [
+            models.Index(fields=['creator', 'last_interaction', 'id'], name='fan_creator_recent_idx'),
+            models.Index(fields=['creator', 'segment', 'last_interaction', 'id'], name='fan_creator_segment_idx'),
+            models.Index(fields=['creator', 'total_spend'], name='fan_creator_spend_idx'),
+            models.Index(fields=['creator', 'last_tip_at'], name='fan_creator_last_tip_idx'),
+            models.Index(fields=['creator', 'message_count'], name='fan_creator_messages_idx'),
+            models.Index(fields=['creator', 'updated_at'], name='fan_creator_updated_idx'),
+        ]
+
+    def sync_promoted_fields(self):
+        """Copy the promoted keys out of fan_data. Needed wherever save() is bypassed (bulk_create, bulk_update)."""
+        fan_data = self.fan_data if isinstance(self.fan_data, dict) else {}
+        for name, parse in PROMOTED_FAN_FIELDS.items():
+            setattr(self, name, parse(fan_data.get(name)))
+
+    def save(self, *args, **kwargs):
+        self.sync_promoted_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'fan_data' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(PROMOTED_FAN_FIELDS)
+        super().save(*args, **kwargs)
 
 class ActionSuggestion(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -25,6 +120,11 @@ class ActionSuggestion(models.Model):
     projected_outcome = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['creator', 'timestamp'], name='suggestion_creator_time_idx'),
+        ]
+
 class AnalyticsData(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
     engagement_rate = models.FloatField()
@@ -33,17 +133,71 @@ class AnalyticsData(models.Model):
     content_performance = models.JSONField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['creator', 'timestamp'], name='analytics_creator_time_idx'),
+        ]
+
+class AnalyticsRollup(models.Model):
+    HOUR = 'hour'
+    DAY = 'day'
+    WEEK = 'week'
+    GRANULARITY_CHOICES = [(HOUR, 'Hourly'), (DAY, 'Daily'), (WEEK, 'Weekly')]
+
+    creator = models.ForeignKey(User, on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    sample_count = models.IntegerField(default=0)
+    engagement_rate_sum = models.FloatField(default=0)
+    fan_growth_sum = models.IntegerField(default=0)
+    revenue_sum = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['creator', 'granularity', 'bucket_start'], name='analytics_rollup_bucket_uniq'),
+        ]
+
+    @property
+    def engagement_rate_avg(self):
+        return self.engagement_rate_sum / self.sample_count if self.sample_count else 0.0
+
+class AnalyticsRollupState(models.Model):
+    creator = models.OneToOneField(User, on_delete=models.CASCADE)
+    watermark = models.DateTimeField(null=True)  # Newest AnalyticsData.timestamp folded into the rollups
+    refreshed_at = models.DateTimeField(auto_now=True)
+
 class AutomationFlow(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
     trigger_event = models.CharField(max_length=255)
     action_taken = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Lets running engines pick up edits
+    is_active = models.BooleanField(default=True)
+    execution_count = models.BigIntegerField(default=0)
+    last_executed_at = models.DateTimeField(null=True)
 
 class ContentSchedule(models.Model):
+    PENDING = 'pending'
+    PUBLISHING = 'publishing'
+    PUBLISHED = 'published'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (PUBLISHING, 'Publishing'), (PUBLISHED, 'Published'), (FAILED, 'Failed')]
+
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
-    content = models.FileField(upload_to='scheduled_content/')
+    content = models.FileField(upload_to='scheduled_content/', storage=content_addressed_storage, db_index=True)
     schedule_time = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PENDING)
+    claimed_at = models.DateTimeField(null=True)  # Set when a dispatcher takes the item; doubles as its lease
+    published_at = models.DateTimeField(null=True)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'schedule_time'], name='schedule_due_idx'),
+        ]
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -53,3 +207,117 @@ class AIRecommendation(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
     recommendation = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['creator', 'timestamp'], name='airec_creator_time_idx'),
+        ]
+
+class CreatorFeatures(models.Model):
+    creator = models.OneToOneField(User, on_delete=models.CASCADE)
+    vector = models.JSONField(default=dict)  # Feature name -> value, see recommendations.engine.FEATURES
+    computed_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+class CreatorRecommendation(models.Model):
+    creator = models.ForeignKey(User, on_delete=models.CASCADE)
+    rank = models.IntegerField()  # 0 is the best-scoring action
+    action = models.CharField(max_length=50)
+    recommendation = models.TextField()
+    score = models.FloatField()
+    projected_lift = models.FloatField()  # Percent
+    computed_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # The ai_recommendations view reads rank 0 through this
+            models.UniqueConstraint(fields=['creator', 'rank'], name='creator_recommendation_rank_uniq'),
+        ]
+
+class UploadSession(models.Model):
+    VAULT = 'vault'
+    SCHEDULE = 'schedule'
+    TARGET_CHOICES = [(VAULT, 'Creator vault'), (SCHEDULE, 'Scheduled content')]
+    PENDING = 'pending'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (COMPLETE, 'Complete')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    creator = models.ForeignKey(User, on_delete=models.CASCADE)
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)  # Digest declared by the client, checked on completion
+    metadata = models.JSONField(default=dict)  # Fields for the row created on completion
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result_id = models.BigIntegerField(null=True)  # Primary key of the row created on completion
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def expected_chunk_size(self, index):
+        if index == self.chunk_count - 1:
+            return self.total_size - self.chunk_size * index
+        return self.chunk_size
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    size = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+    part_name = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='upload_chunk_index_uniq'),
+        ]
+
+class ContentBlob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100)
+    ref_count = models.IntegerField(default=0)  # Rows whose FileField points at this blob, kept by signals
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField()  # Bumped whenever an upload resolves to this blob
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'last_used_at'], name='blob_collectable_idx'),
+        ]
+
+class MediaDerivative(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    UNSUPPORTED = 'unsupported'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (PROCESSING, 'Processing'), (READY, 'Ready'),
+                      (UNSUPPORTED, 'Unsupported'), (FAILED, 'Failed')]
+
+    blob = models.OneToOneField(ContentBlob, on_delete=models.CASCADE, related_name='derivative')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PENDING)
+    thumbnail = models.FileField(upload_to='derivatives/thumbnails/', blank=True)
+    preview = models.FileField(upload_to='derivatives/previews/', blank=True)
+    width = models.IntegerField(null=True)
+    height = models.IntegerField(null=True)
+    duration = models.FloatField(null=True)  # Seconds, for audio/video
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='derivative_queue_idx'),
+        ]
+
+class CreatorShard(models.Model):
+    creator = models.OneToOneField(User, on_delete=models.CASCADE)
+    shard = models.CharField(max_length=100)  # Database alias holding the creator's rows, see sharding.shards
+    moving = models.BooleanField(default=False)  # Set while move_creator catches the target up; writes are refused
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,135 @@
+
+from django.conf import settings
+from django.core.cache import caches
+import threading
+import time
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+FLUSH_INTERVAL = 10.0
+PREFIX = 'backend_'
+
+# name: (help, buckets, scale). Sums are kept as integers in 1/scale units so they can be incr()ed in the cache.
+HISTOGRAMS = {
+    'request_duration_seconds': ('Wall time per request.', DURATION_BUCKETS, 1000000),
+    'request_db_seconds': ('Time spent in database queries per request.', DURATION_BUCKETS, 1000000),
+    'request_template_seconds': ('Time spent rendering templates per request, including queries run while rendering.',
+                                 DURATION_BUCKETS, 1000000),
+    'request_queries': ('Database queries per request.', QUERY_BUCKETS, 1),
+}
+COUNTERS = {
+    'request_cache_lookups_total': ('Creator cache lookups by outcome.', 'outcome'),
+    'slow_requests_total': ('Requests slower than PROFILING_SLOW_REQUEST_MS.', None),
+}
+
+def _bucket(buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class EndpointMetrics:
+    """Per-endpoint request histograms, summed over every process.
+
+    Observations are counted in memory and added to integer counters in the shared cache
+    (PROFILING_CACHE_ALIAS) at most every FLUSH_INTERVAL seconds, the same way the creator cache
+    keeps its hit counts, so a scrape of any process sees the totals of all of them as of their
+    last flush. The shared backend has to be shared between processes for that, e.g. Redis or
+    Memcached.
+    """
+
+    def __init__(self, alias=None):
+        self._alias = alias
+        self._lock = threading.Lock()
+        self._unflushed = {}
+        self._next_flush = time.monotonic() + FLUSH_INTERVAL
+
+    @property
+    def shared(self):
+        return caches[self._alias or getattr(settings, 'PROFILING_CACHE_ALIAS', 'default')]
+
+    def observe(self, endpoint, profile, slow):
+        values = {
+            'request_duration_seconds': profile.wall_time,
+            'request_db_seconds': profile.db_time,
+            'request_template_seconds': profile.template_time,
+            'request_queries': profile.query_count,
+        }
+        with self._lock:
+            pending = self._unflushed
+            for name, value in values.items():
+                _, buckets, scale = HISTOGRAMS[name]
+                for key, amount in (((name, endpoint, 'bucket', _bucket(buckets, value)), 1),
+                                    ((name, endpoint, 'count', ''), 1),
+                                    ((name, endpoint, 'sum', ''), round(value * scale))):
+                    pending[key] = pending.get(key, 0) + amount
+            for outcome, count in profile.cache.items():
+                key = ('request_cache_lookups_total', endpoint, 'value', outcome)
+                pending[key] = pending.get(key, 0) + count
+            if slow:
+                key = ('slow_requests_total', endpoint, 'value', '')
+                pending[key] = pending.get(key, 0) + 1
+            due = time.monotonic() >= self._next_flush
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add this process's observations since the last flush to the shared totals."""
+        with self._lock:
+            pending, self._unflushed = self._unflushed, {}
+            self._next_flush = time.monotonic() + FLUSH_INTERVAL
+        if not pending:
+            return
+        shared = self.shared
+        for key, amount in pending.items():
+            cache_key = self._key(*key)
+            if not shared.add(cache_key, amount, timeout=None):
+                shared.incr(cache_key, amount)
+        self._register({key[:2] + (key[3],) if key[2] == 'value' else key[:2] for key in pending})
+
+    def _key(self, name, endpoint, kind, label):
+        return f'profiling:{name}:{endpoint}:{kind}:{label}'
+
+    def _register(self, series):
+        known = self.shared.get('profiling:series', ())
+        missing = series - set(known)
+        if missing:
+            self.shared.set('profiling:series', tuple(known) + tuple(sorted(missing, key=repr)), timeout=None)
+
+    def render(self):
+        """Everything flushed so far, in the Prometheus text exposition format."""
+        self.flush()
+        series = self.shared.get('profiling:series', ())
+        keys = []
+        for entry in series:
+            name = entry[0]
+            if name in HISTOGRAMS:
+                _, buckets, _ = HISTOGRAMS[name]
+                keys += [self._key(name, entry[1], 'bucket', index) for index in range(len(buckets) + 1)]
+                keys += [self._key(name, entry[1], 'count', ''), self._key(name, entry[1], 'sum', '')]
+            else:
+                keys.append(self._key(name, entry[1], 'value', entry[2]))
+        values = self.shared.get_many(keys)
+        lines = []
+        for name, (help_text, buckets, scale) in HISTOGRAMS.items():
+            lines += [f'# HELP {PREFIX}{name} {help_text}', f'# TYPE {PREFIX}{name} histogram']
+            for endpoint in sorted({entry[1] for entry in series if entry[0] == name}):
+                label = f'endpoint="{_escape(endpoint)}"'
+                cumulative = 0
+                for index, bound in enumerate(buckets + ('+Inf',)):
+                    cumulative += values.get(self._key(name, endpoint, 'bucket', index), 0)
+                    lines.append(f'{PREFIX}{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                total = values.get(self._key(name, endpoint, 'sum', ''), 0) / scale
+                lines.append(f'{PREFIX}{name}_sum{{{label}}} {total:g}')
+                lines.append(f'{PREFIX}{name}_count{{{label}}} {values.get(self._key(name, endpoint, "count", ""), 0)}')
+        for name, (help_text, label_name) in COUNTERS.items():
+            lines += [f'# HELP {PREFIX}{name} {help_text}', f'# TYPE {PREFIX}{name} counter']
+            for _, endpoint, label in sorted(entry for entry in series if entry[0] == name):
+                labels = f'endpoint="{_escape(endpoint)}"' + (f',{label_name}="{_escape(label)}"' if label_name else '')
+                lines.append(f'{PREFIX}{name}{{{labels}}} {values.get(self._key(name, endpoint, "value", label), 0)}')
+        return '\n'.join(lines) + '\n'
+
+endpoint_metrics = EndpointMetrics()
@@ -0,0 +1,106 @@
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .metrics import endpoint_metrics
+from .recorder import RequestProfile, _current, instrument_templates, record_query
+import cProfile
+import logging
+import os
+import random
+
+logger = logging.getLogger('backend.profiling')
+
+def _wrap_connection(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+class RequestProfilingMiddleware:
+    """Records wall time, database time, query count, creator-cache outcomes and template time per request.
+
+    Add 'backend.profiling.middleware.RequestProfilingMiddleware' near the top of MIDDLEWARE. Each
+    request's numbers go into per-endpoint histograms (served by the metrics view). Requests over
+    PROFILING_SLOW_REQUEST_MS are logged to 'backend.profiling' with the statements that cost the
+    most and the stack that ran each of them. A PROFILING_SAMPLE_RATE share of synchronous requests
+    also runs under cProfile, with the output written to PROFILING_PROFILE_DIR. Async views are
+    timed but not profiled, since their event loop also runs other requests' code.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.slow_request = getattr(settings, 'PROFILING_SLOW_REQUEST_MS', 500) / 1000
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.profile_dir = getattr(settings, 'PROFILING_PROFILE_DIR', 'logs/backend/profiles')
+        connection_created.connect(_wrap_connection, dispatch_uid='backend-profiling')
+        instrument_templates()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = self._start()
+        token = _current.set(profile)
+        profiler = cProfile.Profile() if self.sample_rate and random.random() < self.sample_rate else None
+        try:
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                response = profiler.runcall(self.get_response, request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, profile, profiler)
+        return response
+
+    async def __acall__(self, request):
+        profile = self._start()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, profile, None)
+        return response
+
+    def _start(self):
+        # Connections opened before this middleware was loaded didn't go through connection_created
+        for connection in connections.all(initialized_only=True):
+            _wrap_connection(connection=connection)
+        return RequestProfile()
+
+    def _finish(self, request, response, profile, profiler):
+        profile.finish()
+        match = getattr(request, 'resolver_match', None)
+        endpoint = (match.url_name or match.view_name) if match else 'unresolved'
+        slow = profile.wall_time >= self.slow_request
+        profile_path = self._dump(endpoint, profiler) if profiler is not None else None
+        endpoint_metrics.observe(endpoint, profile, slow)
+        if slow:
+            self._report(request, response, endpoint, profile, profile_path)
+
+    def _dump(self, endpoint, profiler):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f'{endpoint}-{timezone.now():%Y%m%dT%H%M%S%f}-{os.getpid()}.prof')
+        profiler.dump_stats(path)
+        return path
+
+    def _report(self, request, response, endpoint, profile, profile_path):
+        user = getattr(request, 'user', None)
+        lines = [
+            f"Slow request {request.method} {request.get_full_path()} ({endpoint}) -> {response.status_code} "
+            f"in {profile.wall_time * 1000:.0f}ms for user {getattr(user, 'pk', None)}: {profile.query_count} "
+            f"queries in {profile.db_time * 1000:.0f}ms, templates {profile.template_time * 1000:.0f}ms, "
+            f"creator cache {profile.cache or 'unused'}."
+        ]
+        if profile_path:
+            lines.append(f"cProfile output: {profile_path}")
+        for sql, executions, total, slowest in profile.slowest_statements():
+            lines.append(f"{total * 1000:.1f}ms over {executions} execution(s), slowest {slowest.duration * 1000:.1f}ms: {sql[:2000]}")
+            lines.append(slowest.formatted_stack().rstrip())
+        logger.warning('\n'.join(lines))
@@ -0,0 +1,107 @@
+
+from contextvars import ContextVar
+import asgiref
+import cProfile
+import django
+import os
+import time
+import traceback
+
+# Frames from these packages (and the profiler itself) are dropped from query stacks so they point at our code
+_SKIPPED_PATHS = tuple(os.path.dirname(os.path.abspath(module.__file__)) + os.sep for module in (django, asgiref)) + (
+    os.path.dirname(os.path.abspath(__file__)) + os.sep, os.path.abspath(cProfile.__file__))
+STACK_LIMIT = 40
+MAX_RECORDED_QUERIES = 500
+
+_current = ContextVar('request_profile', default=None)
+
+class QueryRecord:
+    __slots__ = ('sql', 'duration', 'stack')
+
+    def __init__(self, sql, duration, stack):
+        self.sql = sql
+        self.duration = duration
+        self.stack = stack
+
+    def formatted_stack(self):
+        frames = [frame for frame in self.stack if not os.path.abspath(frame.filename).startswith(_SKIPPED_PATHS)]
+        return ''.join(traceback.format_list(frames))
+
+class RequestProfile:
+    """What one request spent its time on. Filled in from whichever thread runs the request's code."""
+
+    def __init__(self, max_queries=MAX_RECORDED_QUERIES):
+        self.started = time.perf_counter()
+        self.wall_time = 0.0
+        self.db_time = 0.0
+        self.query_count = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache = {}
+        self.queries = []
+        self.max_queries = max_queries
+
+    def query(self, sql, duration, stack):
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.queries) < self.max_queries:
+            self.queries.append(QueryRecord(sql, duration, stack))
+
+    def finish(self):
+        self.wall_time = time.perf_counter() - self.started
+
+    def slowest_statements(self, count=5):
+        """The statements that cost the most in total, as (sql, executions, total seconds, slowest QueryRecord).
+
+        Grouping by SQL text puts N+1 patterns (one statement run many times) next to single slow queries.
+        """
+        grouped = {}
+        for record in self.queries:
+            executions, total, slowest = grouped.get(record.sql, (0, 0.0, record))
+            grouped[record.sql] = (executions + 1, total + record.duration,
+                                   record if record.duration > slowest.duration else slowest)
+        ranked = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)[:count]
+        return [(sql, executions, total, slowest) for sql, (executions, total, slowest) in ranked]
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper: times each statement for the request being profiled, if any."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        # Source lines are only read if the stack ends up in a slow-request report
+        stack = traceback.StackSummary.extract(traceback.walk_stack(None), limit=STACK_LIMIT, lookup_lines=False)
+        stack.reverse()
+        profile.query(sql, duration, stack)
+
+def note_cache_lookup(outcome):
+    """Count a creator-cache outcome (hit_local, hit_shared, miss) against the current request."""
+    profile = _current.get()
+    if profile is not None:
+        profile.cache[outcome] = profile.cache.get(outcome, 0) + 1
+
+def instrument_templates():
+    """Time Django template rendering. Nested renders ({% extends %}, {% include %}) count once."""
+    from django.template.base import Template
+    original = Template._render
+    if getattr(original, 'profiled', False):
+        return
+
+    def _render(self, context):
+        profile = _current.get()
+        if profile is None or profile.template_depth:
+            return original(self, context)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            profile.template_depth -= 1
+            profile.template_time += time.perf_counter() - started
+
+    _render.profiled = True
+    Template._render = _render
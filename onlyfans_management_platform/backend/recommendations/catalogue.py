@@ -0,0 +1,48 @@
+
+from ..models.models import CreatorRecommendation
+from collections import namedtuple
+
+# What the request path needs from the recommendation engine. The scoring itself (engine.py, NumPy)
+# only runs in the nightly job, so views import this module instead and never load NumPy.
+
+Action = namedtuple('Action', 'key text keywords weights bias')
+
+# Candidate actions. Weights apply to engine.FEATURES standardized across all creators, so an action
+# scores high where the creator stands out from their peers in the direction it addresses.
+ACTIONS = (
+    Action('win_back', 'Send a personal win-back message to fans who have gone quiet; a large share of your fans are drifting away.',
+           ('win back', 'message', 'dm', 'inactive', 'quiet'), {'at_risk_share': 1.0, 'tipping_share': -0.3}, 0.0),
+    Action('reward_loyal', 'Reward your most loyal fans with an exclusive bundle; they are a big part of your audience and spend well.',
+           ('bundle', 'exclusive', 'reward', 'vip', 'loyal'), {'loyal_share': 0.8, 'avg_spend': 0.6}, 0.0),
+    Action('schedule_more', 'Schedule more content for the coming week; your calendar is lighter than other creators\'.',
+           ('schedule', 'post', 'content', 'upload', 'calendar'), {'upcoming_7d': -1.0, 'posts_30d': -0.5}, 0.0),
+    Action('live_qa', 'We recommend focusing on engaging with your fans by doing live Q&A sessions every week.',
+           ('live', 'q&a', 'stream', 'qa'), {'engagement_avg': -1.0}, 0.1),
+    Action('promotion', 'Run a limited-time subscription discount to restart fan growth.',
+           ('discount', 'promo', 'promotion', 'sale', 'free trial'), {'fan_growth_30d': -0.8, 'revenue_trend': -0.5}, 0.0),
+    Action('raise_prices', 'Test higher prices on pay-per-view posts; your fans spend more than average and revenue is rising.',
+           ('price', 'ppv', 'pay-per-view', 'raise'), {'avg_spend': 0.7, 'revenue_trend': 0.6}, 0.0),
+    Action('tip_goal', 'Set a tip goal on your next post; few of your fans have tipped this month.',
+           ('tip', 'goal', 'tips'), {'tipping_share': -1.0, 'fan_count': 0.3}, 0.0),
+)
+
+ACTION_INDEX = {action.key: action for action in ACTIONS}
+DEFAULT_LIFT = 15.0
+
+async def top_recommendation(creator):
+    """The creator's best-scoring recommendation text from the last scoring run, or None."""
+    return await (CreatorRecommendation.objects.filter(creator=creator, rank=0)
+                  .values_list('recommendation', flat=True).afirst())
+
+async def projected_lift(creator, action_description):
+    """Projected lift for a free-text action, or None if it mentions no catalogue action.
+
+    Of the catalogue actions whose keywords it mentions, the one ranked best for this creator in the
+    last scoring run gives the lift.
+    """
+    text = (action_description or '').lower()
+    matches = [action.key for action in ACTIONS if any(keyword in text for keyword in action.keywords)]
+    if not matches:
+        return None
+    return await (CreatorRecommendation.objects.filter(creator=creator, action__in=matches)
+                  .order_by('rank').values_list('projected_lift', flat=True).afirst())
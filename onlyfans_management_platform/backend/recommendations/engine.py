@@ -0,0 +1,137 @@
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+from ..fans.segmentation import AT_RISK, CHAMPION, HIBERNATING, LOYAL
+from ..models.models import AnalyticsData, ContentSchedule, CreatorFeatures, CreatorRecommendation, Fan
+from ..sharding.shards import fan_out, pinned, shard_aliases, shard_map
+from .catalogue import ACTIONS, DEFAULT_LIFT
+from datetime import timedelta
+import numpy as np
+
+FEATURES = (
+    'revenue_30d',
+    'revenue_trend',      # Revenue change against the 30 days before, as a fraction
+    'engagement_avg',
+    'fan_growth_30d',
+    'fan_count',
+    'at_risk_share',      # Fans segmented at_risk or hibernating
+    'loyal_share',        # Fans segmented champion or loyal
+    'avg_spend',
+    'tipping_share',      # Fans who tipped in the last 30 days
+    'posts_30d',
+    'upcoming_7d',
+)
+
+WEIGHTS = np.array([[action.weights.get(feature, 0.0) for feature in FEATURES] for action in ACTIONS])
+BIASES = np.array([action.bias for action in ACTIONS])
+WRITE_BATCH_SIZE = 1000
+
+def _grouped(queryset, **aggregates):
+    return {row.pop('creator_id'): row for row in queryset.order_by().values('creator_id').annotate(**aggregates)}
+
+def load_feature_matrix(now=None):
+    """One grouped query per source across the current shard's creators; returns (creator ids, creators x FEATURES matrix)."""
+    now = now or timezone.now()
+    month_ago, two_months_ago, week_ahead = now - timedelta(days=30), now - timedelta(days=60), now + timedelta(days=7)
+    recent = Q(timestamp__gte=month_ago)
+    analytics = _grouped(
+        AnalyticsData.objects.filter(timestamp__gte=two_months_ago),
+        revenue_30d=Sum('revenue', filter=recent),
+        revenue_prev=Sum('revenue', filter=~recent),
+        engagement_avg=Avg('engagement_rate', filter=recent),
+        fan_growth_30d=Sum('fan_growth', filter=recent),
+    )
+    fans = _grouped(
+        Fan.objects.all(),
+        fan_count=Count('id'),
+        at_risk=Count('id', filter=Q(segment__in=[AT_RISK, HIBERNATING])),
+        loyal=Count('id', filter=Q(segment__in=[CHAMPION, LOYAL])),
+        avg_spend=Avg('total_spend'),
+        tipping=Count('id', filter=Q(last_tip_at__gte=month_ago)),
+    )
+    schedule = _grouped(
+        ContentSchedule.objects.filter(schedule_time__gte=month_ago, schedule_time__lt=week_ahead),
+        posts_30d=Count('id', filter=Q(schedule_time__lt=now)),
+        upcoming_7d=Count('id', filter=Q(schedule_time__gte=now)),
+    )
+    creator_ids = np.array(sorted(analytics.keys() | fans.keys() | schedule.keys()), dtype=np.int64)
+
+    def column(source, key):
+        return np.array([(source.get(creator_id) or {}).get(key) or 0.0 for creator_id in creator_ids], dtype=np.float64)
+
+    revenue_30d, revenue_prev = column(analytics, 'revenue_30d'), column(analytics, 'revenue_prev')
+    fan_count = column(fans, 'fan_count')
+    denominator = np.maximum(fan_count, 1.0)
+    matrix = np.column_stack([
+        revenue_30d,
+        # No earlier revenue means no trend yet, not an infinite one
+        np.divide(revenue_30d - revenue_prev, revenue_prev, out=np.zeros_like(revenue_prev), where=revenue_prev > 0),
+        column(analytics, 'engagement_avg'),
+        column(analytics, 'fan_growth_30d'),
+        fan_count,
+        column(fans, 'at_risk') / denominator,
+        column(fans, 'loyal') / denominator,
+        column(fans, 'avg_spend'),
+        column(fans, 'tipping') / denominator,
+        column(schedule, 'posts_30d'),
+        column(schedule, 'upcoming_7d'),
+    ])
+    return creator_ids, matrix
+
+def standardize(matrix):
+    """Z-scores per feature across creators; a feature every creator shares scores 0."""
+    if not len(matrix):
+        return matrix
+    spread = matrix.std(axis=0)
+    return np.divide(matrix - matrix.mean(axis=0), spread, out=np.zeros_like(matrix), where=spread > 0)
+
+def score(matrix):
+    """Scores (creators x ACTIONS), action indices ordered best first, and projected lift in percent."""
+    scores = standardize(matrix) @ WEIGHTS.T + BIASES
+    order = np.argsort(-scores, axis=1, kind='stable')
+    lift = np.clip(DEFAULT_LIFT + 5.0 * scores, 1.0, 40.0)
+    return scores, order, lift
+
+def _write(model, rows, unique_fields, update_fields):
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        model.objects.bulk_create(rows[start:start + WRITE_BATCH_SIZE], update_conflicts=True,
+                                  unique_fields=unique_fields, update_fields=update_fields)
+
+def load_all_shards(now=None):
+    """load_feature_matrix over every shard: (creator ids, matrix, shard of each creator).
+
+    A creator found on two shards, part-way through a move, is taken from the one the shard map gives.
+    """
+    vectors, shards = {}, {}
+    for alias, (creator_ids, matrix) in zip(shard_aliases(), fan_out(lambda alias: load_feature_matrix(now))):
+        for row, creator_id in enumerate(creator_ids.tolist()):
+            if creator_id not in shards or shard_map.shard_of(creator_id) == alias:
+                vectors[creator_id], shards[creator_id] = matrix[row], alias
+    creator_ids = sorted(vectors)
+    matrix = np.array([vectors[creator_id] for creator_id in creator_ids], dtype=np.float64).reshape(-1, len(FEATURES))
+    return np.array(creator_ids, dtype=np.int64), matrix, [shards[creator_id] for creator_id in creator_ids]
+
+def score_all_creators(now=None):
+    """Rebuild every creator's feature vector and ranked recommendations. Returns the number of creators scored.
+
+    Creators on every shard are standardized together, so a creator's scores don't depend on their shard.
+    """
+    now = now or timezone.now()
+    creator_ids, matrix, shards = load_all_shards(now)
+    scores, order, lift = score(matrix)
+    features, recommendations = {}, {}
+    for row, creator_id in enumerate(creator_ids.tolist()):
+        features.setdefault(shards[row], []).append(CreatorFeatures(
+            creator_id=creator_id, computed_at=now, vector=dict(zip(FEATURES, matrix[row].round(6).tolist()))))
+        for rank, index in enumerate(order[row].tolist()):
+            action = ACTIONS[index]
+            recommendations.setdefault(shards[row], []).append(CreatorRecommendation(
+                creator_id=creator_id, rank=rank, action=action.key, recommendation=action.text,
+                score=float(scores[row, index]), projected_lift=float(lift[row, index]), computed_at=now))
+    for alias in shard_aliases():
+        with pinned(alias):
+            _write(CreatorFeatures, features.get(alias, []), ['creator'], ['vector', 'computed_at', 'updated_at'])
+            _write(CreatorRecommendation, recommendations.get(alias, []), ['creator', 'rank'],
+                   ['action', 'recommendation', 'score', 'projected_lift', 'computed_at', 'updated_at'])
+            CreatorRecommendation.objects.filter(rank__gte=len(ACTIONS)).delete()
+    return len(creator_ids)
@@ -0,0 +1,222 @@
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils import timezone
+from ..models.models import AIRecommendation, ActionSuggestion, AdminAccessLog, AnalyticsData
+from ..sharding.shards import DIRECTORY, current_shard
+from datetime import datetime
+import gzip
+import json
+import logging
+import os
+
+# Append-only tables split into monthly partitions on their time column
+PARTITIONED = {
+    AdminAccessLog: 'access_time',
+    AnalyticsData: 'timestamp',
+    ActionSuggestion: 'timestamp',
+    AIRecommendation: 'timestamp',
+}
+
+# Months kept online per model; RETENTION_MONTHS overrides by model name
+DEFAULT_RETENTION_MONTHS = {
+    'AdminAccessLog': 24,
+    'AnalyticsData': 24,
+    'ActionSuggestion': 12,
+    'AIRecommendation': 12,
+}
+DELETE_BATCH_SIZE = 5000
+
+def month_start(value):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def partition_name(model, month):
+    return f'{model._meta.db_table}_p{month:%Y%m}'
+
+def retention_months(model):
+    configured = getattr(settings, 'RETENTION_MONTHS', {})
+    return configured.get(model.__name__, DEFAULT_RETENTION_MONTHS[model.__name__])
+
+def _connection():
+    # Every partitioned model is sharded; the functions here work on the pinned shard (BACKEND_SHARD outside a pin)
+    return connections[current_shard()]
+
+def supports_partitioning():
+    return _connection().vendor == 'postgresql'
+
+def is_partitioned(model):
+    if not supports_partitioning():
+        return False
+    with _connection().cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [model._meta.db_table])
+        return cursor.fetchone() is not None
+
+def list_partitions(model):
+    """(partition table, first month it holds) for every monthly partition, oldest first."""
+    table = model._meta.db_table
+    with _connection().cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)', [table])
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f'{table}_p'
+    partitions = []
+    for name in names:
+        if name.startswith(prefix) and name[len(prefix):].isdigit():
+            month = timezone.make_aware(datetime.strptime(name[len(prefix):], '%Y%m'))
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def convert_to_partitioned(model):
+    """Turn the model's table into a table partitioned by month on its time column (PostgreSQL).
+
+    The existing table is renamed to <table>_legacy and attached as the partition for everything
+    before the current month, so no rows are copied. The primary key becomes (id, time column), as
+    PostgreSQL requires the partition key in every unique constraint; new ids continue after the
+    existing ones. Foreign keys and secondary indexes are recreated on the new parent.
+    """
+    table = model._meta.db_table
+    column = model._meta.get_field(PARTITIONED[model]).column
+    connection = _connection()
+    quote = connection.ops.quote_name
+    legacy = f'{table}_legacy'
+    first_month = month_start(timezone.now())
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+                       "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute('SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index '
+                       'WHERE indrelid = to_regclass(%s) AND NOT indisprimary', [table])
+        indexes = cursor.fetchall()
+        cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'", [table])
+        identity = cursor.fetchone()[0]
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}')
+        cursor.execute(f'CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY '
+                       f'INCLUDING CONSTRAINTS, PRIMARY KEY ("id", {quote(column)})) PARTITION BY RANGE ({quote(column)})')
+        if identity:
+            # The copied identity has a fresh sequence; continue after the legacy ids and retire the old one
+            cursor.execute(f'SELECT COALESCE(MAX("id"), 0) + 1 FROM {quote(legacy)}')
+            cursor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN "id" RESTART WITH {int(cursor.fetchone()[0])}')
+            cursor.execute(f'ALTER TABLE {quote(legacy)} ALTER COLUMN "id" DROP IDENTITY')
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name[:61] + "_p")} {definition}')
+        for name, definition in indexes:
+            # Index names are unique per schema: the legacy table's index is renamed and the definition, which
+            # names the table, now creates the same index on the new parent
+            cursor.execute(f'ALTER INDEX {name} RENAME TO {quote(name.split(".")[-1].strip(chr(34))[:58] + "_lgcy")}')
+            cursor.execute(definition)
+        cursor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(legacy)} '
+                       'FOR VALUES FROM (MINVALUE) TO (%s)', [first_month])
+    ensure_partitions(model)
+    logging.info(f"Partitioned {table} by month on {column}; rows before {first_month:%Y-%m} stay in {legacy}.")
+
+def ensure_partitions(model, months_ahead=3):
+    """Create monthly partitions from the current month through `months_ahead` months ahead, plus a default partition.
+
+    Returns the names of the partitions created. Rows outside every range land in the default
+    partition rather than failing to insert; keep it empty by running this ahead of time.
+    """
+    table = model._meta.db_table
+    connection = _connection()
+    quote = connection.ops.quote_name
+    existing = {name for name, _ in list_partitions(model)}
+    created = []
+    month = month_start(timezone.now())
+    with connection.cursor() as cursor:
+        for _ in range(months_ahead + 1):
+            name = partition_name(model, month)
+            if name not in existing:
+                cursor.execute(f'CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} '
+                               'FOR VALUES FROM (%s) TO (%s)', [month, add_months(month, 1)])
+                created.append(name)
+            month = add_months(month, 1)
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {quote(table + "_default")} PARTITION OF {quote(table)} DEFAULT')
+    return created
+
+def archive_path(model, month, directory):
+    # Each shard archives its own creators' rows for the same months
+    shard = current_shard()
+    directory = directory if shard == DIRECTORY else os.path.join(directory, shard)
+    return os.path.join(directory, model._meta.db_table, f'{model._meta.db_table}-{month:%Y-%m}.jsonl.gz')
+
+def archive_month(model, month, directory):
+    """Write one month of rows to a gzipped JSONL file and return (path, rows written).
+
+    Filtering on the time column means a partitioned table only reads that month's partition.
+    """
+    field = PARTITIONED[model]
+    path = archive_path(model, month, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = (model.objects.filter(**{f'{field}__gte': month, f'{field}__lt': add_months(month, 1)})
+            .order_by(field).values().iterator(chunk_size=DELETE_BATCH_SIZE))
+    count = 0
+    with gzip.open(path + '.partial', 'wt', encoding='utf-8') as archive:
+        for row in rows:
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            count += 1
+    os.replace(path + '.partial', path)
+    return path, count
+
+def expired_months(model, keep_months, now=None):
+    """Months older than the newest `keep_months` that still have rows, oldest first."""
+    field = PARTITIONED[model]
+    cutoff = add_months(month_start(now or timezone.now()), -keep_months + 1)
+    oldest = model.objects.filter(**{f'{field}__lt': cutoff}).order_by(field).values_list(field, flat=True).first()
+    months = []
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months, cutoff
+
+def expire(model, directory, keep_months=None, dry_run=False):
+    """Archive and remove every month older than the retention window. Returns (month, rows) per month removed.
+
+    Monthly partitions are detached and dropped whole after archiving. Rows older than the first
+    monthly partition (the legacy partition) and tables that aren't partitioned are deleted in
+    primary-key batches instead, so no single DELETE holds locks on the whole range.
+    AnalyticsData history is already folded into AnalyticsRollup, which is not expired.
+    """
+    keep_months = keep_months or retention_months(model)
+    months, cutoff = expired_months(model, keep_months)
+    partitions = dict((month, name) for name, month in list_partitions(model)) if is_partitioned(model) else {}
+    # Empty monthly partitions past the cutoff are dropped too
+    months = sorted(set(months) | {month for month in partitions if month < cutoff})
+    removed = []
+    for month in months:
+        if dry_run:
+            count = model.objects.filter(**{f'{PARTITIONED[model]}__gte': month,
+                                            f'{PARTITIONED[model]}__lt': add_months(month, 1)}).count()
+            if count:
+                removed.append((month, count))
+            continue
+        path, count = archive_month(model, month, directory)
+        if not count:
+            os.remove(path)
+        if month in partitions:
+            connection = _connection()
+            quote = connection.ops.quote_name
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {quote(model._meta.db_table)} DETACH PARTITION {quote(partitions[month])}')
+                cursor.execute(f'DROP TABLE {quote(partitions[month])}')
+        else:
+            _delete_month(model, month)
+        if count:
+            logging.info(f"Archived {count} {model.__name__} row(s) for {month:%Y-%m} to {path}.")
+            removed.append((month, count))
+    return removed
+
+def _delete_month(model, month):
+    field = PARTITIONED[model]
+    rows = model.objects.filter(**{f'{field}__gte': month, f'{field}__lt': add_months(month, 1)})
+    while True:
+        batch = list(rows.values_list('pk', flat=True)[:DELETE_BATCH_SIZE])
+        if not batch:
+            return
+        model.objects.filter(pk__in=batch).delete()
@@ -0,0 +1,143 @@
+
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from ..models.models import ContentSchedule
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import heapq
+import logging
+import threading
+import time
+
+class PublishBackend:
+    """Receives due ContentSchedule rows. `publish` raises to signal a failed attempt."""
+
+    def publish(self, schedule):
+        raise NotImplementedError
+
+class LocalPublishBackend(PublishBackend):
+    """Records what would have been published; used in development, tests and benchmarks."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published = []
+
+    def publish(self, schedule):
+        with self.lock:
+            self.published.append((schedule.pk, schedule.schedule_time, time.time()))
+        logging.info(f"Published scheduled content {schedule.pk} for {schedule.creator_id}.")
+
+def get_publish_backend():
+    return import_string(getattr(settings, 'CONTENT_PUBLISH_BACKEND',
+                                 'backend.scheduling.dispatcher.LocalPublishBackend'))()
+
+class Dispatcher:
+    """Publishes ContentSchedule rows when their schedule_time arrives.
+
+    Pending rows due within `horizon` are read through the (status, schedule_time) index into a heap,
+    refreshed every `refresh_interval` seconds, and the loop sleeps until the earliest of the next due
+    item or the next refresh. Due rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and leased
+    through claimed_at, so several dispatchers can share the table without double-publishing; a lease
+    left behind by a crashed dispatcher expires and the row is picked up again. A dispatcher only sees
+    its process's shard (BACKEND_SHARD), so every shard needs its own.
+    """
+
+    def __init__(self, backend=None, horizon=timedelta(seconds=60), refresh_interval=1.0, lease=timedelta(minutes=5),
+                 retry_delay=timedelta(seconds=30), max_attempts=3, batch_size=200, publish_workers=8, max_queued=50000):
+        self.backend = backend or get_publish_backend()
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.pool = ThreadPoolExecutor(max_workers=publish_workers, thread_name_prefix='publish')
+        self._heap = []
+        self._queued = {}
+        self._next_refresh = 0.0
+        self.dispatched = 0
+
+    def refresh(self):
+        now = timezone.now()
+        ContentSchedule.objects.filter(status=ContentSchedule.PUBLISHING, claimed_at__lt=now - self.lease).update(
+            status=ContentSchedule.PENDING, updated_at=now)
+        rows = (ContentSchedule.objects
+                .filter(status=ContentSchedule.PENDING, schedule_time__lte=now + self.horizon)
+                .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - self.retry_delay))
+                .order_by('schedule_time')
+                .values_list('pk', 'schedule_time')[:self.max_queued])
+        for pk, schedule_time in rows:
+            due = schedule_time.timestamp()
+            if self._queued.get(pk) != due:
+                self._queued[pk] = due
+                heapq.heappush(self._heap, (due, pk))
+        self._next_refresh = time.time() + self.refresh_interval
+
+    def pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            when, pk = heapq.heappop(self._heap)
+            # Skip entries superseded by a rescheduled time
+            if self._queued.get(pk) == when:
+                del self._queued[pk]
+                due.append(pk)
+        return due
+
+    def claim(self, pks):
+        now = timezone.now()
+        with transaction.atomic(using=router.db_for_write(ContentSchedule)):
+            claimed = list(ContentSchedule.objects.select_for_update(skip_locked=True, of=('self',))
+                           .filter(pk__in=pks, status=ContentSchedule.PENDING, schedule_time__lte=now)
+                           .select_related('creator'))
+            ContentSchedule.objects.filter(pk__in=[schedule.pk for schedule in claimed]).update(
+                status=ContentSchedule.PUBLISHING, claimed_at=now, attempts=F('attempts') + 1, updated_at=now)
+        return claimed
+
+    def publish(self, schedules):
+        futures = [(schedule, self.pool.submit(self.backend.publish, schedule)) for schedule in schedules]
+        published = []
+        for schedule, future in futures:
+            try:
+                future.result()
+            except Exception as error:
+                status = ContentSchedule.FAILED if schedule.attempts + 1 >= self.max_attempts else ContentSchedule.PENDING
+                ContentSchedule.objects.filter(pk=schedule.pk).update(status=status, last_error=repr(error),
+                                                                      updated_at=timezone.now())
+                logging.warning(f"Publishing scheduled content {schedule.pk} failed: {error!r}")
+            else:
+                published.append(schedule.pk)
+        now = timezone.now()
+        ContentSchedule.objects.filter(pk__in=published).update(
+            status=ContentSchedule.PUBLISHED, published_at=now, last_error='', updated_at=now)
+        self.dispatched += len(published)
+        return published
+
+    def run_once(self):
+        if time.time() >= self._next_refresh:
+            self.refresh()
+        due = self.pop_due(time.time())
+        if due:
+            claimed = self.claim(due)
+            if claimed:
+                self.publish(claimed)
+        return len(due)
+
+    def seconds_until_next(self):
+        wake = self._next_refresh
+        if self._heap:
+            wake = min(wake, self._heap[0][0])
+        return max(0.0, wake - time.time())
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                if not self.run_once():
+                    stop.wait(self.seconds_until_next())
+        finally:
+            self.pool.shutdown(wait=True)
@@ -1,21 +1,74 @@
 
-from django.contrib.auth.models import User
-from django.core.mail import send_mail
-import random
+from django.conf import settings
+from django.core.cache import caches
+from django.core.mail import EmailMessage
+from django.utils.crypto import constant_time_compare, salted_hmac
+from .mail import mail_sender
+import secrets
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, filename='logs/backend/security.log',
-                    format='%(asctime)s %(levelname)s:%(message)s')
+# Written to logs/backend/security.log, see backend.logconfig
+logger = logging.getLogger('backend.security')
 
-def send_verification_code(user_email):
-    code = random.randint(100000, 999999)
-    send_mail(
+CODE_DIGITS = 6
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def _store():
+    # Codes live in the cache (Redis/Memcached in production), never in the database or the session
+    return caches[_setting('TWO_FACTOR_CACHE_ALIAS', 'default')]
+
+def _code_key(user):
+    return f'2fa:code:{user.pk}'
+
+def _attempts_key(user):
+    return f'2fa:attempts:{user.pk}'
+
+def _digest(user, code):
+    # Keyed by SECRET_KEY and the user, so a leaked store entry can't be checked offline
+    return salted_hmac('backend.security.2fa', f'{user.pk}:{code}').hexdigest()
+
+class TooManyRequests(Exception):
+    pass
+
+def send_verification_code(user):
+    """Issue a new code for the user and queue it for email. The code itself is never returned or stored.
+
+    Raises TooManyRequests if a code was issued less than TWO_FACTOR_RESEND_INTERVAL seconds ago.
+    """
+    store = _store()
+    ttl = _setting('TWO_FACTOR_CODE_TTL', 300)
+    if not store.add(f'2fa:resend:{user.pk}', 1, timeout=_setting('TWO_FACTOR_RESEND_INTERVAL', 30)):
+        raise TooManyRequests('A verification code was sent recently.')
+    code = f'{secrets.randbelow(10 ** CODE_DIGITS):0{CODE_DIGITS}d}'
+    store.set_many({_code_key(user): _digest(user, code), _attempts_key(user): 0}, timeout=ttl)
+    mail_sender.send(EmailMessage(
         'Your Verification Code',
         f'Your verification code is {code}',
-        'admin@yourdomain.com',
-        [user_email],
-        fail_silently=False,
-    )
-    logging.info(f"Verification code sent to {user_email}")
-    return code
+        _setting('TWO_FACTOR_FROM_EMAIL', 'admin@yourdomain.com'),
+        [user.email],
+    ))
+    logger.info(f"Verification code queued for {user.email}")
+
+def verify_code(user, code):
+    """True if `code` matches the user's current code. A code works once, and is discarded after
+    TWO_FACTOR_MAX_ATTEMPTS wrong guesses or when it expires."""
+    store = _store()
+    digest = store.get(_code_key(user))
+    if digest is None:
+        return False
+    try:
+        attempts = store.incr(_attempts_key(user))
+    except ValueError:
+        # The counter expired together with the code
+        return False
+    if attempts > _setting('TWO_FACTOR_MAX_ATTEMPTS', 5):
+        store.delete_many([_code_key(user), _attempts_key(user)])
+        logger.warning(f"Verification code for user {user.pk} discarded after too many attempts.")
+        return False
+    if not constant_time_compare(digest, _digest(user, str(code).strip())):
+        return False
+    store.delete_many([_code_key(user), _attempts_key(user)])
+    logger.info(f"User {user.pk} passed two-factor verification.")
+    return True
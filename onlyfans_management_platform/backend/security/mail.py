@@ -0,0 +1,118 @@
+
+from django.conf import settings
+from django.core.mail import get_connection
+import atexit
+import logging
+import os
+import queue
+import threading
+
+_STOP = object()
+
+class MailQueueFull(Exception):
+    pass
+
+class MailSender:
+    """Sends EmailMessages from a background thread over one reused mail connection.
+
+    send() only enqueues, so callers never wait for the mail server. The thread drains up to
+    `batch_size` messages at a time into a single send_messages() call on a connection it keeps
+    open between batches, reconnects once when a batch fails, and closes the connection after
+    `idle_timeout` seconds without mail. The queue is bounded: when it stays full for
+    `enqueue_timeout` seconds send() raises MailQueueFull instead of growing without limit.
+    """
+
+    def __init__(self, queue_size=None, batch_size=None, idle_timeout=None, enqueue_timeout=1.0):
+        self.queue_size = queue_size or getattr(settings, 'MAIL_QUEUE_SIZE', 1000)
+        self.batch_size = batch_size or getattr(settings, 'MAIL_BATCH_SIZE', 50)
+        self.idle_timeout = idle_timeout or getattr(settings, 'MAIL_IDLE_TIMEOUT', 30.0)
+        self.enqueue_timeout = enqueue_timeout
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._connection = None
+        self.sent = 0
+        self.failed = 0
+        self.connections_opened = 0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._connection = None
+                self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def send(self, message):
+        self._ensure_started()
+        try:
+            self._queue.put(message, timeout=self.enqueue_timeout)
+        except queue.Full:
+            raise MailQueueFull('The outgoing mail queue is full.')
+
+    def _run(self):
+        while True:
+            try:
+                message = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close()
+                continue
+            batch = [message]
+            while message is not _STOP and len(batch) < self.batch_size:
+                try:
+                    message = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(message)
+            try:
+                self._deliver([entry for entry in batch if entry is not _STOP])
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is _STOP:
+                self._close()
+                return
+
+    def _deliver(self, messages):
+        if not messages:
+            return
+        for attempt in (1, 2):
+            try:
+                if self._connection is None:
+                    self._connection = get_connection(fail_silently=False)
+                    self._connection.open()
+                    self.connections_opened += 1
+                self.sent += self._connection.send_messages(messages) or 0
+                return
+            except Exception as error:
+                # A dropped or timed-out connection: start a fresh one and retry the batch once
+                self._close()
+                if attempt == 2:
+                    self.failed += len(messages)
+                    logging.error(f"Could not send {len(messages)} message(s): {error!r}")
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def flush(self):
+        """Block until every queued message has been handed to the mail server (or given up on)."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._pid = None
+
+mail_sender = MailSender()
+atexit.register(mail_sender.stop)
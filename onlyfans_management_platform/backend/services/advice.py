@@ -0,0 +1,36 @@
+
+from django.conf import settings
+from .outbound import ServiceError, post_json
+import logging
+
+DEFAULT_RECOMMENDATION = "We recommend focusing on engaging with your fans by doing live Q&A sessions every week."
+
+def local_outcome(action_description, lift):
+    return f"If you {action_description}, you'll likely see a {lift:.0f}% boost in engagement!"
+
+async def project_outcome(creator, action_description):
+    """Projected outcome of an action, from ACTION_OUTCOME_SERVICE_URL when configured, else from the scored catalogue."""
+    url = getattr(settings, 'ACTION_OUTCOME_SERVICE_URL', None)
+    if url:
+        try:
+            response = await post_json(url, {'creator_id': creator.pk, 'action_description': action_description})
+            return str(response['projected_outcome'])
+        except (ServiceError, KeyError, TypeError) as error:
+            logging.warning(f"Outcome service failed for {creator.username}, using the local projection: {error!r}")
+    from ..recommendations.catalogue import DEFAULT_LIFT, projected_lift
+
+    lift = await projected_lift(creator, action_description)
+    return local_outcome(action_description, DEFAULT_LIFT if lift is None else lift)
+
+async def recommend(creator):
+    """A recommendation for the creator: RECOMMENDATION_SERVICE_URL when configured, else the nightly scored one."""
+    url = getattr(settings, 'RECOMMENDATION_SERVICE_URL', None)
+    if url:
+        try:
+            response = await post_json(url, {'creator_id': creator.pk})
+            return str(response['recommendation'])
+        except (ServiceError, KeyError, TypeError) as error:
+            logging.warning(f"Recommendation service failed for {creator.username}, using the scored one: {error!r}")
+    from ..recommendations.catalogue import top_recommendation
+
+    return await top_recommendation(creator) or DEFAULT_RECOMMENDATION
@@ -0,0 +1,47 @@
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import asyncio
+import weakref
+
+class ServiceError(Exception):
+    pass
+
+# One pooled client per event loop: under ASGI that is one per process, so connections are reused across requests.
+# Under WSGI every async_to_sync call runs on a fresh loop, so each client is closed as its loop shuts down.
+_clients = weakref.WeakKeyDictionary()
+
+async def _close_on_shutdown(client):
+    # Left suspended at the yield; the loop closes it, and so the client, in shutdown_asyncgens(),
+    # which asyncio.run() and async_to_sync() both call before closing the loop
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+async def _client():
+    try:
+        import httpx
+    except ImportError:
+        raise ImproperlyConfigured('Calling outbound services needs httpx (pip install httpx).')
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(loop)
+    if entry is None:
+        client = httpx.AsyncClient(
+            timeout=getattr(settings, 'OUTBOUND_TIMEOUT', 10.0),
+            limits=httpx.Limits(max_connections=getattr(settings, 'OUTBOUND_MAX_CONNECTIONS', 100)),
+        )
+        entry = _clients[loop] = (client, _close_on_shutdown(client))
+        await entry[1].__anext__()
+    return entry[0]
+
+async def post_json(url, payload):
+    """POST a JSON payload without blocking the event loop and return the decoded JSON response."""
+    client = await _client()
+    import httpx
+    try:
+        response = await client.post(url, json=payload)
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError) as error:
+        raise ServiceError(f'{url}: {error!r}') from error
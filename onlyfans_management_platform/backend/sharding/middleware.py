@@ -0,0 +1,46 @@
+
+from django.http import HttpResponse
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from contextlib import nullcontext
+from .shards import ShardMoving, pinned, shard_map
+import logging
+
+MOVE_RETRY_AFTER = 5
+
+class CreatorShardMiddleware:
+    """Pins the request's queries on sharded models to the signed-in user's shard.
+
+    Add 'backend.sharding.middleware.CreatorShardMiddleware' after AuthenticationMiddleware. Views
+    that read across creators (superuser listings) go through sharding.shards.fan_out instead. A
+    write refused because the creator is being moved answers 503 with Retry-After.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        user = request.user
+        with pinned(shard_map.shard_of(user.pk), user.pk) if user.is_authenticated else nullcontext():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return await self.get_response(request)
+        with pinned(await sync_to_async(shard_map.shard_of)(user.pk), user.pk):
+            return await self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, ShardMoving):
+            logging.info(f"Refused a write during a shard move: {exception}")
+            return HttpResponse('This account is being moved; try again shortly.', status=503,
+                                headers={'Retry-After': str(MOVE_RETRY_AFTER)})
+        return None
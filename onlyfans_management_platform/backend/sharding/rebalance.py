@@ -0,0 +1,199 @@
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .shards import DIRECTORY, SHARDED_MODELS, shard_aliases, shard_map
+from .signals import mirror_users
+from datetime import timedelta
+import logging
+import time
+
+COPY_BATCH_SIZE = 1000
+CATCH_UP_PASSES = 3
+# Rows of these are only ever inserted or deleted, so catching up copies just the missing ones
+APPEND_ONLY = {'backend.adminaccesslog', 'backend.analyticsdata', 'backend.actionsuggestion', 'backend.airecommendation',
+               'backend.analyticsrollup', 'backend.uploadchunk'}
+# Rows of the other sharded models change in place; every write moves one of these columns forward (saves through
+# auto_now, bulk and queryset writes explicitly), so catching up re-copies only the rows changed since the last pass
+CHANGED_AT = {
+    'backend.creatorvault': ('updated_at',),
+    'backend.fan': ('updated_at',),
+    'backend.analyticsrollupstate': ('refreshed_at',),
+    'backend.automationflow': ('updated_at', 'last_executed_at'),
+    'backend.contentschedule': ('updated_at',),
+    'backend.creatorfeatures': ('updated_at',),
+    'backend.creatorrecommendation': ('updated_at',),
+    'backend.uploadsession': ('updated_at',),
+}
+
+class MoveError(Exception):
+    pass
+
+def _models():
+    return [apps.get_model(label) for label in SHARDED_MODELS]
+
+def _owned(model, alias, creator_id):
+    return model._base_manager.using(alias).filter(**{SHARDED_MODELS[model._meta.label_lower]: creator_id})
+
+def _pks(model, alias, creator_id):
+    return set(_owned(model, alias, creator_id).values_list('pk', flat=True))
+
+def _batches(items, size):
+    items = sorted(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _fields(model):
+    # Primary key first, so the last row of a batch gives the next batch's start
+    return [model._meta.pk] + [field for field in model._meta.concrete_fields if not field.primary_key]
+
+def _upsert(model, target, rows):
+    """Insert rows (tuples of _fields values) into target as they are, replacing rows with the same pk.
+
+    Raw SQL, because bulk_create would re-stamp auto_now fields and save() would fire signals.
+    """
+    connection = connections[target]
+    quote = connection.ops.quote_name
+    fields = _fields(model)
+    pk = model._meta.pk
+    if model._meta.label_lower in APPEND_ONLY:
+        conflict = 'DO NOTHING'
+    else:
+        conflict = f'({quote(pk.column)}) DO UPDATE SET ' + ', '.join(
+            f'{quote(field.column)} = excluded.{quote(field.column)}' for field in fields if field is not pk)
+    sql = (f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(field.column) for field in fields)}) '
+           f'VALUES ({", ".join(["%s"] * len(fields))}) ON CONFLICT {conflict}')
+    params = [[field.get_db_prep_save(value, connection) for field, value in zip(fields, row)] for row in rows]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+    return len(params)
+
+def _copy(model, source, target, creator_id, batch_size, pks=None):
+    """Copy the creator's rows of `model`, or only those in `pks`, from source to target in pk batches."""
+    rows = _owned(model, source, creator_id).order_by('pk').values_list(*[field.attname for field in _fields(model)])
+    copied = 0
+    if pks is not None:
+        for batch in _batches(pks, batch_size):
+            copied += _upsert(model, target, rows.filter(pk__in=batch))
+        return copied
+    last = None
+    while True:
+        batch = list((rows.filter(pk__gt=last) if last is not None else rows)[:batch_size])
+        if not batch:
+            return copied
+        copied += _upsert(model, target, batch)
+        last = batch[-1][0]
+
+def _delete(model, alias, pks, batch_size):
+    """Delete rows by pk without signals: the rows still exist elsewhere, so blob counts and caches stay as they are."""
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    pk = model._meta.pk
+    for batch in _batches(pks, batch_size):
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(pk.column)} IN '
+                           f'({", ".join(["%s"] * len(batch))})', [pk.get_db_prep_value(value, connection) for value in batch])
+
+def _catch_up(models, source, target, creator_id, since, batch_size):
+    """Bring the target's copy up to date and return the number of rows copied per model.
+
+    Rows deleted on the source are dropped, children first; then rows added on the source, and rows of
+    mutable models changed at or after `since`, are copied, parents first. The source's pks are read
+    parents first for the deletes and children first for the copies, so while the source keeps changing
+    a row is never left behind by, or copied ahead of, its parent.
+    """
+    deleted = [(model, _pks(model, target, creator_id) - _pks(model, source, creator_id)) for model in models]
+    for model, pks in reversed(deleted):
+        _delete(model, target, pks, batch_size)
+    on_source = {model: _pks(model, source, creator_id) for model in reversed(models)}
+    copied = {}
+    for model in models:
+        pks = on_source[model] - _pks(model, target, creator_id)
+        label = model._meta.label_lower
+        if label not in APPEND_ONLY:
+            changed = Q()
+            for field in CHANGED_AT[label]:
+                changed |= Q(**{f'{field}__gte': since})
+            pks |= on_source[model] & set(_owned(model, source, creator_id).filter(changed).values_list('pk', flat=True))
+        copied[model.__name__] = _copy(model, source, target, creator_id, batch_size, pks=pks)
+    return copied
+
+def _referenced_users(models, source, creator_id):
+    User = get_user_model()
+    ids = {creator_id}
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model is User and field.attname != 'creator_id':
+                ids |= set(_owned(model, source, creator_id).values_list(field.attname, flat=True).distinct())
+    return User.objects.using(DIRECTORY).filter(pk__in=ids)
+
+def move_creator(creator_id, target, batch_size=COPY_BATCH_SIZE, grace=None, log=logging.info):
+    """Move every sharded row of a creator to the `target` shard while the creator keeps using the site.
+
+    1. Copy the rows in pk batches while the source stays authoritative.
+    2. Catch up, still unfrozen, on rows added, deleted or changed (CHANGED_AT) since the previous pass,
+       for up to CATCH_UP_PASSES passes or until a pass copies no more than a batch.
+    3. Mark the creator as moving and wait `grace` seconds (SHARD_MOVE_GRACE, default 5) so every
+       process has seen it and in-flight writes have finished; from then on writes raise ShardMoving.
+    4. Catch up once more in one transaction; only what changed since the last pass is copied.
+    5. Point the map at the target, wait `grace` again for readers still on the source, and delete
+       the source rows.
+
+    Writes only wait out steps 3-4. Each pass looks back `grace` seconds before the previous one started,
+    for writes stamped before it began but committed after, and for clocks a little apart. Queryset
+    writes from background workers that aren't pinned to the creator aren't refused, so pause the
+    creator's automation and dispatching for large moves. Returns rows copied per model.
+    """
+    grace = grace if grace is not None else getattr(settings, 'SHARD_MOVE_GRACE', 5.0)
+    source, moving = shard_map.entry(creator_id)
+    if target not in shard_aliases():
+        raise MoveError(f'{target!r} is not one of the configured shards.')
+    if moving:
+        raise MoveError(f'Creator {creator_id} is already being moved.')
+    if target == source:
+        raise MoveError(f'Creator {creator_id} is already on {target}.')
+    models = _models()
+    lookback = timedelta(seconds=grace)
+
+    # Leftovers from an interrupted move would collide with the copy
+    for model in reversed(models):
+        _delete(model, target, _pks(model, target, creator_id), batch_size)
+    mirror_users(list(_referenced_users(models, source, creator_id)), [target])
+
+    copied = {}
+    since = timezone.now()
+    for model in models:
+        copied[model.__name__] = _copy(model, source, target, creator_id, batch_size)
+        log(f"Copied {copied[model.__name__]} {model.__name__} row(s) to {target}.")
+
+    for _ in range(CATCH_UP_PASSES):
+        started = timezone.now()
+        mirror_users(list(_referenced_users(models, source, creator_id)), [target])
+        caught_up = sum(_catch_up(models, source, target, creator_id, since - lookback, batch_size).values())
+        since = started
+        log(f"Caught up {caught_up} row(s) on {target} before freezing writes.")
+        if caught_up <= batch_size:
+            break
+
+    shard_map.assign(creator_id, source, moving=True)
+    try:
+        time.sleep(grace)
+        mirror_users(list(_referenced_users(models, source, creator_id)), [target])
+        with transaction.atomic(using=target):
+            caught_up = _catch_up(models, source, target, creator_id, since - lookback, batch_size)
+        for name, count in caught_up.items():
+            log(f"Caught up {count} {name} row(s) on {target}.")
+    except BaseException:
+        shard_map.assign(creator_id, source, moving=False)
+        raise
+    shard_map.assign(creator_id, target, moving=False)
+
+    time.sleep(grace)
+    for model in reversed(models):
+        _delete(model, source, _pks(model, source, creator_id), batch_size)
+    log(f"Creator {creator_id} moved from {source} to {target}.")
+    return copied
@@ -0,0 +1,40 @@
+
+from .shards import DIRECTORY, ShardMoving, creator_of, current_creator, current_shard, is_sharded, shard_map
+
+class CreatorShardRouter:
+    """Puts each creator's rows on the shard the shard map gives them; everything else stays on the directory.
+
+    Add 'backend.sharding.router.CreatorShardRouter' to DATABASE_ROUTERS and the shard aliases to
+    DATABASES and SHARDS. A query is routed by the instance it concerns when Django passes one
+    (saves, deletes, related managers, foreign-key assignment) and otherwise by the shard pinned
+    for the request (CreatorShardMiddleware) or the process (BACKEND_SHARD). Every shard is
+    migrated in full and holds a mirror of the user table, so foreign keys to User and
+    select_related('creator') work on any of them.
+    """
+
+    def _route(self, model, hints):
+        if not is_sharded(model):
+            return DIRECTORY
+        instance = hints.get('instance')
+        if instance is not None:
+            creator_id = creator_of(instance)
+            if creator_id is not None:
+                return shard_map.shard_of(creator_id)
+            if instance._state.db is not None:
+                return instance._state.db
+        return current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        if is_sharded(model):
+            instance = hints.get('instance')
+            creator_id = (creator_of(instance) if instance is not None else None) or current_creator()
+            if creator_id is not None and shard_map.is_moving(creator_id):
+                raise ShardMoving(f'Creator {creator_id} is moving to another shard.')
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users are mirrored to every shard, and other relations never leave a creator's shard
+        return True
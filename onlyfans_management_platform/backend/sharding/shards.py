@@ -0,0 +1,218 @@
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+from ..models.models import CreatorShard
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import threading
+import time
+import zlib
+
+DIRECTORY = 'default'  # Users, sessions, content blobs and the shard map; also the shard of creators with no map entry
+# Shard n allocates primary keys from n * SHARD_ID_SPAN up, so a pk is unique across shards; the backend app's
+# keys are 64-bit (BackendConfig.default_auto_field) to hold them
+SHARD_ID_SPAN = 2 ** 40
+MAP_CHECK_INTERVAL = 1.0
+MAP_VERSION_KEY = 'sharding:map-version'
+
+# Creator-owned models in parent-before-child order, with the lookup from each row to its creator.
+# Everything else (users, profiles, blobs, derivatives, the shard map) lives on the directory.
+SHARDED_MODELS = {
+    'backend.creatorvault': 'creator_id',
+    'backend.adminaccesslog': 'creator_vault__creator_id',
+    'backend.fan': 'creator_id',
+    'backend.actionsuggestion': 'creator_id',
+    'backend.analyticsdata': 'creator_id',
+    'backend.analyticsrollup': 'creator_id',
+    'backend.analyticsrollupstate': 'creator_id',
+    'backend.automationflow': 'creator_id',
+    'backend.contentschedule': 'creator_id',
+    'backend.airecommendation': 'creator_id',
+    'backend.creatorfeatures': 'creator_id',
+    'backend.creatorrecommendation': 'creator_id',
+    'backend.uploadsession': 'creator_id',
+    'backend.uploadchunk': 'session__creator_id',
+}
+
+_pinned = ContextVar('pinned_shard', default=None)
+
+class ShardMoving(Exception):
+    """The creator's rows are being moved to another shard; writes are refused until the move finishes."""
+
+def shard_aliases():
+    """The directory followed by SHARDS. Only append to SHARDS: a shard's position fixes its primary-key range."""
+    return (DIRECTORY,) + tuple(alias for alias in getattr(settings, 'SHARDS', ()) if alias != DIRECTORY)
+
+def shard_index(alias):
+    return shard_aliases().index(alias)
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+def creator_of(instance):
+    """The creator id a model instance belongs to, or None if it can't be told without a query."""
+    if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+        return instance.pk
+    path = SHARDED_MODELS.get(instance._meta.label_lower)
+    if path is None:
+        return None
+    if path == 'creator_id':
+        return instance.creator_id
+    field = instance._meta.get_field(path.split('__')[0])
+    parent = field.get_cached_value(instance, default=None)
+    return creator_of(parent) if parent is not None else None
+
+def process_shard():
+    """Where unpinned queries on sharded models go. Background workers run once per shard with BACKEND_SHARD set."""
+    alias = os.environ.get('BACKEND_SHARD') or DIRECTORY
+    if alias not in shard_aliases():
+        raise ImproperlyConfigured(f'BACKEND_SHARD={alias!r} is not one of the configured shards.')
+    return alias
+
+@contextmanager
+def pinned(alias, creator_id=None):
+    """Send unhinted queries on sharded models to `alias` while active (and refuse writes if `creator_id` is moving)."""
+    token = _pinned.set((alias, creator_id))
+    try:
+        yield alias
+    finally:
+        _pinned.reset(token)
+
+def for_creator(creator_id):
+    return pinned(shard_map.shard_of(creator_id), creator_id)
+
+def current_shard():
+    pin = _pinned.get()
+    return pin[0] if pin is not None else process_shard()
+
+def current_creator():
+    pin = _pinned.get()
+    return pin[1] if pin is not None else None
+
+class ShardMap:
+    """Creator -> shard, read from CreatorShard on the directory and cached in each process.
+
+    Every change to the map bumps a version number in the shared cache (SHARD_MAP_CACHE_ALIAS); a
+    process drops its cached entries when it sees a new version, which it checks at most every
+    MAP_CHECK_INTERVAL seconds. Creators without a row are on the directory, which is where every
+    creator's rows were before sharding.
+    """
+
+    def __init__(self, alias=None):
+        self._alias = alias
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+        self._next_check = 0.0
+
+    @property
+    def shared(self):
+        return caches[self._alias or getattr(settings, 'SHARD_MAP_CACHE_ALIAS', 'default')]
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        version = self.shared.get(MAP_VERSION_KEY)
+        with self._lock:
+            self._next_check = now + MAP_CHECK_INTERVAL
+            if version != self._version:
+                self._entries = {}
+                self._version = version
+
+    def entry(self, creator_id):
+        """(shard, moving) for the creator."""
+        self._check_version()
+        entry = self._entries.get(creator_id)
+        if entry is None:
+            row = CreatorShard.objects.using(DIRECTORY).filter(creator_id=creator_id).values_list('shard', 'moving').first()
+            entry = row or (DIRECTORY, False)
+            if entry[0] not in shard_aliases():
+                raise ImproperlyConfigured(f'Creator {creator_id} is mapped to unknown shard {entry[0]!r}.')
+            with self._lock:
+                self._entries[creator_id] = entry
+        return entry
+
+    def shard_of(self, creator_id):
+        return self.entry(creator_id)[0]
+
+    def is_moving(self, creator_id):
+        return self.entry(creator_id)[1]
+
+    def assign(self, creator_id, shard, moving=False):
+        CreatorShard.objects.using(DIRECTORY).update_or_create(creator_id=creator_id, defaults={'shard': shard, 'moving': moving})
+        self.changed()
+
+    def changed(self):
+        """Make every process reload the map, this one immediately."""
+        try:
+            self.shared.incr(MAP_VERSION_KEY)
+        except ValueError:
+            self.shared.set(MAP_VERSION_KEY, time.time_ns(), timeout=None)
+        with self._lock:
+            self._entries = {}
+            self._next_check = 0.0
+
+shard_map = ShardMap()
+
+def shard_for_new_creator(creator_id):
+    """A stable hash of the id over SHARD_NEW_CREATORS (default: every shard); recorded once, so adding shards moves no one."""
+    candidates = tuple(getattr(settings, 'SHARD_NEW_CREATORS', None) or shard_aliases())
+    return candidates[zlib.crc32(str(creator_id).encode()) % len(candidates)]
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _pool():
+    # A pool created before a fork has no threads in the child; make one per process
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'SHARD_FAN_OUT_WORKERS', 8),
+                                           thread_name_prefix='shard-fan-out')
+            _executor_pid = os.getpid()
+    return _executor
+
+def _on_shard(function, alias):
+    try:
+        with pinned(alias):
+            return function(alias)
+    finally:
+        # Pool threads outlive the request that used them
+        close_old_connections()
+
+def fan_out(function, aliases=None):
+    """Call function(alias) for every shard in parallel and return the results in shard order.
+
+    With a single shard, or with SHARD_FAN_OUT_WORKERS set to 1, it runs on the calling thread, inside
+    whatever transactions that thread has open.
+    """
+    aliases = tuple(aliases or shard_aliases())
+    if len(aliases) == 1 or getattr(settings, 'SHARD_FAN_OUT_WORKERS', 8) <= 1:
+        results = []
+        for alias in aliases:
+            with pinned(alias):
+                results.append(function(alias))
+        return results
+    return list(_pool().map(lambda alias: _on_shard(function, alias), aliases))
+
+def get_from_any_shard(queryset, **lookups):
+    """queryset.get(**lookups) on whichever shard has the row, trying the current shard first.
+
+    Meant for primary-key lookups, which match at most one row across all shards. Raises the
+    model's DoesNotExist if no shard has it.
+    """
+    first = current_shard()
+    found = queryset.using(first).filter(**lookups).first()
+    if found is None:
+        others = [alias for alias in shard_aliases() if alias != first]
+        if others:
+            found = next(filter(None, fan_out(lambda alias: queryset.using(alias).filter(**lookups).first(), others)), None)
+    if found is None:
+        raise queryset.model.DoesNotExist(f'No {queryset.model.__name__} matching {lookups} on any shard.')
+    return found
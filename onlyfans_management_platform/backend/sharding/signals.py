@@ -0,0 +1,67 @@
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.apps import apps
+from .shards import DIRECTORY, SHARD_ID_SPAN, SHARDED_MODELS, shard_aliases, shard_for_new_creator, shard_index, shard_map
+import logging
+
+def mirror_users(users, aliases=None):
+    """Upsert copies of the users into every shard but the directory, without firing save signals."""
+    User = get_user_model()
+    fields = [field for field in User._meta.concrete_fields if not field.primary_key]
+    # Copies, because bulk_create rebinds the instances it is given to the database it wrote to
+    copies = [User(**{field.attname: getattr(user, field.attname) for field in User._meta.concrete_fields}) for user in users]
+    for alias in aliases or shard_aliases():
+        if alias != DIRECTORY and copies:
+            User.objects.using(alias).bulk_create(copies, update_conflicts=True, unique_fields=['id'],
+                                                  update_fields=[field.name for field in fields])
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, using, raw=False, **kwargs):
+    if using != DIRECTORY or raw:
+        return
+    if created:
+        shard_map.assign(instance.pk, shard_for_new_creator(instance.pk))
+    if len(shard_aliases()) > 1:
+        transaction.on_commit(lambda: mirror_users([instance]), using=DIRECTORY)
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, using, **kwargs):
+    if using != DIRECTORY:
+        return
+    # Deleting the mirror cascades to the creator's rows on that shard, with their signals
+    for alias in shard_aliases():
+        if alias != DIRECTORY:
+            sender.objects.using(alias).filter(pk=instance.pk).delete()
+
+@receiver(post_migrate)
+def reserve_id_ranges(sender, using, **kwargs):
+    """Start each shard's sequences for sharded tables at its SHARD_ID_SPAN range, so primary keys never collide."""
+    if sender.label != 'backend' or using not in shard_aliases() or shard_index(using) == 0:
+        return
+    start = shard_index(using) * SHARD_ID_SPAN
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for label in SHARDED_MODELS:
+            model = apps.get_model(label)
+            if model._meta.pk.get_internal_type() not in ('AutoField', 'BigAutoField'):
+                continue
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+                elif row[0] < start:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, model._meta.pk.column])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f'SELECT last_value FROM {sequence}')
+                if cursor.fetchone()[0] < start:
+                    cursor.execute('SELECT setval(%s, %s)', [sequence, start])
+            else:
+                logging.warning(f"Can't reserve an id range for {table} on {connection.vendor}; ids may collide across shards.")
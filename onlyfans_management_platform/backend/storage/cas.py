@@ -0,0 +1,159 @@
+
+from django.core.files.base import File
+from django.core.files.storage import Storage, default_storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+import hashlib
+import mimetypes
+import os
+import uuid
+
+BLOB_PREFIX = 'blobs'
+
+def blob_name(sha256):
+    return f'{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f'{BLOB_PREFIX}/')
+
+class DigestingFile(File):
+    """Passes another file's chunks through unchanged while computing their SHA-256 and size."""
+
+    def __init__(self, content):
+        super().__init__(None, getattr(content, 'name', None))
+        self.content = content
+        self.sha256 = hashlib.sha256()
+        self.bytes_seen = 0
+        self._pending = None
+        self._buffer = b''
+
+    def chunks(self, chunk_size=None):
+        for data in self.content.chunks(chunk_size):
+            self.sha256.update(data)
+            self.bytes_seen += len(data)
+            yield data
+
+    def read(self, size=-1):
+        if self._pending is None:
+            self._pending = self.chunks()
+        while size is None or size < 0 or len(self._buffer) < size:
+            data = next(self._pending, b'')
+            if not data:
+                break
+            self._buffer += data
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+    def close(self):
+        pass
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    """Stores every file once under the SHA-256 of its body, on top of another storage.
+
+    The name handed back to the FileField is the blob name, so identical uploads from any
+    model share one object. Reference counts live on ContentBlob and are kept by signals;
+    unreferenced blobs are removed by the collect_blobs command.
+    """
+
+    def __init__(self, storage=None):
+        self.storage = storage or default_storage
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the final name from the content, so the upload_to path never collides
+        return name
+
+    def _save(self, name, content):
+        from ..models.models import ContentBlob
+        body = DigestingFile(content)
+        incoming = self.storage.save(f'{BLOB_PREFIX}/incoming/{uuid.uuid4().hex}', body)
+        digest = body.sha256.hexdigest()
+        target = blob_name(digest)
+        now = timezone.now()
+        if ContentBlob.objects.filter(sha256=digest).update(last_used_at=now) and self.storage.exists(target):
+            self.storage.delete(incoming)
+            return target
+        self._promote(incoming, target)
+        ContentBlob.objects.update_or_create(sha256=digest, defaults={
+            'name': target,
+            'size': body.bytes_seen,
+            'content_type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            'last_used_at': now,
+        })
+        return target
+
+    def _promote(self, incoming, target):
+        if self.storage.exists(target):
+            self.storage.delete(incoming)
+            return
+        try:
+            source, destination = self.storage.path(incoming), self.storage.path(target)
+        except NotImplementedError:
+            with self.storage.open(incoming, 'rb') as body:
+                self.storage.save(target, body)
+            self.storage.delete(incoming)
+            return
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(source, destination)
+
+    def _open(self, name, mode='rb'):
+        return self.storage.open(name, mode)
+
+    def delete(self, name):
+        # Blobs are shared; only collect_blobs may remove them
+        if not is_blob_name(name):
+            self.storage.delete(name)
+
+    def exists(self, name):
+        return self.storage.exists(name)
+
+    def size(self, name):
+        return self.storage.size(name)
+
+    def url(self, name):
+        return self.storage.url(name)
+
+    def path(self, name):
+        return self.storage.path(name)
+
+    def listdir(self, path):
+        return self.storage.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.storage.get_modified_time(name)
+
+content_addressed_storage = ContentAddressedStorage()
+
+def reusable_blob(creator, sha256, size):
+    """The blob for `sha256` if this creator already references it, letting a re-upload skip its body.
+
+    Matching is limited to the creator's own rows so a bare digest never grants access to someone else's file.
+    """
+    from ..models.models import ContentBlob, ContentSchedule, CreatorVault
+    blob = ContentBlob.objects.filter(sha256=(sha256 or '').lower(), size=size).first()
+    if blob is None:
+        return None
+    owned = (CreatorVault.objects.filter(creator=creator, content_file=blob.name).exists()
+             or ContentSchedule.objects.filter(creator=creator, content=blob.name).exists())
+    if not owned:
+        return None
+    # Fails only if collect_blobs removed it since the lookup above
+    if not ContentBlob.objects.filter(pk=blob.pk).update(last_used_at=timezone.now()):
+        return None
+    return blob
+
+def blob_references():
+    """(model, field name) pairs whose values point at blobs."""
+    from ..models.models import ContentSchedule, CreatorVault
+    return [(CreatorVault, 'content_file'), (ContentSchedule, 'content')]
+
+def is_referenced(name):
+    from ..sharding.shards import fan_out
+    # Any creator's rows can point at a blob, so every shard is asked
+    return any(fan_out(lambda alias: any(model.objects.using(alias).filter(**{field: name}).exists()
+                                         for model, field in blob_references())))
@@ -0,0 +1,34 @@
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from ..models.models import ContentBlob, ContentSchedule, CreatorVault
+from .cas import is_blob_name
+
+BLOB_FIELDS = {CreatorVault: 'content_file', ContentSchedule: 'content'}
+
+def _adjust(name, delta):
+    if is_blob_name(name):
+        ContentBlob.objects.filter(name=name).update(ref_count=F('ref_count') + delta)
+
+@receiver(pre_save, sender=CreatorVault)
+@receiver(pre_save, sender=ContentSchedule)
+def remember_previous_blob(sender, instance, **kwargs):
+    field = BLOB_FIELDS[sender]
+    instance._previous_blob = None
+    if instance.pk:
+        instance._previous_blob = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+@receiver(post_save, sender=CreatorVault)
+@receiver(post_save, sender=ContentSchedule)
+def count_blob_reference(sender, instance, **kwargs):
+    current = getattr(instance, BLOB_FIELDS[sender]).name
+    previous = getattr(instance, '_previous_blob', None)
+    if current != previous:
+        _adjust(current, 1)
+        _adjust(previous, -1)
+
+@receiver(post_delete, sender=CreatorVault)
+@receiver(post_delete, sender=ContentSchedule)
+def release_blob_reference(sender, instance, **kwargs):
+    _adjust(getattr(instance, BLOB_FIELDS[sender]).name, -1)
@@ -0,0 +1,220 @@
+
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ..models.models import ContentSchedule, CreatorVault, UploadChunk, UploadSession
+from .cas import reusable_blob
+import hashlib
+import logging
+import os
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+READ_BLOCK_SIZE = 64 * 1024
+
+# Where a completed upload lands: model and the FileField that receives it
+TARGETS = {
+    UploadSession.VAULT: (CreatorVault, 'content_file'),
+    UploadSession.SCHEDULE: (ContentSchedule, 'content'),
+}
+
+class UploadError(ValueError):
+    pass
+
+class HashingReader(File):
+    """Feeds `size` bytes from a stream to storage in small blocks, hashing them on the way through."""
+
+    def __init__(self, stream, size, name=None):
+        super().__init__(stream, name)
+        self.size = size
+        self.remaining = size
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        self.sha256.update(data)
+        return data
+
+    def chunks(self, chunk_size=None):
+        while True:
+            data = self.read(chunk_size or READ_BLOCK_SIZE)
+            if not data:
+                break
+            yield data
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+class ConcatenatedParts(File):
+    """Streams stored chunk parts back-to-back as one file, hashing the whole body."""
+
+    def __init__(self, storage, part_names, size, name=None):
+        super().__init__(None, name)
+        self.storage = storage
+        self.part_names = part_names
+        self.size = size
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for part_name in self.part_names:
+            with self.storage.open(part_name, 'rb') as part:
+                while True:
+                    data = part.read(chunk_size or READ_BLOCK_SIZE)
+                    if not data:
+                        break
+                    self.sha256.update(data)
+                    yield data
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+    def close(self):
+        pass
+
+def _part_prefix(session):
+    return f'uploads/{session.pk}/'
+
+def _checked_metadata(target, metadata):
+    # The target row is only built on completion, so anything its save would reject is refused here, up front
+    metadata = dict(metadata or {})
+    if target == UploadSession.SCHEDULE:
+        try:
+            schedule_time = parse_datetime(str(metadata.get('schedule_time', '')))
+        except ValueError:
+            schedule_time = None
+        if schedule_time is None:
+            raise UploadError('schedule_time must be an ISO 8601 date and time.')
+        if timezone.is_naive(schedule_time):
+            schedule_time = timezone.make_aware(schedule_time)
+        metadata['schedule_time'] = schedule_time.isoformat()
+    return metadata
+
+def start_upload(creator, target, filename, total_size, chunk_size=None, sha256='', metadata=None):
+    if target not in TARGETS:
+        raise UploadError(f'Unknown upload target {target!r}.')
+    if total_size <= 0:
+        raise UploadError('Uploads must declare a positive total size.')
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes.')
+    metadata = _checked_metadata(target, metadata)
+    session = UploadSession.objects.create(
+        creator=creator,
+        target=target,
+        filename=os.path.basename(filename) or 'upload',
+        total_size=total_size,
+        chunk_size=chunk_size,
+        sha256=(sha256 or '').lower(),
+        metadata=metadata,
+    )
+    # A creator re-uploading a file they already have is satisfied from the stored blob, no body needed
+    blob = reusable_blob(creator, session.sha256, total_size) if session.sha256 else None
+    if blob is not None:
+        with transaction.atomic(using=session._state.db):
+            _create_target(session, blob.name)
+        logging.info(f"Upload {session.pk} from {creator.username} matched stored blob {blob.sha256}.")
+    return session
+
+def _create_target(session, name):
+    model, field_name = TARGETS[session.target]
+    instance = model(creator=session.creator, **session.metadata)
+    setattr(instance, field_name, name)
+    instance.save()
+    session.status = UploadSession.COMPLETE
+    session.result_id = instance.pk
+    session.save()
+    return instance
+
+def received_chunks(session):
+    return list(session.chunks.order_by('index').values_list('index', flat=True))
+
+def write_chunk(session, index, stream, length, sha256=None, storage=default_storage):
+    """Stream one chunk from `stream` into its own part file and record it.
+
+    Re-sending a chunk replaces the previous copy, which is what makes a dropped upload resumable.
+    """
+    if session.status != UploadSession.PENDING:
+        raise UploadError('Upload is already complete.')
+    if not 0 <= index < session.chunk_count:
+        raise UploadError(f'Chunk {index} is out of range.')
+    expected = session.expected_chunk_size(index)
+    if length != expected:
+        raise UploadError(f'Chunk {index} must be {expected} bytes, got {length}.')
+
+    reader = HashingReader(stream, length)
+    part_name = storage.save(f'{_part_prefix(session)}{index:06d}.part', reader)
+    digest = reader.sha256.hexdigest()
+    if reader.remaining or (sha256 and sha256.lower() != digest):
+        storage.delete(part_name)
+        raise UploadError(f'Chunk {index} was truncated or does not match its digest.')
+
+    with transaction.atomic(using=router.db_for_write(UploadChunk, instance=session)):
+        previous = UploadChunk.objects.select_for_update().filter(session=session, index=index).first()
+        if previous is not None:
+            previous.delete()
+            transaction.on_commit(lambda: storage.delete(previous.part_name))
+        chunk = UploadChunk.objects.create(session=session, index=index, size=length, sha256=digest, part_name=part_name)
+        UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    return chunk
+
+def complete_upload(session, storage=default_storage):
+    """Assemble the parts into the target FileField's storage and create the target row.
+
+    Nothing is created unless every chunk is present and the assembled body matches the declared digest.
+    The body is assembled and stored before the session row is locked; the lock only covers checking
+    that no chunk was re-sent meanwhile and creating the row.
+    """
+    model, field_name = TARGETS[session.target]
+    field = model._meta.get_field(field_name)
+    if session.status != UploadSession.PENDING:
+        raise UploadError('Upload is already complete.')
+    chunks = list(session.chunks.order_by('index'))
+    if [chunk.index for chunk in chunks] != list(range(session.chunk_count)):
+        raise UploadError('Upload is missing chunks.')
+    part_names = [chunk.part_name for chunk in chunks]
+
+    body = ConcatenatedParts(storage, part_names, session.total_size)
+    try:
+        name = field.storage.save(field.generate_filename(None, session.filename), body)
+    except FileNotFoundError:
+        # A chunk re-sent while this ran replaces its part file
+        raise UploadError('Upload changed while it was being completed; finish it again.')
+    digest = body.sha256.hexdigest()
+    if session.sha256 and session.sha256 != digest:
+        field.storage.delete(name)
+        raise UploadError('Uploaded file does not match its declared digest.')
+
+    with transaction.atomic(using=router.db_for_write(UploadSession, instance=session)):
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != UploadSession.PENDING:
+            raise UploadError('Upload is already complete.')
+        if list(session.chunks.order_by('index').values_list('part_name', flat=True)) != part_names:
+            raise UploadError('Upload changed while it was being completed; finish it again.')
+        session.sha256 = digest
+        instance = _create_target(session, name)
+        session.chunks.all().delete()
+        transaction.on_commit(lambda: _delete_parts(storage, part_names))
+    logging.info(f"Upload {session.pk} from {session.creator.username} completed as {model.__name__} {instance.pk}.")
+    return instance
+
+def abort_upload(session, storage=default_storage):
+    part_names = list(session.chunks.values_list('part_name', flat=True))
+    session.delete()
+    _delete_parts(storage, part_names)
+
+def purge_stale_uploads(older_than, storage=default_storage):
+    stale = UploadSession.objects.filter(status=UploadSession.PENDING, updated_at__lt=timezone.now() - older_than)
+    count = 0
+    for session in stale.iterator():
+        abort_upload(session, storage=storage)
+        count += 1
+    return count
+
+def _delete_parts(storage, part_names):
+    for part_name in part_names:
+        storage.delete(part_name)
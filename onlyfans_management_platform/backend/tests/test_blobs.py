@@ -0,0 +1,125 @@
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ..management.commands import collect_blobs
+from ..models.models import ContentBlob, ContentSchedule, CreatorVault
+from ..sharding.shards import for_creator
+from ..sharding.signals import mirror_users
+from ..storage.cas import content_addressed_storage
+from datetime import timedelta
+from unittest import mock
+import io
+import tempfile
+
+@override_settings(SHARD_FAN_OUT_WORKERS=1)
+class ContentBlobTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storage_settings = override_settings(MEDIA_ROOT=media.name)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.storage = content_addressed_storage.storage
+        self.creator = self.make_creator('uploader')
+
+    def make_creator(self, username):
+        user = User.objects.create_user(username)
+        # Users are mirrored on commit, which a TestCase never reaches
+        mirror_users([user])
+        return user
+
+    def upload(self, body, creator=None, filename='clip.bin'):
+        creator = creator or self.creator
+        with for_creator(creator.pk):
+            vault = CreatorVault(creator=creator)
+            vault.content_file.save(filename, ContentFile(body))
+        return vault
+
+    def delete(self, row):
+        with for_creator(row.creator_id):
+            row.delete()
+
+    def collect(self, grace_hours=0):
+        out = io.StringIO()
+        call_command('collect_blobs', grace_hours=grace_hours, stdout=out)
+        return out.getvalue()
+
+    def age(self, blob):
+        ContentBlob.objects.filter(pk=blob.pk).update(last_used_at=timezone.now() - timedelta(hours=1))
+
+    def test_identical_uploads_share_one_blob(self):
+        other = self.make_creator('second-uploader')
+        first = self.upload(b'same bytes', filename='a.bin')
+        second = self.upload(b'same bytes', creator=other, filename='b.bin')
+        self.assertEqual(first.content_file.name, second.content_file.name)
+        blob = ContentBlob.objects.get()
+        self.assertEqual((blob.name, blob.size, blob.ref_count), (first.content_file.name, 10, 2))
+        self.assertEqual(self.storage.listdir('blobs/incoming')[1], [])
+        with for_creator(self.creator.pk):
+            schedule = ContentSchedule.objects.create(creator=self.creator, content=blob.name, schedule_time=timezone.now())
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 3)
+        self.delete(schedule)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_blob_outlives_all_but_its_last_referrer(self):
+        first = self.upload(b'shared')
+        second = self.upload(b'shared')
+        blob = ContentBlob.objects.get()
+        self.delete(first)
+        self.age(blob)
+        self.collect()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(self.storage.exists(blob.name))
+
+        self.delete(second)
+        self.age(blob)
+        self.assertIn('Removed 1 blob(s), 6 bytes.', self.collect())
+        self.assertFalse(ContentBlob.objects.exists())
+        self.assertFalse(self.storage.exists(blob.name))
+
+    def test_recently_used_blob_is_kept(self):
+        vault = self.upload(b'fresh')
+        self.delete(vault)
+        self.assertIn('Removed 0 blob(s)', self.collect(grace_hours=1))
+        self.assertTrue(ContentBlob.objects.exists())
+
+    def test_uncounted_reference_keeps_the_blob(self):
+        vault = self.upload(b'bulk copied')
+        blob = ContentBlob.objects.get()
+        # A bulk copy sends no signals, so the count says unused while a row still points at the blob
+        with for_creator(self.creator.pk):
+            ContentSchedule.objects.bulk_create([ContentSchedule(creator=self.creator, content=blob.name,
+                                                                 schedule_time=timezone.now())])
+        self.delete(vault)
+        self.age(blob)
+        self.assertIn('Removed 0 blob(s)', self.collect())
+        self.assertTrue(self.storage.exists(blob.name))
+
+    def test_blob_referenced_again_during_collection_is_kept(self):
+        vault = self.upload(b'uploaded twice')
+        blob = ContentBlob.objects.get()
+        self.delete(vault)
+        self.age(blob)
+        real_is_referenced = collect_blobs.is_referenced
+        checked = []
+
+        def referenced_then_uploaded(name):
+            found = real_is_referenced(name)
+            checked.append(found)
+            # The same content is uploaded again after the reference check and before the delete
+            self.upload(b'uploaded twice', filename='again.bin')
+            return found
+
+        with mock.patch.object(collect_blobs, 'is_referenced', referenced_then_uploaded):
+            self.assertIn('Removed 0 blob(s)', self.collect())
+        self.assertEqual(checked, [False])
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(self.storage.exists(blob.name))
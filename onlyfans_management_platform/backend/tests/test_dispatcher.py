@@ -0,0 +1,131 @@
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from ..models.models import ContentSchedule
+from ..scheduling.dispatcher import Dispatcher, LocalPublishBackend
+from ..sharding.shards import DIRECTORY, shard_map
+from datetime import timedelta
+import threading
+
+class FlakyPublishBackend(LocalPublishBackend):
+    """Fails the first `failures` attempts, then publishes."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def publish(self, schedule):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError('publish endpoint unavailable')
+        super().publish(schedule)
+
+class DispatcherTestMixin:
+    def make_creator(self):
+        # On the shard a dispatcher without BACKEND_SHARD serves
+        creator = User.objects.create_user('scheduler')
+        shard_map.assign(creator.pk, DIRECTORY)
+        return creator
+
+    def make_dispatcher(self, backend=None, **options):
+        options.setdefault('refresh_interval', 0)
+        dispatcher = Dispatcher(backend or LocalPublishBackend(), **options)
+        self.addCleanup(dispatcher.pool.shutdown)
+        return dispatcher
+
+    def schedule(self, creator, count=1, due=timedelta(seconds=-1), **fields):
+        return [ContentSchedule.objects.create(creator=creator, content=f'scheduled_content/{i}.bin',
+                                               schedule_time=timezone.now() + due, **fields) for i in range(count)]
+
+class DispatcherTests(DispatcherTestMixin, TestCase):
+    def setUp(self):
+        self.creator = self.make_creator()
+
+    def test_two_dispatchers_publish_each_row_once(self):
+        rows = self.schedule(self.creator, count=5)
+        first, second = self.make_dispatcher(), self.make_dispatcher()
+        first.refresh()
+        second.refresh()
+        self.assertEqual(first.run_once(), 5)
+        # The second holds the same rows in its heap, but they are no longer pending
+        self.assertEqual(second.run_once(), 5)
+        self.assertEqual(sorted(pk for pk, _, _ in first.backend.published), sorted(row.pk for row in rows))
+        self.assertEqual(second.backend.published, [])
+        self.assertEqual(set(ContentSchedule.objects.values_list('status', flat=True)), {ContentSchedule.PUBLISHED})
+
+    def test_rows_not_yet_due_wait(self):
+        self.schedule(self.creator, due=timedelta(minutes=10))
+        dispatcher = self.make_dispatcher()
+        self.assertEqual(dispatcher.run_once(), 0)
+        self.assertEqual(dispatcher.backend.published, [])
+
+    def test_expired_lease_is_picked_up_again(self):
+        stale, = self.schedule(self.creator, status=ContentSchedule.PUBLISHING, attempts=1,
+                               claimed_at=timezone.now() - timedelta(minutes=10))
+        held, = self.schedule(self.creator, status=ContentSchedule.PUBLISHING, attempts=1, claimed_at=timezone.now())
+        dispatcher = self.make_dispatcher(lease=timedelta(minutes=5))
+        dispatcher.run_once()
+        self.assertEqual([pk for pk, _, _ in dispatcher.backend.published], [stale.pk])
+        stale.refresh_from_db()
+        held.refresh_from_db()
+        self.assertEqual((stale.status, stale.attempts), (ContentSchedule.PUBLISHED, 2))
+        self.assertEqual(held.status, ContentSchedule.PUBLISHING)
+
+    def test_failed_attempt_is_retried_after_the_delay(self):
+        row, = self.schedule(self.creator)
+        dispatcher = self.make_dispatcher(FlakyPublishBackend(failures=1), retry_delay=timedelta(minutes=1))
+        dispatcher.run_once()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (ContentSchedule.PENDING, 1))
+        self.assertIn('publish endpoint unavailable', row.last_error)
+        # Within the retry delay the row stays put
+        dispatcher.run_once()
+        self.assertEqual(dispatcher.backend.published, [])
+        ContentSchedule.objects.filter(pk=row.pk).update(claimed_at=timezone.now() - timedelta(minutes=2))
+        dispatcher.run_once()
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.last_error), (ContentSchedule.PUBLISHED, 2, ''))
+        self.assertEqual([pk for pk, _, _ in dispatcher.backend.published], [row.pk])
+
+    def test_row_fails_after_max_attempts(self):
+        row, = self.schedule(self.creator)
+        dispatcher = self.make_dispatcher(FlakyPublishBackend(failures=5), retry_delay=timedelta(0), max_attempts=2)
+        for _ in range(3):
+            dispatcher.run_once()
+            ContentSchedule.objects.filter(pk=row.pk).update(claimed_at=timezone.now() - timedelta(seconds=1))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (ContentSchedule.FAILED, 2))
+        self.assertEqual(dispatcher.backend.published, [])
+
+class DispatcherLockingTests(DispatcherTestMixin, TransactionTestCase):
+    # Row locks need committed rows and a second connection; users are mirrored to every shard on commit
+    databases = '__all__'
+
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_claim_skips_rows_locked_by_another_dispatcher(self):
+        creator = self.make_creator()
+        locked, free = self.schedule(creator, count=2)
+        holding, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    list(ContentSchedule.objects.select_for_update().filter(pk=locked.pk))
+                    holding.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        other = threading.Thread(target=hold_lock)
+        other.start()
+        try:
+            self.assertTrue(holding.wait(10))
+            claimed = self.make_dispatcher().claim([locked.pk, free.pk])
+        finally:
+            release.set()
+            other.join()
+        self.assertEqual([schedule.pk for schedule in claimed], [free.pk])
+        locked.refresh_from_db()
+        self.assertEqual((locked.status, locked.attempts), (ContentSchedule.PENDING, 0))
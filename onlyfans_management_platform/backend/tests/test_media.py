@@ -0,0 +1,119 @@
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from ..models.models import CreatorVault
+from ..sharding.shards import DIRECTORY, for_creator, shard_map
+from ..views.media import parse_range
+import os
+import tempfile
+
+class ParseRangeTests(SimpleTestCase):
+    def test_no_header_or_an_unknown_unit_serves_the_whole_file(self):
+        self.assertIsNone(parse_range(None, 1000))
+        self.assertIsNone(parse_range('', 1000))
+        self.assertIsNone(parse_range('items=0-9', 1000))
+        self.assertIsNone(parse_range('bytes=-', 1000))
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range('bytes=0-0', 1000), (0, 0))
+        self.assertEqual(parse_range('bytes=100-199', 1000), (100, 199))
+        self.assertEqual(parse_range('bytes = 100 - 199', 1000), (100, 199))
+
+    def test_end_past_the_file_is_clamped(self):
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+
+    def test_open_end_runs_to_the_last_byte(self):
+        self.assertEqual(parse_range('bytes=500-', 1000), (500, 999))
+
+    def test_suffix_range_is_the_last_bytes(self):
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_empty_suffix_is_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range('bytes=-0', 1000)
+
+    def test_start_at_or_past_the_end_is_unsatisfiable(self):
+        for header in ('bytes=1000-', 'bytes=1000-1200', 'bytes=5000-'):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                parse_range(header, 1000)
+        with self.assertRaises(ValueError):
+            parse_range('bytes=-10', 0)
+
+    def test_multiple_ranges_serve_the_whole_file(self):
+        self.assertIsNone(parse_range('bytes=0-99,200-299', 1000))
+
+@override_settings(SHARD_FAN_OUT_WORKERS=1)
+class VaultMediaTests(TestCase):
+    databases = '__all__'
+    body = bytes(range(256)) * 4
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storage_settings = override_settings(MEDIA_ROOT=media.name)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.creator = User.objects.create_user('media-owner')
+        shard_map.assign(self.creator.pk, DIRECTORY)
+        with for_creator(self.creator.pk):
+            self.vault = CreatorVault(creator=self.creator)
+            self.vault.content_file.save('clip.bin', ContentFile(self.body))
+        self.url = reverse('vault_media', args=[self.vault.pk])
+        self.client.force_login(self.creator)
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual((response['Accept-Ranges'], response['Content-Length']), ('bytes', str(len(self.body))))
+
+    def test_suffix_range_is_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-100')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.body[-100:])
+        self.assertEqual(response['Content-Range'], f'bytes 924-1023/{len(self.body)}')
+        self.assertEqual(response['Content-Length'], '100')
+
+    def test_open_ended_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.body[1000:])
+
+    def test_unsatisfiable_ranges_answer_416(self):
+        for header in ('bytes=-0', f'bytes={len(self.body)}-'):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{len(self.body)}')
+
+    def test_multiple_ranges_get_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9,20-29')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+
+    def test_no_transfer_header_without_acceleration(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertNotIn('X-Sendfile', response)
+
+    @override_settings(VAULT_MEDIA_ACCEL='x-accel-redirect', VAULT_MEDIA_ACCEL_PREFIX='/internal-media/')
+    def test_nginx_gets_an_internal_redirect(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/internal-media/' + self.vault.content_file.name)
+        self.assertNotIn('X-Sendfile', response)
+        # The front-end server answers the range itself
+        self.assertNotIn('Content-Range', response)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(VAULT_MEDIA_ACCEL='x-sendfile')
+    def test_sendfile_gets_the_local_path(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        path = response['X-Sendfile']
+        self.assertTrue(os.path.isabs(path))
+        with open(path, 'rb') as stored:
+            self.assertEqual(stored.read(), self.body)
+        self.assertNotIn('X-Accel-Redirect', response)
@@ -0,0 +1,10 @@
+from django.test import TestCase
+from ..diagnostics.query_budget import check_query_budgets
+
+class QueryBudgetTests(TestCase):
+    databases = '__all__'
+
+    def test_no_probe_runs_more_queries_for_more_rows(self):
+        for measurement in check_query_budgets():
+            with self.subTest(route=measurement.route, probe=measurement.label):
+                self.assertLessEqual(measurement.large, measurement.small, '\n'.join(measurement.queries))
@@ -0,0 +1,113 @@
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.test import SimpleTestCase, override_settings
+from ..security.mail import MailQueueFull, MailSender, mail_sender
+from importlib import import_module
+import re
+import threading
+
+two_factor = import_module('..security.2fa', __package__)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'two-factor-tests'}},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    TWO_FACTOR_MAX_ATTEMPTS=3,
+)
+class TwoFactorTests(SimpleTestCase):
+    def setUp(self):
+        self.user = User(pk=41, username='guarded', email='guarded@example.com')
+        two_factor._store().clear()
+
+    def send_code(self):
+        two_factor.send_verification_code(self.user)
+        mail_sender.flush()
+        return re.search(r'\d{6}', mail.outbox[-1].body).group()
+
+    def test_only_a_digest_of_the_code_is_stored(self):
+        code = self.send_code()
+        self.assertEqual(mail.outbox[-1].to, ['guarded@example.com'])
+        stored = two_factor._store().get(two_factor._code_key(self.user))
+        self.assertRegex(stored, r'^[0-9a-f]{40,}$')
+        self.assertNotIn(code, stored)
+
+    def test_resend_waits_for_the_interval(self):
+        self.send_code()
+        with self.assertRaises(two_factor.TooManyRequests):
+            two_factor.send_verification_code(self.user)
+        mail_sender.flush()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_code_works_once(self):
+        code = self.send_code()
+        self.assertTrue(two_factor.verify_code(self.user, code))
+        self.assertFalse(two_factor.verify_code(self.user, code))
+
+    def test_wrong_guesses_below_the_limit_leave_the_code_usable(self):
+        code = self.send_code()
+        wrong = f'{(int(code) + 1) % 10 ** 6:06d}'
+        self.assertFalse(two_factor.verify_code(self.user, wrong))
+        self.assertFalse(two_factor.verify_code(self.user, wrong))
+        self.assertTrue(two_factor.verify_code(self.user, f' {code} '))
+
+    def test_code_is_discarded_after_max_attempts(self):
+        code = self.send_code()
+        wrong = f'{(int(code) + 1) % 10 ** 6:06d}'
+        for _ in range(3):
+            self.assertFalse(two_factor.verify_code(self.user, wrong))
+        self.assertFalse(two_factor.verify_code(self.user, code))
+        self.assertIsNone(two_factor._store().get(two_factor._code_key(self.user)))
+
+class GatedEmailBackend(locmem.EmailBackend):
+    """The locmem backend, recording each batch; the first send waits for `gate` once `entered` is set."""
+
+    batches = []
+    entered = threading.Event()
+    gate = threading.Event()
+
+    def send_messages(self, messages):
+        type(self).batches.append(len(messages))
+        type(self).entered.set()
+        type(self).gate.wait(10)
+        return super().send_messages(messages)
+
+@override_settings(EMAIL_BACKEND=f'{__name__}.GatedEmailBackend')
+class MailSenderTests(SimpleTestCase):
+    def setUp(self):
+        GatedEmailBackend.batches = []
+        GatedEmailBackend.entered = threading.Event()
+        GatedEmailBackend.gate = threading.Event()
+
+    def make_sender(self, **options):
+        sender = MailSender(**options)
+        self.addCleanup(sender.stop)
+        # Never leave the writer waiting at the gate
+        self.addCleanup(GatedEmailBackend.gate.set)
+        return sender
+
+    def message(self, number):
+        return EmailMessage(f'Message {number}', 'body', 'from@example.com', [f'fan-{number}@example.com'])
+
+    def test_queued_messages_go_out_in_batches_over_one_connection(self):
+        sender = self.make_sender(batch_size=3)
+        sender.send(self.message(0))
+        self.assertTrue(GatedEmailBackend.entered.wait(10))
+        for number in range(1, 8):
+            sender.send(self.message(number))
+        GatedEmailBackend.gate.set()
+        sender.flush()
+        self.assertEqual(GatedEmailBackend.batches, [1, 3, 3, 1])
+        self.assertEqual((sender.sent, sender.failed, sender.connections_opened), (8, 0, 1))
+        self.assertEqual(sorted(message.subject for message in mail.outbox), [f'Message {number}' for number in range(8)])
+
+    def test_full_queue_raises(self):
+        sender = self.make_sender(queue_size=1, enqueue_timeout=0.01)
+        sender.send(self.message(0))
+        self.assertTrue(GatedEmailBackend.entered.wait(10))
+        sender.send(self.message(1))
+        with self.assertRaises(MailQueueFull):
+            sender.send(self.message(2))
+        GatedEmailBackend.gate.set()
+        sender.flush()
+        self.assertEqual(sender.sent, 2)
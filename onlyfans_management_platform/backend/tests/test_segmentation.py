@@ -0,0 +1,35 @@
+
+from django.test import SimpleTestCase
+from ..fans.segmentation import AT_RISK, CHAMPION, HIBERNATING, LOYAL, NEW, REGULAR, assign_segments, quintile_scores
+from collections import Counter
+import numpy as np
+
+class QuintileScoreTests(SimpleTestCase):
+    def test_distinct_values_fill_every_fifth(self):
+        self.assertEqual(quintile_scores(np.arange(10.0)).tolist(), [1, 1, 2, 2, 3, 3, 4, 4, 5, 5])
+
+    def test_heavy_ties_share_a_middle_score(self):
+        values = np.array([5.0] * 70 + list(range(10, 40)))
+        scores = quintile_scores(values)
+        self.assertEqual(set(scores[:70].tolist()), {2})
+        self.assertEqual(scores[70:].min(), 4)
+
+    def test_zero_spend_scores_lowest(self):
+        spend = np.array([0.0] * 70 + list(range(1, 31)))
+        scores = quintile_scores(spend, zero_is_lowest=True)
+        self.assertEqual(set(scores[:70].tolist()), {1})
+        self.assertEqual(sorted(Counter(scores[70:].tolist()).items()), [(1, 6), (2, 6), (3, 6), (4, 6), (5, 6)])
+
+    def test_missing_values_score_lowest(self):
+        self.assertEqual(quintile_scores(np.array([np.nan, 0.0, 3.0]), zero_is_lowest=True).tolist(), [1, 1, 3])
+
+    def test_all_zero_columns_mark_no_one_as_engaged(self):
+        recency = quintile_scores(np.arange(100.0))
+        zeros = quintile_scores(np.zeros(100), zero_is_lowest=True)
+        self.assertEqual(set(zeros.tolist()), {1})
+        segments = Counter(assign_segments(recency, zeros, zeros).tolist())
+        self.assertEqual(segments, {NEW: 40, REGULAR: 20, HIBERNATING: 40})
+        self.assertFalse({CHAMPION, LOYAL, AT_RISK} & set(segments))
+
+    def test_empty(self):
+        self.assertEqual(len(quintile_scores(np.empty(0))), 0)
@@ -0,0 +1,116 @@
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..models.models import ContentSchedule, CreatorVault, Fan
+from ..sharding.rebalance import move_creator
+from ..sharding.shards import ShardMoving, for_creator, pinned, shard_map
+from ..sharding.signals import mirror_users, reserve_id_ranges
+from datetime import timedelta
+import io
+import tempfile
+
+# Fan-out runs on the test thread, which alone sees the test transactions
+@override_settings(
+    SHARDS=['default', 's1'],
+    DATABASE_ROUTERS=['backend.sharding.router.CreatorShardRouter'],
+    SHARD_FAN_OUT_WORKERS=1,
+    SHARD_MOVE_GRACE=0,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sharding-tests'}},
+    TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', {'vault.html': ''})]},
+    }],
+)
+class ShardingTests(TestCase):
+    databases = {'default', 's1'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Keys on s1 start above the directory's, as after migrating with these SHARDS
+        reserve_id_ranges(sender=apps.get_app_config('backend'), using='s1')
+
+    def setUp(self):
+        shard_map.changed()
+
+    def creator(self, username, shard):
+        user = User.objects.create_user(username)
+        shard_map.assign(user.pk, shard)
+        # Users are mirrored on commit, which a TestCase never reaches
+        mirror_users([user])
+        return user
+
+    def test_rows_land_on_the_mapped_shard(self):
+        creator = self.creator('on-s1', 's1')
+        Fan(creator=creator, fan_name='routed by instance', fan_data={}).save()
+        with for_creator(creator.pk):
+            CreatorVault.objects.create(creator=creator, content_file='vault/a.bin')
+            Fan.objects.bulk_create([Fan(creator=creator, fan_name='routed by pin', fan_data={})])
+        self.assertEqual(Fan.objects.using('s1').filter(creator=creator).count(), 2)
+        self.assertEqual(CreatorVault.objects.using('s1').filter(creator=creator).count(), 1)
+        self.assertFalse(Fan.objects.using('default').filter(creator=creator).exists())
+        self.assertFalse(CreatorVault.objects.using('default').filter(creator=creator).exists())
+
+    def test_import_fans_writes_to_the_creators_shard(self):
+        creator = self.creator('importer', 's1')
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write('{"fan_name": "a"}\n{"fan_name": "b", "fan_data": {"total_spend": 3}}\n')
+            source.flush()
+            call_command('import_fans', 'importer', source.name, stdout=io.StringIO())
+        self.assertEqual(sorted(Fan.objects.using('s1').filter(creator=creator).values_list('fan_name', flat=True)),
+                         ['a', 'b'])
+        self.assertFalse(Fan.objects.using('default').filter(creator=creator).exists())
+
+    def test_superuser_vault_listing_merges_every_shard(self):
+        here, there = self.creator('on-default', 'default'), self.creator('on-s1', 's1')
+        admin = User.objects.create_superuser('admin')
+        mirror_users([admin])
+        vaults = []
+        for owner in (there, here, there):
+            with for_creator(owner.pk):
+                vaults.append(CreatorVault.objects.create(creator=owner, content_file=f'vault/{len(vaults)}.bin'))
+        self.client.force_login(admin)
+        response = self.client.get(reverse('vault'))
+        self.assertEqual(response.status_code, 200)
+        listed = response.context['vaults']
+        self.assertEqual([vault.pk for vault in listed], sorted(vault.pk for vault in vaults))
+        self.assertEqual({vault.creator.username for vault in listed}, {'on-default', 'on-s1'})
+
+    def test_move_copies_writes_made_while_catching_up(self):
+        creator = self.creator('mover', 'default')
+        with for_creator(creator.pk):
+            fans = [Fan.objects.create(creator=creator, fan_name=f'fan-{i}', fan_data={}) for i in range(3)]
+            vault = CreatorVault.objects.create(creator=creator, content_file='vault/kept.bin')
+            doomed = CreatorVault.objects.create(creator=creator, content_file='vault/deleted.bin')
+            schedule = ContentSchedule.objects.create(creator=creator, content='vault/kept.bin', schedule_time=vault.updated_at)
+        refused = []
+
+        def log(message):
+            with pinned('default', creator.pk):
+                if message.endswith('before freezing writes.'):
+                    # Writes between catch-up passes, while the source is still authoritative
+                    Fan.objects.create(creator=creator, fan_name='added', fan_data={})
+                    fans[0].segment = 'changed'
+                    fans[0].save()
+                    doomed.delete()
+                    schedule.schedule_time += timedelta(days=1)
+                    schedule.save()
+                elif message.startswith('Caught up') and not refused:
+                    # The final catch-up runs with the creator frozen
+                    with self.assertRaises(ShardMoving):
+                        Fan.objects.create(creator=creator, fan_name='refused', fan_data={})
+                    refused.append(message)
+
+        move_creator(creator.pk, 's1', grace=0, log=log)
+        self.assertTrue(refused)
+        self.assertEqual(shard_map.entry(creator.pk), ('s1', False))
+        moved = Fan.objects.using('s1').filter(creator=creator)
+        self.assertEqual(sorted(moved.values_list('fan_name', flat=True)), ['added', 'fan-0', 'fan-1', 'fan-2'])
+        self.assertEqual(moved.get(pk=fans[0].pk).segment, 'changed')
+        self.assertEqual(list(CreatorVault.objects.using('s1').filter(creator=creator).values_list('pk', flat=True)),
+                         [vault.pk])
+        self.assertEqual(ContentSchedule.objects.using('s1').get(pk=schedule.pk).schedule_time, schedule.schedule_time)
+        for model in (Fan, CreatorVault, ContentSchedule):
+            self.assertFalse(model.objects.using('default').filter(creator=creator).exists())
@@ -0,0 +1,9 @@
+from django.test import SimpleTestCase
+from ..diagnostics.startup import assert_startup_budget
+
+class StartupBudgetTests(SimpleTestCase):
+    def test_boot_stays_within_budget_without_heavy_modules(self):
+        startup = assert_startup_budget()
+        modules = {entry.module for entry in startup.imports}
+        self.assertNotIn('numpy', modules)
+        self.assertEqual([module for module in modules if module.startswith('backend.recommendations')], [])
@@ -0,0 +1,154 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..models.models import ContentBlob, ContentSchedule, CreatorVault, UploadChunk, UploadSession
+from ..sharding.shards import for_creator
+from ..sharding.signals import mirror_users
+import hashlib
+import tempfile
+
+@override_settings(SHARD_FAN_OUT_WORKERS=1)
+class ChunkedUploadTests(TestCase):
+    databases = '__all__'
+    body = b'0123456789'
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        storage_settings = override_settings(MEDIA_ROOT=media.name)
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.creator = User.objects.create_user('uploader')
+        # Users are mirrored on commit, which a TestCase never reaches
+        mirror_users([self.creator])
+        self.client.force_login(self.creator)
+
+    def start(self, **fields):
+        data = {'target': 'vault', 'filename': 'clip.bin', 'total_size': len(self.body), 'chunk_size': 4, **fields}
+        return self.client.post(reverse('start_chunked_upload'), data)
+
+    def started(self, **fields):
+        response = self.start(**fields)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['upload_id']
+
+    def put(self, upload_id, index, data=None, **headers):
+        data = self.body[index * 4:index * 4 + 4] if data is None else data
+        return self.client.generic('PUT', reverse('upload_chunk', args=[upload_id, index]), data,
+                                   content_type='application/octet-stream', headers=headers)
+
+    def status(self, upload_id):
+        return self.client.get(reverse('chunked_upload_status', args=[upload_id])).json()
+
+    def finish(self, upload_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('finish_chunked_upload', args=[upload_id]))
+
+    def stored_vault(self, pk):
+        with for_creator(self.creator.pk):
+            vault = CreatorVault.objects.get(pk=pk)
+        with vault.content_file.open('rb') as stored:
+            return vault, stored.read()
+
+    def test_start_describes_the_chunks(self):
+        state = self.start().json()
+        self.assertEqual((state['status'], state['chunk_size'], state['chunk_count'], state['received']),
+                         (UploadSession.PENDING, 4, 3, []))
+
+    def test_start_rejects_bad_requests(self):
+        for fields in ({'target': 'elsewhere'}, {'total_size': 0}, {'chunk_size': 'big'},
+                       {'target': 'schedule'}, {'target': 'schedule', 'schedule_time': 'tomorrow'}):
+            with self.subTest(**fields):
+                self.assertEqual(self.start(**fields).status_code, 400)
+
+    def test_upload_resumes_from_the_chunks_received(self):
+        upload_id = self.started()
+        self.assertEqual(self.put(upload_id, 0).status_code, 200)
+        # The connection drops; the client asks what arrived and sends the rest
+        self.assertEqual(self.status(upload_id)['received'], [0])
+        self.assertEqual(self.finish(upload_id).status_code, 409)
+        self.put(upload_id, 1)
+        self.put(upload_id, 2)
+        self.assertEqual(self.status(upload_id)['received'], [0, 1, 2])
+        response = self.finish(upload_id)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.stored_vault(response.json()['id'])[1], self.body)
+
+    def test_resent_chunk_replaces_the_earlier_copy(self):
+        upload_id = self.started()
+        self.put(upload_id, 1, b'XXXX')
+        self.put(upload_id, 1)
+        self.put(upload_id, 0)
+        self.put(upload_id, 2)
+        with for_creator(self.creator.pk):
+            self.assertEqual(UploadChunk.objects.filter(session_id=upload_id).count(), 3)
+        response = self.finish(upload_id)
+        self.assertEqual(self.stored_vault(response.json()['id'])[1], self.body)
+
+    def test_chunks_sent_out_of_order_assemble_in_order(self):
+        upload_id = self.started(sha256=hashlib.sha256(self.body).hexdigest())
+        for index in (2, 0, 1):
+            self.assertEqual(self.put(upload_id, index).status_code, 200)
+        response = self.finish(upload_id)
+        self.assertEqual(response.status_code, 201, response.content)
+        vault, stored = self.stored_vault(response.json()['id'])
+        self.assertEqual(stored, self.body)
+        blob = ContentBlob.objects.get(name=vault.content_file.name)
+        self.assertEqual((blob.sha256, blob.size, blob.ref_count), (hashlib.sha256(self.body).hexdigest(), 10, 1))
+
+    def test_chunk_of_the_wrong_size_is_refused(self):
+        upload_id = self.started()
+        response = self.put(upload_id, 0, b'012')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('must be 4 bytes, got 3', response.json()['error'])
+        # The last chunk is the remainder
+        self.assertEqual(self.put(upload_id, 2, b'89XX').status_code, 400)
+        self.assertEqual(self.put(upload_id, 2).status_code, 200)
+        self.assertEqual(self.put(upload_id, 3, b'').status_code, 400)
+        self.assertEqual(self.status(upload_id)['received'], [2])
+
+    def test_chunk_not_matching_its_digest_is_refused(self):
+        upload_id = self.started()
+        response = self.put(upload_id, 0, X_Chunk_SHA256=hashlib.sha256(b'other').hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.status(upload_id)['received'], [])
+        self.assertEqual(default_storage.listdir(f'uploads/{upload_id}')[1], [])
+
+    def test_body_not_matching_the_declared_digest_creates_nothing(self):
+        upload_id = self.started(sha256=hashlib.sha256(b'something else').hexdigest())
+        for index in range(3):
+            self.put(upload_id, index)
+        response = self.finish(upload_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], UploadSession.PENDING)
+        with for_creator(self.creator.pk):
+            self.assertFalse(CreatorVault.objects.filter(creator=self.creator).exists())
+
+    def test_finish_creates_the_target_once_and_removes_the_parts(self):
+        upload_id = self.started(target='schedule', schedule_time='2030-01-02T03:04:05+00:00')
+        for index in range(3):
+            self.put(upload_id, index)
+        response = self.finish(upload_id)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['target'], 'schedule')
+        with for_creator(self.creator.pk):
+            schedule = ContentSchedule.objects.get(pk=response.json()['id'])
+            self.assertFalse(UploadChunk.objects.filter(session_id=upload_id).exists())
+        self.assertEqual(schedule.schedule_time.isoformat(), '2030-01-02T03:04:05+00:00')
+        self.assertEqual(default_storage.listdir(f'uploads/{upload_id}')[1], [])
+        state = self.status(upload_id)
+        self.assertEqual((state['status'], state['id']), (UploadSession.COMPLETE, schedule.pk))
+
+        again = self.finish(upload_id)
+        self.assertEqual(again.status_code, 409)
+        self.assertIn('already complete', again.json()['error'])
+        self.assertEqual(self.put(upload_id, 0).status_code, 400)
+
+    def test_other_creators_cannot_touch_the_upload(self):
+        upload_id = self.started()
+        intruder = User.objects.create_user('intruder')
+        mirror_users([intruder])
+        self.client.force_login(intruder)
+        self.assertEqual(self.client.get(reverse('chunked_upload_status', args=[upload_id])).status_code, 404)
+        self.assertEqual(self.put(upload_id, 0).status_code, 404)
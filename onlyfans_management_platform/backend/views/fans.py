@@ -0,0 +1,33 @@
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
+from ..fans.bulk import CSV, FORMATS, JSONL, export_fans, import_fans, read_records
+import codecs
+import logging
+
+CONTENT_TYPES = {CSV: 'text/csv', JSONL: 'application/x-ndjson'}
+
+@login_required
+@require_POST
+def fan_import(request):
+    # The body is the raw CSV/JSONL document, decoded and parsed as it streams in
+    fmt = request.GET.get('format', JSONL if 'json' in request.content_type else CSV)
+    if fmt not in FORMATS:
+        return JsonResponse({'error': f'format must be one of {", ".join(FORMATS)}.'}, status=400)
+    lines = codecs.getreader(request.encoding or 'utf-8')(request)
+    progress = lambda result: logging.info(f"Fan import for {request.user.username}: {result.processed} rows read.")
+    result = import_fans(request.user, read_records(lines, fmt), progress=progress)
+    logging.info(f"User {request.user.username} imported {result.written} fans ({result.rejected} rejected).")
+    return JsonResponse(result.as_dict())
+
+@login_required
+@require_GET
+def fan_export(request):
+    fmt = request.GET.get('format', CSV)
+    if fmt not in FORMATS:
+        return JsonResponse({'error': f'format must be one of {", ".join(FORMATS)}.'}, status=400)
+    logging.info(f"User {request.user.username} exported their fans as {fmt}.")
+    response = StreamingHttpResponse(export_fans(request.user, fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="fans.{fmt}"'
+    return response
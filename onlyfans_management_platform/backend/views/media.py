@@ -0,0 +1,109 @@
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+from ..models.models import ContentBlob, CreatorVault
+from ..sharding.shards import get_from_any_shard
+import logging
+import mimetypes
+import re
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 256 * 1024
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single-range header, None to serve the whole file,
+    or ValueError when the range cannot be satisfied. Multi-range requests get the whole file.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+def _read_range(fileobj, start, length):
+    try:
+        fileobj.seek(start)
+        while length > 0:
+            data = fileobj.read(min(BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fileobj.close()
+
+def _accelerated_response(name, storage):
+    """Hand the transfer to the front-end server when VAULT_MEDIA_ACCEL is configured.
+
+    'x-accel-redirect' (nginx) needs an internal location for VAULT_MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT;
+    'x-sendfile' (Apache mod_xsendfile, lighttpd) needs a local filesystem storage.
+    """
+    mode = getattr(settings, 'VAULT_MEDIA_ACCEL', None)
+    if mode == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = getattr(settings, 'VAULT_MEDIA_ACCEL_PREFIX', '/protected-media/') + name
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = storage.path(name)
+        return response
+    return None
+
+@require_http_methods(['GET', 'HEAD'])
+def vault_media(request, vault_id):
+    # Public vaults and superusers reach across creators, so the vault may be on any shard
+    try:
+        vault = get_from_any_shard(CreatorVault.objects.all(), pk=vault_id)
+    except CreatorVault.DoesNotExist:
+        raise Http404('No CreatorVault matches the given query.')
+    user = request.user
+    if not vault.is_public:
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not (user.is_superuser or vault.creator_id == user.pk):
+            logging.warning(f"Unauthorized media request by {user.username} for vault {vault_id}.")
+            return HttpResponseForbidden()
+
+    name = vault.content_file.name
+    storage = vault.content_file.storage
+    blob = ContentBlob.objects.filter(name=name).only('sha256', 'size', 'content_type').first()
+    content_type = blob.content_type if blob else mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    etag = f'"{blob.sha256}"' if blob else None
+    if etag and etag in request.headers.get('If-None-Match', ''):
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    response = _accelerated_response(name, storage)
+    if response is None:
+        size = blob.size if blob else storage.size(name)
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            return HttpResponse(status=416, headers={'Content-Range': f'bytes */{size}'})
+        if byte_range is None:
+            # The whole file goes through FileResponse so the WSGI server can use sendfile()
+            response = FileResponse(storage.open(name, 'rb'))
+            response['Content-Length'] = size
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(storage.open(name, 'rb'), start, end - start + 1), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = 'inline'
+    response['Cache-Control'] = 'public, max-age=86400' if vault.is_public else 'private, max-age=3600'
+    if etag:
+        response['ETag'] = etag
+    return response
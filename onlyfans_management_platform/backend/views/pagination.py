@@ -0,0 +1,52 @@
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(timestamp, pk):
+    payload = json.dumps([timestamp.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        timestamp = parse_datetime(timestamp)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if timestamp is None or not isinstance(pk, int):
+        raise InvalidCursor(cursor)
+    return timestamp, pk
+
+def page_size_from(request):
+    try:
+        size = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def keyset_page(queryset, field, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Return (rows, next_cursor) for a newest-first walk over `field`, tie-broken on id.
+
+    The queryset may be a values() projection; rows must expose `field` and `id`.
+    """
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+    rows = list(queryset.order_by(f'-{field}', '-id')[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[field], last['id'])
+        else:
+            next_cursor = encode_cursor(getattr(last, field), last.id)
+    return rows, next_cursor
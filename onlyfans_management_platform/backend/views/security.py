@@ -0,0 +1,37 @@
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from importlib import import_module
+import logging
+
+two_factor = import_module('..security.2fa', __package__)
+mail = import_module('..security.mail', __package__)
+
+TWO_FACTOR_SESSION_KEY = 'two_factor_verified'
+
+@login_required
+@require_POST
+async def send_two_factor_code(request):
+    # Issuing a code is a cache write and an enqueue; the mail goes out from the background sender
+    user = await request.auser()
+    if not user.email:
+        return JsonResponse({'error': 'No email address on file.'}, status=400)
+    try:
+        await sync_to_async(two_factor.send_verification_code)(user)
+    except two_factor.TooManyRequests as error:
+        return JsonResponse({'error': str(error)}, status=429)
+    except mail.MailQueueFull as error:
+        return JsonResponse({'error': str(error)}, status=503)
+    logging.info(f"User {user.username} requested a verification code.")
+    return JsonResponse({'sent': True})
+
+@login_required
+@require_POST
+async def verify_two_factor_code(request):
+    user = await request.auser()
+    if not await sync_to_async(two_factor.verify_code)(user, request.POST.get('code', '')):
+        return JsonResponse({'verified': False}, status=400)
+    await request.session.aset(TWO_FACTOR_SESSION_KEY, True)
+    return JsonResponse({'verified': True})
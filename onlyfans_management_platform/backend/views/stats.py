@@ -0,0 +1,28 @@
+
+from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from ..caching.creator_cache import creator_cache
+from ..profiling.metrics import endpoint_metrics
+
+@login_required
+@require_GET
+def cache_stats(request):
+    """Dashboard cache hit/miss counts, to check that page loads stopped reaching the database."""
+    if not request.user.is_superuser:
+        return HttpResponseForbidden()
+    return JsonResponse({'views': creator_cache.stats(), 'local_entries': len(creator_cache.local)})
+
+@require_GET
+def profiling_metrics(request):
+    """Per-endpoint request histograms for Prometheus.
+
+    Scrapers send `Authorization: Bearer <PROFILING_METRICS_TOKEN>`; logged-in superusers need no token.
+    """
+    token = getattr(settings, 'PROFILING_METRICS_TOKEN', '')
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (token and constant_time_compare(bearer, token)) and not request.user.is_superuser:
+        return HttpResponseForbidden()
+    return HttpResponse(endpoint_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,77 @@
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods, require_POST
+from ..models.models import UploadSession
+from ..storage.uploads import UploadError, complete_upload, received_chunks, start_upload, write_chunk
+import logging
+
+def _session_state(session):
+    return {
+        'upload_id': str(session.pk),
+        'status': session.status,
+        'id': session.result_id,
+        'chunk_size': session.chunk_size,
+        'chunk_count': session.chunk_count,
+        'received': received_chunks(session),
+    }
+
+@login_required
+@require_POST
+def start_chunked_upload(request):
+    target = request.POST.get('target')
+    metadata = {}
+    if target == UploadSession.VAULT:
+        metadata['is_public'] = request.POST.get('is_public') in ('1', 'true', 'on')
+    elif target == UploadSession.SCHEDULE:
+        if not request.POST.get('schedule_time'):
+            return JsonResponse({'error': 'schedule_time is required.'}, status=400)
+        # start_upload checks it parses, so completing the upload can't fail on it
+        metadata['schedule_time'] = request.POST['schedule_time']
+    try:
+        session = start_upload(
+            request.user,
+            target,
+            request.POST.get('filename', ''),
+            int(request.POST.get('total_size', 0)),
+            chunk_size=int(request.POST.get('chunk_size') or 0),
+            sha256=request.POST.get('sha256', ''),
+            metadata=metadata,
+        )
+    except (UploadError, ValueError) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    logging.info(f"User {request.user.username} started upload {session.pk} of {session.filename} ({session.total_size} bytes).")
+    return JsonResponse(_session_state(session), status=201)
+
+@login_required
+@require_http_methods(['GET'])
+def chunked_upload_status(request, upload_id):
+    session = get_object_or_404(UploadSession, pk=upload_id, creator=request.user)
+    return JsonResponse(_session_state(session))
+
+@login_required
+@require_http_methods(['PUT'])
+def upload_chunk(request, upload_id, index):
+    # The body is the raw chunk; request.POST/FILES are never touched so nothing is buffered
+    session = get_object_or_404(UploadSession, pk=upload_id, creator=request.user)
+    try:
+        length = int(request.headers.get('Content-Length', ''))
+        chunk = write_chunk(session, index, request, length, sha256=request.headers.get('X-Chunk-SHA256'))
+    except (UploadError, ValueError) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse({'index': chunk.index, 'size': chunk.size, 'sha256': chunk.sha256})
+
+@login_required
+@require_POST
+def finish_chunked_upload(request, upload_id):
+    session = get_object_or_404(UploadSession, pk=upload_id, creator=request.user)
+    try:
+        instance = complete_upload(session)
+    except UploadError as error:
+        return JsonResponse({'error': str(error), **_session_state(session)}, status=409)
+    except ValidationError as error:
+        # Metadata of sessions started before start_upload checked it
+        return JsonResponse({'error': ' '.join(error.messages), **_session_state(session)}, status=400)
+    return JsonResponse({'upload_id': str(session.pk), 'target': session.target, 'id': instance.pk}, status=201)
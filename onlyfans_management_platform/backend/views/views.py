@@ -4,40 +4,61 @@ from django.views import View
 from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponseBadRequest
+from asgiref.sync import sync_to_async
 from ..models.models import (
     CreatorVault,
     AdminAccessLog,
     Fan,
     ActionSuggestion,
-    AnalyticsData,
     AutomationFlow,
     ContentSchedule,
     UserProfile,
-    AIRecommendation
+    AIRecommendation,
+    PROMOTED_FAN_FIELDS
 )
+from ..audit.pipeline import audit_pipeline
+from ..analytics.rollups import dashboard_rollups, refresh_rollups
+from ..caching.creator_cache import ALL_CREATORS, ANALYTICS, FANS, VAULT, creator_cache
+from ..media.derivatives import derivatives_for
+from ..services.advice import project_outcome, recommend
+from ..sharding.shards import fan_out, get_from_any_shard
+from .pagination import InvalidCursor, keyset_page, page_size_from
 from datetime import datetime
-import random
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, filename='logs/backend/actions.log',
-                    format='%(asctime)s %(levelname)s:%(message)s')
-
 @method_decorator(login_required, name='dispatch')
 class VaultView(View):
     def get(self, request):
-        if request.user.is_superuser:
-            vaults = CreatorVault.objects.all()
-        else:
-            vaults = CreatorVault.objects.filter(creator=request.user)
+        owner = ALL_CREATORS if request.user.is_superuser else request.user.pk
+        vaults = creator_cache.get_or_compute(owner, VAULT, 'vault', (), lambda: self.load_vaults(request.user))
         logging.info(f"User {request.user.username} accessed their vaults.")
         return render(request, 'vault.html', {'vaults': vaults})
 
+    @staticmethod
+    def load_vaults(user):
+        # The listing shows each vault's owner, so join it instead of loading it per row
+        vaults = CreatorVault.objects.select_related('creator')
+        if user.is_superuser:
+            # Every shard is read at once; primary keys are unique across shards, so pk order is the unsharded order
+            vaults = sorted((vault for shard in fan_out(lambda alias: list(vaults.using(alias))) for vault in shard),
+                            key=lambda vault: vault.pk)
+        else:
+            vaults = list(vaults.filter(creator=user))
+        # Listings render from the small derivatives; vaults without one yet fall back to a placeholder
+        derivatives = derivatives_for(vault.content_file.name for vault in vaults)
+        for vault in vaults:
+            vault.derivative = derivatives.get(vault.content_file.name)
+        return vaults
+
 @login_required
 def admin_access_vault(request, vault_id):
     if request.user.is_superuser:
-        creator_vault = get_object_or_404(CreatorVault, pk=vault_id)
-        AdminAccessLog.objects.create(admin_user=request.user, creator_vault=creator_vault)
+        try:
+            creator_vault = get_from_any_shard(CreatorVault.objects.select_related('creator'), pk=vault_id)
+        except CreatorVault.DoesNotExist:
+            raise Http404('No CreatorVault matches the given query.')
+        audit_pipeline.record(AdminAccessLog(admin_user=request.user, creator_vault=creator_vault))
         logging.info(f"Admin {request.user.username} accessed the vault of user {creator_vault.creator.username}.")
         messages.success(request, 'Successfully accessed the creator vault.')
         return render(request, 'admin_view_vault.html', {'creator_vault': creator_vault})
@@ -45,33 +66,85 @@ def admin_access_vault(request, vault_id):
     messages.error(request, 'You do not have permission to access this vault.')
     return redirect('vault')
 
+# Columns shown in the fan list; fan_data is only loaded on the detail page
+FAN_LIST_FIELDS = ('id', 'fan_name', 'segment', 'last_interaction', *PROMOTED_FAN_FIELDS)
+
+def promoted_filters(params):
+    """`<key>_min` / `<key>_max` / `<key>` query parameters for promoted fan_data keys as Fan.objects.where() arguments."""
+    conditions = {}
+    for name, parse in PROMOTED_FAN_FIELDS.items():
+        for suffix, lookup in (('', 'exact'), ('_min', 'gte'), ('_max', 'lte')):
+            raw = params.get(name + suffix)
+            if raw in (None, ''):
+                continue
+            value = parse(raw)
+            if value is None:
+                raise ValueError(f'{name + suffix} is not a valid value.')
+            conditions[f'{name}__{lookup}'] = value
+    return conditions
+
 @login_required
 def fan_management_dashboard(request):
-    fans = Fan.objects.filter(creator=request.user)
+    segment = request.GET.get('segment')
+    try:
+        conditions = promoted_filters(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    fans = Fan.objects.filter(creator=request.user).where(**conditions)
+    if segment:
+        fans = fans.filter(segment=segment)
+    cursor, page_size = request.GET.get('cursor'), page_size_from(request)
+    try:
+        page, next_cursor = creator_cache.get_or_compute(
+            request.user.pk, FANS, 'fan_management', (segment, sorted(conditions.items()), cursor, page_size),
+            lambda: keyset_page(fans.values(*FAN_LIST_FIELDS), 'last_interaction', cursor=cursor, page_size=page_size))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
     logging.info(f"User {request.user.username} accessed the fan management dashboard.")
-    return render(request, 'fan_management_dashboard.html', {'fans': fans})
+    return render(request, 'fan_management_dashboard.html', {
+        'fans': page,
+        'segment': segment,
+        'next_cursor': next_cursor,
+    })
 
 @login_required
-def action_suggestions(request):
+def fan_detail(request, fan_id):
+    fan = get_object_or_404(Fan, pk=fan_id, creator=request.user)
+    logging.info(f"User {request.user.username} opened fan {fan_id}.")
+    return render(request, 'fan_detail.html', {'fan': fan})
+
+# Async: the outcome may come from an outbound service, which shouldn't hold a worker thread while it answers
+@login_required
+async def action_suggestions(request):
     if request.method == 'POST':
+        user = await request.auser()
         action_description = request.POST.get('action_description')
-        projected_outcome = f"If you {action_description}, you'll likely see a 15% boost in engagement!"
-        ActionSuggestion.objects.create(
-            creator=request.user,
+        projected_outcome = await project_outcome(user, action_description)
+        await ActionSuggestion.objects.acreate(
+            creator=user,
             action_description=action_description,
             projected_outcome=projected_outcome,
             timestamp=datetime.now()
         )
-        logging.info(f"User {request.user.username} submitted an action suggestion: {action_description}.")
+        logging.info(f"User {user.username} submitted an action suggestion: {action_description}.")
         messages.success(request, f"Action suggestion recorded: {action_description}.")
-        return render(request, 'action_suggestion_result.html', {'action_description': action_description, 'projected_outcome': projected_outcome})
-    return render(request, 'action_suggestions.html')
+        return await sync_to_async(render)(request, 'action_suggestion_result.html', {'action_description': action_description, 'projected_outcome': projected_outcome})
+    return await sync_to_async(render)(request, 'action_suggestions.html')
+
+def load_analytics(creator):
+    refresh_rollups(creator)
+    return dashboard_rollups(creator)
 
 @login_required
 def analytics_data(request):
-    analytics = AnalyticsData.objects.filter(creator=request.user)
+    series, totals = creator_cache.get_or_compute(request.user.pk, ANALYTICS, 'analytics', (), lambda: load_analytics(request.user))
     logging.info(f"User {request.user.username} accessed their analytics dashboard.")
-    return render(request, 'analytics_dashboard.html', {'analytics': analytics})
+    return render(request, 'analytics_dashboard.html', {
+        'hourly': series['hour'],
+        'daily': series['day'],
+        'weekly': series['week'],
+        'totals': totals,
+    })
 
 @login_required
 def automation_flows(request):
@@ -115,15 +188,20 @@ def onboarding(request):
     return render(request, 'onboarding.html')
 
 @login_required
-def ai_recommendations(request):
+async def ai_recommendations(request):
     if request.method == 'POST':
-        recommendation = f"We recommend focusing on engaging with your fans by doing live Q&A sessions every week."
-        AIRecommendation.objects.create(
-            creator=request.user,
-            recommendation=recommendation,
-            timestamp=datetime.now()
-        )
-        logging.info(f"User {request.user.username} received AI recommendation.")
+        user = await request.auser()
+        recommendation = await recommend(user)
+        # Recommendations change nightly at most; only record one that differs from the last one shown
+        latest = await (AIRecommendation.objects.filter(creator=user).order_by('-timestamp')
+                        .values_list('recommendation', flat=True).afirst())
+        if latest != recommendation:
+            await AIRecommendation.objects.acreate(
+                creator=user,
+                recommendation=recommendation,
+                timestamp=datetime.now()
+            )
+        logging.info(f"User {user.username} received AI recommendation.")
         messages.success(request, 'AI recommendation generated successfully.')
-        return render(request, 'ai_recommendation_result.html', {'recommendation': recommendation})
-    return render(request, 'ai_recommendations.html')
+        return await sync_to_async(render)(request, 'ai_recommendation_result.html', {'recommendation': recommendation})
+    return await sync_to_async(render)(request, 'ai_recommendations.html')